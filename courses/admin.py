@@ -4,7 +4,8 @@ from .models import Category, Course, Section, Lesson, CourseTag
 # Register your models here.
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug', 'is_active', 'created_at']
+    list_display = ['name', 'slug', 'is_active', 'published_course_count', 'created_at']
+    readonly_fields = ['published_course_count']
     list_filter = ['is_active']
     search_fields = ['name']
     prepopulated_fields = {'slug': ('name',)}
@@ -16,6 +17,7 @@ class CourseAdmin(admin.ModelAdmin):
     search_fields = ['title', 'instructor__username', 'category__name']
     prepopulated_fields = {'slug': ('title',)}
     filter_horizontal = ['tags']
+    readonly_fields = Course.COUNTER_FIELDS
 
 @admin.register(Section)
 class SectionAdmin(admin.ModelAdmin):
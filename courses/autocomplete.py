@@ -0,0 +1,323 @@
+"""
+In-memory prefix index for catalog typeahead.
+
+Each worker process keeps a sorted array of normalized keys (the full
+label plus every word-suffix of it) and answers a prefix with a binary
+search, so lookups never touch the database. The index is built on first
+use (gunicorn does it when a worker starts), patched in place when courses
+change in this process, and polls the catalog change stamp to pick up edits
+made by other workers. Periodic full rebuilds run in a background thread and
+the new index is swapped in when it is complete.
+
+Prefixes matching a large part of the index are answered by walking each
+kind's entries from the heaviest down, so short prefixes still return the
+most popular matches.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+COURSE, TAG, INSTRUCTOR = 'course', 'tag', 'instructor'
+
+MAX_ENTRIES = getattr(settings, 'AUTOCOMPLETE_MAX_ENTRIES', 50000)
+# Seconds between checks of the catalog stamp
+REFRESH_INTERVAL = getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL', 30)
+# Seconds between full rebuilds, which also drop deleted rows
+REBUILD_INTERVAL = getattr(settings, 'AUTOCOMPLETE_REBUILD_INTERVAL', 60 * 60)
+
+MAX_KEYS_PER_ENTRY = 8
+# Prefixes matching more keys than this are answered by walking the
+# entries heaviest first rather than collecting every match
+MAX_SCAN = 5000
+
+# Sorts after any character a normalized key can contain
+PREFIX_END = '\U0010ffff'
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall((text or '').lower()))
+
+
+def entry_keys(label):
+    """The label and each word-suffix of it, so any word can start a match"""
+    words = normalize(label).split()
+    return [' '.join(words[i:]) for i in range(min(len(words), MAX_KEYS_PER_ENTRY))]
+
+
+class PrefixIndex:
+    """Sorted-array prefix index with popularity weights"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._keys = []        # sorted (key, kind, ident)
+        self._entries = {}     # (kind, ident) -> entry dict
+        self._by_weight = {}   # kind -> sorted (-weight, ident), heaviest first
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(kind, ident, label, weight, payload):
+        return dict(payload, id=ident, kind=kind, label=label, weight=weight or 0, keys=entry_keys(label))
+
+    def load(self, rows):
+        """Replace the contents with the heaviest ``(kind, ident, label, weight, payload)`` rows"""
+        rows = heapq.nlargest(self.max_entries, rows, key=lambda row: row[3] or 0)
+        entries = {(row[0], row[1]): self._entry(*row) for row in rows}
+        # Sorting once is far cheaper than inserting key by key
+        keys = sorted(
+            (key, kind, ident) for (kind, ident), entry in entries.items() for key in entry['keys']
+        )
+        by_weight = {}
+        for (kind, ident), entry in entries.items():
+            by_weight.setdefault(kind, []).append((-entry['weight'], ident))
+        for ranking in by_weight.values():
+            ranking.sort()
+        with self._lock:
+            self._entries, self._keys, self._by_weight = entries, keys, by_weight
+
+    def add(self, kind, ident, label, weight, **payload):
+        with self._lock:
+            self.remove(kind, ident)
+            if len(self._entries) >= self.max_entries and not self._evict_below(weight or 0):
+                return
+            entry = self._entry(kind, ident, label, weight, payload)
+            self._entries[(kind, ident)] = entry
+            for key in entry['keys']:
+                bisect.insort(self._keys, (key, kind, ident))
+            bisect.insort(self._by_weight.setdefault(kind, []), (-entry['weight'], ident))
+
+    @staticmethod
+    def _discard(items, item):
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
+
+    def remove(self, kind, ident):
+        with self._lock:
+            entry = self._entries.pop((kind, ident), None)
+            if entry is None:
+                return
+            for key in entry['keys']:
+                self._discard(self._keys, (key, kind, ident))
+            self._discard(self._by_weight[kind], (-entry['weight'], ident))
+
+    def _evict_below(self, weight):
+        """Drop the lightest entry if it weighs less than ``weight``"""
+        lightest = [(ranking[-1][0], kind, ranking[-1][1]) for kind, ranking in self._by_weight.items() if ranking]
+        if not lightest:
+            return False
+        negative_weight, kind, ident = max(lightest, key=lambda item: item[0])
+        if -negative_weight >= weight:
+            return False
+        self.remove(kind, ident)
+        return True
+
+    def _heaviest_matches(self, kind, prefix, limit):
+        matches = []
+        for _, ident in self._by_weight.get(kind, ()):
+            entry = self._entries[(kind, ident)]
+            if any(key.startswith(prefix) for key in entry['keys']):
+                matches.append(entry)
+                if len(matches) == limit:
+                    break
+        return matches
+
+    def search(self, prefix, limit=5):
+        """Return ``{kind: [entry, ...]}`` with the heaviest matches first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return {}
+
+        with self._lock:
+            start = bisect.bisect_left(self._keys, (prefix,))
+            end = bisect.bisect_left(self._keys, (prefix + PREFIX_END,), lo=start)
+            if end - start > MAX_SCAN:
+                # Short prefixes match most of the index: walk it heaviest first instead
+                results = {kind: self._heaviest_matches(kind, prefix, limit) for kind in self._by_weight}
+                return {kind: entries for kind, entries in results.items() if entries}
+
+            matches = {}
+            for key, kind, ident in self._keys[start:end]:
+                matches.setdefault((kind, ident), self._entries[(kind, ident)])
+
+        results = {}
+        for entry in matches.values():
+            results.setdefault(entry['kind'], []).append(entry)
+        return {
+            kind: heapq.nlargest(limit, entries, key=lambda entry: entry['weight'])
+            for kind, entries in results.items()
+        }
+
+
+class CatalogAutocomplete:
+    """Per-process typeahead index over course titles, tags and instructors"""
+
+    def __init__(self):
+        self.index = None
+        self.synced_at = None
+        self._built_monotonic = 0
+        self._checked_monotonic = 0
+        self._rebuilding = None
+        self._lock = threading.Lock()
+
+    def search(self, prefix, limit=5):
+        self.ensure_fresh()
+        return self.index.search(prefix, limit)
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if self.index is None:
+            # Only the first build blocks; gunicorn does it before a worker takes traffic
+            with self._lock:
+                if self.index is None:
+                    self.rebuild()
+            return
+
+        if now - self._built_monotonic > REBUILD_INTERVAL:
+            self.rebuild_in_background()
+
+        if now - self._checked_monotonic < REFRESH_INTERVAL:
+            return
+        self._checked_monotonic = now
+
+        from . import stamps
+        changed_at = stamps.get_stamp(stamps.CATALOG)
+        if changed_at and changed_at > self.synced_at:
+            with self._lock:
+                self.sync_since(self.synced_at)
+
+    def rebuild_in_background(self):
+        """Build a fresh index in a thread and swap it in, serving the current one meanwhile"""
+        with self._lock:
+            if self._rebuilding is not None and self._rebuilding.is_alive():
+                return
+            self._rebuilding = threading.Thread(
+                target=self._background_rebuild, name='autocomplete-rebuild', daemon=True
+            )
+            self._rebuilding.start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Could not rebuild the autocomplete index')
+            # Keep the current index and try again after another interval
+            self._built_monotonic = time.monotonic()
+        finally:
+            connection.close()
+
+    def rebuild(self):
+        from .models import Course, CourseTag
+
+        synced_at = timezone.now()
+
+        courses = Course.objects.filter(status='published').order_by('-total_students').values(
+            'pk', 'title', 'slug', 'total_students'
+        )[:MAX_ENTRIES]
+        tags = CourseTag.objects.annotate(
+            weight=Sum('courses__total_students', filter=Q(courses__status='published'))
+        ).values('pk', 'name', 'slug', 'weight')
+        rows = [
+            *(self._course_row(course) for course in courses),
+            *(self._tag_row(tag) for tag in tags),
+            *(self._instructor_row(instructor) for instructor in self._instructor_rows()),
+        ]
+
+        index = PrefixIndex()
+        index.load(row for row in rows if row is not None)
+
+        # Edits made while building are picked up by the next stamp check
+        self.index = index
+        self.synced_at = synced_at
+        self._built_monotonic = self._checked_monotonic = time.monotonic()
+
+    def sync_since(self, since):
+        """Apply course edits made after ``since``"""
+        from .models import Course
+
+        synced_at = timezone.now()
+        course_ids = list(Course.objects.filter(updated_at__gte=since).values_list('pk', flat=True))
+        if course_ids:
+            self.refresh_courses(course_ids)
+        self.synced_at = synced_at
+
+    def refresh_courses(self, course_ids):
+        """Re-read the given courses plus their tags and instructors"""
+        if self.index is None:
+            return
+        from .models import Course, CourseTag
+
+        course_ids = list(course_ids)
+        courses = {
+            course['pk']: course
+            for course in Course.objects.filter(pk__in=course_ids).values(
+                'pk', 'title', 'slug', 'total_students', 'status', 'instructor_id'
+            )
+        }
+        for course_id in course_ids:
+            course = courses.get(course_id)
+            if course is None or course['status'] != 'published':
+                self.index.remove(COURSE, course_id)
+            else:
+                self._add(self.index, self._course_row(course))
+
+        tag_ids = CourseTag.objects.filter(courses__pk__in=course_ids).values('pk')
+        tags = CourseTag.objects.filter(pk__in=tag_ids).annotate(
+            weight=Sum('courses__total_students', filter=Q(courses__status='published'))
+        ).values('pk', 'name', 'slug', 'weight')
+        for tag in tags:
+            self._add(self.index, self._tag_row(tag))
+
+        instructor_ids = {course['instructor_id'] for course in courses.values()}
+        for instructor in self._instructor_rows(instructor_ids):
+            self._add(self.index, self._instructor_row(instructor))
+
+    def remove_course(self, course_id):
+        if self.index is not None:
+            self.index.remove(COURSE, course_id)
+
+    def _instructor_rows(self, instructor_ids=None):
+        from django.contrib.auth import get_user_model
+
+        instructors = get_user_model().objects.filter(user_type='instructor')
+        if instructor_ids is not None:
+            instructors = instructors.filter(pk__in=instructor_ids)
+        return instructors.annotate(
+            weight=Sum('courses_taught__total_students', filter=Q(courses_taught__status='published'))
+        ).values('pk', 'first_name', 'last_name', 'weight')
+
+    @staticmethod
+    def _course_row(course):
+        return COURSE, course['pk'], course['title'], course['total_students'], {'slug': course['slug']}
+
+    @staticmethod
+    def _tag_row(tag):
+        return TAG, tag['pk'], tag['name'], tag['weight'], {'slug': tag['slug']}
+
+    @staticmethod
+    def _instructor_row(instructor):
+        name = f"{instructor['first_name']} {instructor['last_name']}".strip()
+        return (INSTRUCTOR, instructor['pk'], name, instructor['weight'], {}) if name else None
+
+    @staticmethod
+    def _add(index, row):
+        if row is not None:
+            kind, ident, label, weight, payload = row
+            index.add(kind, ident, label, weight, **payload)
+
+
+catalog_autocomplete = CatalogAutocomplete()
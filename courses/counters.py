@@ -0,0 +1,178 @@
+"""Maintenance of denormalized catalog counters"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest
+from . import stamps
+from .models import Category, Course
+
+logger = logging.getLogger(__name__)
+
+# Seconds during which counter deltas are merged in memory before being
+# written; 0 writes them right after each commit
+COUNTER_FLUSH_INTERVAL = getattr(settings, 'COURSE_COUNTER_FLUSH_INTERVAL', 0)
+# Counters shown in catalog listings move the catalog stamp at most this
+# often (seconds), so enrollments don't invalidate every catalog cache
+COUNTER_STAMP_INTERVAL = getattr(settings, 'COURSE_COUNTER_STAMP_INTERVAL', 60)
+
+
+def refresh_category_counts(category_ids):
+    """Recount published courses for the given categories in one UPDATE"""
+    category_ids = [pk for pk in category_ids if pk is not None]
+    if not category_ids:
+        return
+    published = Course.objects.filter(
+        category=OuterRef('pk'), status='published'
+    ).order_by().values('category').annotate(total=Count('pk')).values('total')
+    Category.objects.filter(pk__in=category_ids).update(
+        published_course_count=Coalesce(Subquery(published), 0)
+    )
+
+
+class DeltaBuffer:
+    """
+    Coalesces counter deltas and applies them as ``F()`` increments.
+
+    Deltas are merged after the producing transaction commits, so rolled
+    back events never count and the row lock on a hot row is only held for
+    one short UPDATE rather than for the whole request. Rows receiving the
+    same deltas share a single ``UPDATE ... WHERE pk IN (...)``. With an
+    ``interval`` (opt-in through settings) the deltas of many requests are
+    merged in memory and written together at most once per interval, from
+    a timer thread and once more at interpreter exit.
+    """
+
+    def __init__(self, model, after_flush=None, interval=0):
+        self.model = model
+        self.after_flush = after_flush
+        self.interval = interval
+        self._pending = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._timer = None
+        if interval > 0:
+            atexit.register(self._flush_safely)
+
+    def add(self, pk, **deltas):
+        self.add_many({pk: deltas})
+
+    def add_many(self, deltas_by_pk):
+        """Queue ``{pk: {field: delta}}`` for after the current transaction"""
+        deltas_by_pk = {pk: dict(deltas) for pk, deltas in deltas_by_pk.items() if pk is not None}
+        if deltas_by_pk:
+            transaction.on_commit(lambda: self._merge(deltas_by_pk))
+
+    def _merge(self, deltas_by_pk):
+        with self._lock:
+            for pk, deltas in deltas_by_pk.items():
+                self._pending[pk].update(deltas)
+            if self.interval > 0:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.interval, self._flush_in_thread)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self._flush_safely()
+
+    def _flush_in_thread(self):
+        try:
+            self._flush_safely()
+        finally:
+            connections.close_all()
+
+    def _flush_safely(self):
+        # Runs after the producing transaction committed: a failure must not
+        # turn a successful write into an error response
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write %s counter deltas; kept for the next flush', self.model.__name__)
+
+    def _increment(self, field, delta):
+        if delta > 0:
+            return F(field) + delta
+        # A counter that drifted low must not go negative
+        return Greatest(F(field) + delta, 0, output_field=self.model._meta.get_field(field))
+
+    def flush(self):
+        """Write every pending delta now"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._timer = None
+
+        groups = defaultdict(list)
+        for pk, deltas in pending.items():
+            deltas = tuple(sorted((field, delta) for field, delta in deltas.items() if delta))
+            if deltas:
+                groups[deltas].append(pk)
+        if not groups:
+            return
+
+        try:
+            with transaction.atomic():
+                for deltas, pks in groups.items():
+                    self.model.objects.filter(pk__in=sorted(pks)).update(
+                        **{field: self._increment(field, delta) for field, delta in deltas}
+                    )
+                if self.after_flush:
+                    self.after_flush(groups)
+        except Exception:
+            # Keep the deltas for the next flush
+            with self._lock:
+                for deltas, pks in groups.items():
+                    for pk in pks:
+                        self._pending[pk].update(dict(deltas))
+            raise
+
+
+def average_rating_expression():
+    return Case(
+        When(total_reviews__gt=0, then=Cast('rating_sum', FloatField()) / F('total_reviews')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+catalog_stamp = stamps.ThrottledTouch(stamps.CATALOG, COUNTER_STAMP_INTERVAL)
+
+
+def _after_course_flush(groups):
+    rated = sorted({
+        pk
+        for deltas, pks in groups.items()
+        if {'rating_sum', 'total_reviews'} & {field for field, _ in deltas}
+        for pk in pks
+    })
+    if rated:
+        Course.objects.filter(pk__in=rated).update(average_rating=average_rating_expression())
+    catalog_stamp.touch()
+
+
+course_counters = DeltaBuffer(Course, after_flush=_after_course_flush, interval=COUNTER_FLUSH_INTERVAL)
+
+
+def refresh_course_stats(course_ids=None):
+    """Recount the enrollment and review counters from scratch"""
+    from enrollments.models import Enrollment
+    from reviews.models import Review
+
+    students = Enrollment.objects.filter(
+        course=OuterRef('pk')
+    ).order_by().values('course').annotate(total=Count('pk')).values('total')
+    reviews = Review.objects.filter(
+        course=OuterRef('pk'), is_approved=True
+    ).order_by().values('course').annotate(total=Count('pk'), rating=Sum('rating'))
+
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=list(course_ids))
+    courses.update(
+        total_students=Coalesce(Subquery(students), 0),
+        total_reviews=Coalesce(Subquery(reviews.values('total')), 0),
+        rating_sum=Coalesce(Subquery(reviews.values('rating'), output_field=IntegerField()), 0),
+    )
+    courses.update(average_rating=average_rating_expression())
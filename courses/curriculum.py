@@ -0,0 +1,74 @@
+"""
+Compiled curriculum documents.
+
+``CourseDetailView`` renders sections and lessons from a single
+``CourseCurriculum`` row instead of walking the section and lesson tables.
+The document is rebuilt whenever a section or lesson of the course changes.
+Its ``version`` only moves when the sequence of lessons changes, so that
+lesson analytics can tell course revisions apart without splitting on
+every typo fix.
+"""
+from django.db.models import Prefetch
+from .models import Course, CourseCurriculum, Lesson, Section
+
+
+def compile_curriculum(course_id):
+    """Return ``(sections, lesson_count, total_duration_minutes)`` for a course"""
+    from .serializers import SectionSerializer
+
+    sections = Section.objects.filter(course_id=course_id).order_by('order').prefetch_related(
+        Prefetch('lessons', queryset=Lesson.objects.order_by('order'))
+    )
+    data = [dict(section) for section in SectionSerializer(sections, many=True).data]
+    for section in data:
+        section['lessons'] = [dict(lesson) for lesson in section['lessons']]
+
+    lesson_count = sum(section['lesson_count'] for section in data)
+    total_duration = sum(section['total_duration'] for section in data)
+    return data, lesson_count, total_duration
+
+
+def lesson_sequence(sections):
+    return [lesson['id'] for section in sections for lesson in section['lessons']]
+
+
+def rebuild_curriculum(course_id):
+    """Recompile and store the curriculum of a course"""
+    if not Course.objects.filter(pk=course_id).exists():
+        return None
+
+    sections, lesson_count, total_duration = compile_curriculum(course_id)
+    version = 1
+    sequence_changed = False
+    previous = CourseCurriculum.objects.filter(course_id=course_id).values_list('sections', 'version').first()
+    if previous is not None:
+        previous_sections, version = previous
+        sequence_changed = lesson_sequence(previous_sections) != lesson_sequence(sections)
+        if sequence_changed:
+            version += 1
+
+    curriculum, _ = CourseCurriculum.objects.update_or_create(
+        course_id=course_id,
+        defaults={
+            'sections': sections,
+            'lesson_count': lesson_count,
+            'total_duration_minutes': total_duration,
+            'version': version,
+        }
+    )
+    if sequence_changed:
+        # Lessons were added or removed, so every enrollment's percentage moves
+        from enrollments.progress import refresh_progress
+        refresh_progress(course_id)
+    return curriculum
+
+
+def get_curriculum(course):
+    """Return the stored curriculum of a course, compiling it on first use"""
+    try:
+        return course.curriculum
+    except CourseCurriculum.DoesNotExist:
+        curriculum = rebuild_curriculum(course.pk)
+        course.curriculum = curriculum
+        return curriculum
+
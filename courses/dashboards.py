@@ -0,0 +1,309 @@
+"""
+Dashboard snapshots.
+
+Each block of a dashboard is one conditional aggregation over a single
+base table (``Count(filter=Q(...))`` and friends), so the number of
+queries does not grow with the size of the instructor's catalog. Revenue
+series come from the daily fact table (``courses.rollups``) plus the live
+tail since its last materialization. The instructor snapshot is cached
+per instructor for a short TTL under a key that embeds the instructor's
+change stamp; an enrollment or a review in one of their courses touches
+the stamp, so every worker process moves to a fresh snapshot.
+
+The blocks of a dashboard do not depend on each other, so each dashboard
+is described as ``{name: callable}`` query groups that the sync views run
+with ``run_concurrently`` and the async views with ``gather``; the
+response takes as long as the slowest group.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from lms_backend.concurrency import gather, run_concurrently
+from . import rollups, stamps
+
+INSTRUCTOR_DASHBOARD_TTL = getattr(settings, 'INSTRUCTOR_DASHBOARD_TTL', 60)
+
+REVENUE_MONTHS = 6
+REVENUE_WEEKS = 8
+ADMIN_REVENUE_MONTHS = 12
+
+
+def instructor_dashboard_key(instructor_id):
+    stamp = stamps.get_stamp(stamps.instructor_dashboard_key(instructor_id))
+    return stamps.cache_key('dashboard:instructor', stamp, instructor_id)
+
+
+def invalidate_instructor_dashboard(instructor_id):
+    stamps.touch(stamps.instructor_dashboard_key(instructor_id))
+
+
+def invalidate_course_dashboards(instance):
+    """
+    Touch the dashboard stamp of the instructor of ``instance.course`` once
+    the current transaction commits, so readers cannot re-cache stale data.
+    """
+    course_field = type(instance)._meta.get_field('course')
+    if course_field.is_cached(instance):
+        instructor_id = instance.course.instructor_id
+    else:
+        from .models import Course
+        instructor_id = Course.objects.filter(pk=instance.course_id).values_list(
+            'instructor_id', flat=True
+        ).first()
+    if instructor_id is not None:
+        transaction.on_commit(lambda: invalidate_instructor_dashboard(instructor_id))
+
+
+def monthly_points(points):
+    return [
+        {
+            'month': point['period'].strftime('%B %Y'),
+            'revenue': point['revenue'],
+            'enrollments': point['enrollments'],
+        }
+        for point in points
+    ]
+
+
+def weekly_points(points):
+    return [
+        {
+            'week': point['period'].isoformat(),
+            'revenue': point['revenue'],
+            'enrollments': point['enrollments'],
+        }
+        for point in points
+    ]
+
+
+def instructor_course_stats(instructor):
+    from .models import Course
+
+    return Course.objects.filter(instructor=instructor).aggregate(
+        total_courses=Count('pk'),
+        published_courses=Count('pk', filter=Q(status='published')),
+        draft_courses=Count('pk', filter=Q(status='draft')),
+    )
+
+
+def instructor_enrollment_stats(instructor, boundary):
+    """Enrollment counters and the live revenue tails in one query"""
+    from enrollments.models import Enrollment
+
+    row = Enrollment.objects.filter(course__instructor=instructor).aggregate(
+        total_students=Count('student', distinct=True),
+        total_enrollments=Count('pk'),
+        active_enrollments=Count('pk', filter=Q(status='active')),
+        completed_enrollments=Count('pk', filter=Q(status='completed')),
+        total_revenue=Sum('amount_paid'),
+        **rollups.tail_aggregates('month_tail', rollups.tail_start('month', boundary)),
+        **rollups.tail_aggregates('week_tail', rollups.tail_start('week', boundary)),
+    )
+    row['total_revenue'] = row['total_revenue'] or 0
+    return row
+
+
+def instructor_review_stats(instructor):
+    from reviews.models import Review
+
+    row = Review.objects.filter(course__instructor=instructor).aggregate(
+        average_rating=Avg('rating'),
+        total_reviews=Count('pk'),
+    )
+    row['average_rating'] = row['average_rating'] or 0
+    return row
+
+
+def instructor_dashboard_groups(instructor, boundary):
+    """Independent query groups of the instructor dashboard"""
+    from enrollments.models import Enrollment
+    from reviews.models import Review
+
+    return {
+        'enrollments': lambda: instructor_enrollment_stats(instructor, boundary),
+        'courses': lambda: instructor_course_stats(instructor),
+        'reviews': lambda: instructor_review_stats(instructor),
+        'monthly_revenue': lambda: rollups.series('month', REVENUE_MONTHS, instructor=instructor),
+        'weekly_revenue': lambda: rollups.series('week', REVENUE_WEEKS, instructor=instructor),
+        'recent_enrollments': lambda: list(Enrollment.objects.filter(
+            course__instructor=instructor
+        ).order_by('-enrolled_at')[:5].values(
+            'student__first_name', 'student__last_name', 'course__title',
+            'enrolled_at', 'amount_paid'
+        )),
+        'recent_reviews': lambda: list(Review.objects.filter(
+            course__instructor=instructor
+        ).order_by('-created_at')[:5].values(
+            'student__first_name', 'student__last_name', 'course__title',
+            'rating', 'title', 'created_at'
+        )),
+    }
+
+
+def assemble_instructor_dashboard(results):
+    enrollment_stats = results['enrollments']
+    course_stats = results['courses']
+    review_stats = results['reviews']
+    monthly_revenue = rollups.add_tail(results['monthly_revenue'], rollups.pop_tail(enrollment_stats, 'month_tail'))
+    weekly_revenue = rollups.add_tail(results['weekly_revenue'], rollups.pop_tail(enrollment_stats, 'week_tail'))
+
+    stats = {
+        'total_courses': course_stats['total_courses'],
+        'published_courses': course_stats['published_courses'],
+        'draft_courses': course_stats['draft_courses'],
+        'total_students': enrollment_stats['total_students'],
+        'total_enrollments': enrollment_stats['total_enrollments'],
+        'active_enrollments': enrollment_stats['active_enrollments'],
+        'completed_enrollments': enrollment_stats['completed_enrollments'],
+        'total_revenue': enrollment_stats['total_revenue'],
+        'average_rating': review_stats['average_rating'],
+        'total_reviews': review_stats['total_reviews'],
+    }
+
+    return {
+        'stats': stats,
+        'recent_enrollments': results['recent_enrollments'],
+        'recent_reviews': results['recent_reviews'],
+        'monthly_revenue': monthly_points(monthly_revenue),
+        'weekly_revenue': weekly_points(weekly_revenue),
+    }
+
+
+def build_instructor_dashboard(instructor):
+    boundary = rollups.materialized_until()
+    groups = instructor_dashboard_groups(instructor, boundary)
+    return assemble_instructor_dashboard(run_concurrently(groups))
+
+
+async def abuild_instructor_dashboard(instructor):
+    boundary = await sync_to_async(rollups.materialized_until)()
+    groups = instructor_dashboard_groups(instructor, boundary)
+    return assemble_instructor_dashboard(await gather(groups))
+
+
+def get_instructor_dashboard(instructor):
+    """Cached snapshot of an instructor's dashboard"""
+    key = instructor_dashboard_key(instructor.pk)
+    data = cache.get(key)
+    if data is None:
+        data = build_instructor_dashboard(instructor)
+        cache.set(key, data, INSTRUCTOR_DASHBOARD_TTL)
+    return data
+
+
+async def aget_instructor_dashboard(instructor):
+    key = await sync_to_async(instructor_dashboard_key)(instructor.pk)
+    data = await cache.aget(key)
+    if data is None:
+        data = await abuild_instructor_dashboard(instructor)
+        await cache.aset(key, data, INSTRUCTOR_DASHBOARD_TTL)
+    return data
+
+
+def student_enrollment_stats(student):
+    from enrollments.models import Enrollment
+
+    row = Enrollment.objects.filter(student=student).aggregate(
+        total_courses=Count('pk'),
+        active_courses=Count('pk', filter=Q(status='active')),
+        completed_courses=Count('pk', filter=Q(status='completed')),
+        certificates_earned=Count('pk', filter=Q(certificate_issued=True)),
+        total_spent=Sum('amount_paid'),
+        average_progress=Avg('progress_percentage'),
+    )
+    row['total_spent'] = row['total_spent'] or 0
+    row['average_progress'] = row['average_progress'] or 0
+    return row
+
+
+def student_dashboard_groups(student):
+    """Independent query groups of the student dashboard"""
+    from enrollments.models import Enrollment
+
+    enrollments = Enrollment.objects.filter(student=student)
+    return {
+        'stats': lambda: student_enrollment_stats(student),
+        'recent_courses': lambda: list(enrollments.order_by('-last_accessed_at')[:5].values(
+            'course__title', 'course__slug', 'progress_percentage',
+            'enrolled_at', 'last_accessed_at', 'status'
+        )),
+        # Courses to continue (active with progress < 100%)
+        'continue_courses': lambda: list(enrollments.filter(
+            status='active', progress_percentage__lt=100
+        ).order_by('-last_accessed_at')[:3].values(
+            'course__title', 'course__slug', 'progress_percentage',
+            'course__thumbnail'
+        )),
+    }
+
+
+def build_student_dashboard(student):
+    return run_concurrently(student_dashboard_groups(student))
+
+
+async def abuild_student_dashboard(student):
+    return await gather(student_dashboard_groups(student))
+
+
+def admin_dashboard_groups(boundary):
+    """Independent query groups of the admin dashboard"""
+    from django.contrib.auth import get_user_model
+    from enrollments.models import Enrollment
+    from .models import Course
+    from .platform import get_platform_stats
+
+    User = get_user_model()
+    tail_since = rollups.tail_start('month', boundary)
+    return {
+        'platform': get_platform_stats,
+        'recent_users': lambda: list(User.objects.order_by('-date_joined')[:5].values(
+            'first_name', 'last_name', 'email', 'user_type', 'date_joined'
+        )),
+        'recent_courses': lambda: list(Course.objects.order_by('-created_at')[:5].values(
+            'title', 'instructor__first_name', 'instructor__last_name',
+            'status', 'created_at'
+        )),
+        # Monthly revenue from the daily facts plus the days not materialized yet
+        'monthly_revenue': lambda: rollups.series('month', ADMIN_REVENUE_MONTHS),
+        # Only the rows after the tail starts are read
+        'tail': lambda: Enrollment.objects.filter(enrolled_at__gte=tail_since).aggregate(
+            **rollups.tail_aggregates('month_tail', tail_since)
+        ),
+    }
+
+
+def assemble_admin_dashboard(results):
+    platform = results['platform']
+    stats = {
+        'total_users': platform.total_users,
+        'total_students': platform.total_students,
+        'total_instructors': platform.total_instructors,
+        'total_courses': platform.total_courses,
+        'published_courses': platform.published_courses,
+        'total_enrollments': platform.total_enrollments,
+        'total_revenue': platform.total_revenue,
+        'total_reviews': platform.total_reviews,
+        'estimated': platform.counts_estimated,
+        'refreshed_at': platform.refreshed_at,
+    }
+    monthly_revenue = rollups.add_tail(results['monthly_revenue'], rollups.pop_tail(results['tail'], 'month_tail'))
+
+    return {
+        'stats': stats,
+        'recent_users': results['recent_users'],
+        'recent_courses': results['recent_courses'],
+        'top_courses': platform.top_courses[:5],
+        'monthly_revenue': monthly_points(monthly_revenue),
+    }
+
+
+def build_admin_dashboard():
+    boundary = rollups.materialized_until()
+    return assemble_admin_dashboard(run_concurrently(admin_dashboard_groups(boundary)))
+
+
+async def abuild_admin_dashboard():
+    boundary = await sync_to_async(rollups.materialized_until)()
+    return assemble_admin_dashboard(await gather(admin_dashboard_groups(boundary)))
@@ -0,0 +1,208 @@
+"""
+Disjunctive facet counts for the course catalog sidebar.
+
+The filters that are not facets (search, duration, instructor, ...) are
+applied in SQL, then a single grouped query returns one row per
+combination of facet values. Facet counts are summed from those cells in
+Python, each facet ignoring its own active constraint, so the number of
+rows handled depends on the catalog's dimensions and not on its size.
+"""
+from decimal import Decimal
+
+from django.db.models import BooleanField, Case, Count, DecimalField, IntegerField, Q, Value, When
+from django_filters.utils import translate_validation
+from .filters import CourseFilter
+from .models import Course
+from .search import search_courses
+
+# (key, min, max) price bands; max is exclusive and None means unbounded
+PRICE_BANDS = (
+    ('0-20', Decimal('0'), Decimal('20')),
+    ('20-50', Decimal('20'), Decimal('50')),
+    ('50-100', Decimal('50'), Decimal('100')),
+    ('100+', Decimal('100'), None),
+)
+
+# Thresholds offered by the minimum rating facet
+RATING_THRESHOLDS = (Decimal('4.5'), Decimal('4.0'), Decimal('3.5'), Decimal('3.0'))
+
+# Query parameters owned by each facet
+FACET_PARAMS = {
+    'category': ('category', 'category_slug'),
+    'difficulty_level': ('difficulty_level',),
+    'language': ('language',),
+    'price': ('price_min', 'price_max'),
+    'is_free': ('is_free',),
+    'rating': ('rating_min',),
+}
+
+
+def _price_band():
+    whens = [
+        When(price__lt=upper, then=Value(index))
+        for index, (_, _, upper) in enumerate(PRICE_BANDS) if upper is not None
+    ]
+    return Case(*whens, default=Value(len(PRICE_BANDS) - 1), output_field=IntegerField())
+
+
+def _rating_band():
+    whens = [When(average_rating__gte=threshold, then=Value(threshold)) for threshold in RATING_THRESHOLDS]
+    return Case(*whens, default=Value(Decimal('0')), output_field=DecimalField(max_digits=3, decimal_places=2))
+
+
+def _flag(condition):
+    if condition is None:
+        return Value(True)
+    return Case(When(condition, then=Value(True)), default=Value(False), output_field=BooleanField())
+
+
+def _price_condition(params):
+    condition = Q()
+    if params.get('price_min') is not None:
+        condition &= Q(price__gte=params['price_min'])
+    if params.get('price_max') is not None:
+        condition &= Q(price__lte=params['price_max'])
+    return condition or None
+
+
+def _rating_condition(params):
+    if params.get('rating_min') is None:
+        return None
+    return Q(average_rating__gte=params['rating_min'])
+
+
+def _cell_predicates(params):
+    """Return ``{facet: predicate(cell)}`` for the active facet constraints"""
+    predicates = {}
+
+    category, category_slug = params.get('category'), params.get('category_slug')
+    if category or category_slug:
+        predicates['category'] = lambda cell: (
+            (not category or cell['category_id'] == category.pk)
+            and (not category_slug or cell['category__slug'] == category_slug)
+        )
+    if params.get('difficulty_level'):
+        predicates['difficulty_level'] = lambda cell: cell['difficulty_level'] == params['difficulty_level']
+    if params.get('language'):
+        language = params['language'].lower()
+        predicates['language'] = lambda cell: language in cell['language'].lower()
+    if _price_condition(params) is not None:
+        predicates['price'] = lambda cell: cell['in_price_range']
+    if params.get('is_free') is not None:
+        predicates['is_free'] = lambda cell: cell['is_free'] == params['is_free']
+    if _rating_condition(params) is not None:
+        predicates['rating'] = lambda cell: cell['meets_rating']
+    return predicates
+
+
+def compute_facets(query_params):
+    """Return the total and per-facet counts for a catalog query"""
+    facet_params = {name for names in FACET_PARAMS.values() for name in names}
+
+    # Validate every parameter once to get typed values for the facets
+    filterset = CourseFilter(query_params, queryset=Course.objects.none())
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    params = filterset.form.cleaned_data
+
+    queryset = Course.objects.filter(status='published')
+    search = query_params.get('search', '').strip()
+    if search:
+        queryset = search_courses(queryset, search, ranked=False)
+
+    other_params = query_params.copy()
+    for name in facet_params:
+        other_params.pop(name, None)
+    queryset = CourseFilter(other_params, queryset=queryset).qs
+
+    cells = list(queryset.order_by().annotate(
+        price_band=_price_band(),
+        rating_band=_rating_band(),
+        in_price_range=_flag(_price_condition(params)),
+        meets_rating=_flag(_rating_condition(params)),
+    ).values(
+        'category_id', 'category__slug', 'category__name', 'difficulty_level',
+        'language', 'is_free', 'price_band', 'rating_band', 'in_price_range',
+        'meets_rating',
+    ).annotate(total=Count('pk')))
+
+    predicates = _cell_predicates(params)
+
+    def matching(skip=None):
+        return [
+            cell for cell in cells
+            if all(check(cell) for facet, check in predicates.items() if facet != skip)
+        ]
+
+    return {
+        'total': sum(cell['total'] for cell in matching()),
+        'facets': {
+            'category': _category_counts(matching('category')),
+            'difficulty_level': _difficulty_counts(matching('difficulty_level')),
+            'language': _language_counts(matching('language')),
+            'price': _price_counts(matching('price')),
+            'is_free': _is_free_counts(matching('is_free')),
+            'rating': _rating_counts(matching('rating')),
+        }
+    }
+
+
+def _category_counts(cells):
+    counts = {}
+    for cell in cells:
+        entry = counts.setdefault(cell['category_id'], {
+            'value': cell['category_id'],
+            'slug': cell['category__slug'],
+            'label': cell['category__name'],
+            'count': 0,
+        })
+        entry['count'] += cell['total']
+    return sorted(counts.values(), key=lambda entry: (-entry['count'], entry['label']))
+
+
+def _difficulty_counts(cells):
+    counts = {value: 0 for value, _ in Course.DIFFICULTY_LEVELS}
+    for cell in cells:
+        counts[cell['difficulty_level']] = counts.get(cell['difficulty_level'], 0) + cell['total']
+    labels = dict(Course.DIFFICULTY_LEVELS)
+    return [
+        {'value': value, 'label': labels.get(value, value), 'count': count}
+        for value, count in counts.items()
+    ]
+
+
+def _language_counts(cells):
+    counts = {}
+    for cell in cells:
+        counts[cell['language']] = counts.get(cell['language'], 0) + cell['total']
+    return [
+        {'value': language, 'count': count}
+        for language, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def _price_counts(cells):
+    counts = [0] * len(PRICE_BANDS)
+    for cell in cells:
+        counts[cell['price_band']] += cell['total']
+    return [
+        {'value': key, 'min': lower, 'max': upper, 'count': count}
+        for (key, lower, upper), count in zip(PRICE_BANDS, counts)
+    ]
+
+
+def _is_free_counts(cells):
+    counts = {True: 0, False: 0}
+    for cell in cells:
+        counts[bool(cell['is_free'])] += cell['total']
+    return [{'value': value, 'count': count} for value, count in counts.items()]
+
+
+def _rating_counts(cells):
+    return [
+        {
+            'value': threshold,
+            'count': sum(cell['total'] for cell in cells if Decimal(cell['rating_band']) >= threshold),
+        }
+        for threshold in RATING_THRESHOLDS
+    ]
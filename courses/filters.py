@@ -1,6 +1,8 @@
 import django_filters
 from django.db import models
+from rest_framework import filters
 from .models import Course, Category
+from .search import search_courses
 
 class CourseFilter(django_filters.FilterSet):
     """Filter set for courses"""
@@ -50,4 +52,22 @@ class CourseFilter(django_filters.FilterSet):
             models.Q(instructor__username__icontains=value)
         )
 
+class CourseSearchFilter(filters.SearchFilter):
+    """Ranked search backed by the course search index"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_courses(queryset, query)
+
+class CourseOrderingFilter(filters.OrderingFilter):
+    """Order search results by relevance unless an ordering is requested"""
+
+    def filter_queryset(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            ordering = self.get_default_ordering(view) or []
+            return queryset.order_by('-search_rank', *ordering)
+        return super().filter_queryset(request, queryset, view)
+
 print("✅ Course filters created successfully!")
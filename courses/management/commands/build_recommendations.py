@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from courses.recommendations import DEFAULT_CHUNK_SIZE, DEFAULT_TOP_K, build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Build "students also took" course recommendations from enrollments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only recompute courses whose enrollments changed since the last run'
+        )
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Enrollment rows streamed per block')
+        parser.add_argument('--min-support', type=int, default=1,
+                            help='Minimum number of shared students')
+
+    def handle(self, *args, **options):
+        written = build_recommendations(
+            incremental=options['incremental'],
+            top_k=options['top_k'],
+            chunk_size=options['chunk_size'],
+            min_support=options['min_support'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recommendations written for {written} courses'))
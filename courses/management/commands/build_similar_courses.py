@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from courses.recommendations import DEFAULT_TOP_K
+from courses.similarity import build_similar_courses
+
+
+class Command(BaseCommand):
+    help = 'Build content-based "similar courses" lists from course text, tags and category'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only recompute courses edited since the last run and the lists they affect'
+        )
+        parser.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+
+    def handle(self, *args, **options):
+        written = build_similar_courses(
+            incremental=options['incremental'],
+            top_k=options['top_k'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Similar courses written for {written} courses'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from courses.trending import prune_activity, rebuild_trending, update_trending
+
+
+class Command(BaseCommand):
+    help = 'Advance the trending courses snapshot to the current hour (run hourly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every score instead of rolling the window forward')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete activity buckets past the retention period')
+
+    def handle(self, *args, **options):
+        updated = rebuild_trending() if options['full'] else update_trending()
+        self.stdout.write(self.style.SUCCESS(f'Trending scores updated for {updated} courses'))
+        if options['prune']:
+            self.stdout.write(f'Pruned {prune_activity()} activity buckets')
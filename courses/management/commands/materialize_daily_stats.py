@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from courses.rollups import DEFAULT_LOOKBACK_DAYS, materialize_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Materialize per-course daily enrollment, completion, revenue and review facts (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to (re)build, YYYY-MM-DD; defaults to the last run. '
+                                            'Days after the last run are never skipped')
+        parser.add_argument('--lookback-days', type=int, default=DEFAULT_LOOKBACK_DAYS,
+                            help='Days before the last run recomputed to catch late edits')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        written = materialize_daily_stats(since=since, lookback_days=options['lookback_days'])
+        self.stdout.write(self.style.SUCCESS(f'Daily course stats written: {written} rows'))
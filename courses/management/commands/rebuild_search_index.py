@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import Course, CourseSearchTerm
+from courses.search import course_postings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        courses = Course.objects.select_related('instructor').prefetch_related('tags').order_by('pk')
+
+        indexed = 0
+        last_pk = None
+        while True:
+            batch = courses if last_pk is None else courses.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+
+            rows = [
+                CourseSearchTerm(course_id=course.pk, term=term, weight=weight)
+                for course in batch
+                for term, weight in course_postings(course).items()
+            ]
+            with transaction.atomic():
+                CourseSearchTerm.objects.filter(course__in=batch).delete()
+                CourseSearchTerm.objects.bulk_create(rows, batch_size=2000)
+
+            indexed += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'Indexed {indexed} courses')
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {indexed} courses'))
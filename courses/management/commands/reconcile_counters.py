@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from lms_backend.reconcile import (
+    COUNTER_SPECS, DEFAULT_CHUNK_SIZE, DEFAULT_FIX_BATCH_SIZE, DEFAULT_WORKERS, reconcile
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare denormalized counters with their source tables and report (or fix) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('specs', nargs='*',
+                            help=f'Counters to check: {", ".join(COUNTER_SPECS)} (default: all)')
+        parser.add_argument('--fix', action='store_true', help='Repair drifting rows')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help='Key ranges audited in parallel')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows per key range')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_FIX_BATCH_SIZE,
+                            help='Rows repaired per statement')
+
+    def handle(self, *args, **options):
+        unknown = set(options['specs']) - set(COUNTER_SPECS)
+        if unknown:
+            raise CommandError(f'Unknown counters: {", ".join(sorted(unknown))}')
+
+        reports = reconcile(
+            spec_names=options['specs'] or None,
+            fix=options['fix'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        for name, report in reports.items():
+            rate = report.drifted / report.scanned * 100 if report.scanned else 0
+            style = self.style.WARNING if report.drifted else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: {report.scanned} rows scanned, {report.drifted} drifted ({rate:.2f}%), '
+                f'{report.fixed} fixed'
+            ))
+            for field, (rows, total, largest) in sorted(report.fields.items()):
+                self.stdout.write(f'  {field}: {rows} rows, total |delta| {total}, max |delta| {largest}')
+            if report.samples:
+                self.stdout.write(f'  e.g. {", ".join(str(pk) for pk in report.samples)}')
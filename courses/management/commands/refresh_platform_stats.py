@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from courses.platform import LEADERBOARD_SIZE, refresh_platform_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute platform totals and the top-course leaderboard for the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estimate', action='store_true',
+                            help='Use planner row estimates for the large tables (PostgreSQL)')
+        parser.add_argument('--leaderboard-size', type=int, default=LEADERBOARD_SIZE)
+
+    def handle(self, *args, **options):
+        values = refresh_platform_stats(
+            estimate=options['estimate'], leaderboard_size=options['leaderboard_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Platform stats refreshed: {values['total_users']} users, "
+            f"{values['total_enrollments']} enrollments, {values['total_revenue']} revenue"
+        ))
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:44
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A frozen copy of the tokenizer in courses.search as of this migration, so
+# later changes there cannot break it; rebuild_search_index reindexes with
+# the current one
+FIELD_WEIGHTS = {
+    'title': 10,
+    'tags': 6,
+    'instructor': 5,
+    'short_description': 3,
+    'description': 1,
+}
+MAX_TERM_FREQUENCY = 3
+MAX_TERM_LENGTH = 64
+TOKEN_RE = re.compile(r'[^\W_]+')
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how',
+    'in', 'into', 'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+    'with', 'you', 'your',
+})
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def course_postings(course):
+    instructor = course.instructor
+    fields = {
+        'title': course.title,
+        'short_description': course.short_description,
+        'description': course.description,
+        'tags': ' '.join(tag.name for tag in course.tags.all()),
+        'instructor': f'{instructor.first_name} {instructor.last_name}',
+    }
+    postings = Counter()
+    for field, text in fields.items():
+        for term, count in Counter(tokenize(text)).items():
+            postings[term] += FIELD_WEIGHTS[field] * min(count, MAX_TERM_FREQUENCY)
+    return postings
+
+
+def build_search_index(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseSearchTerm = apps.get_model('courses', 'CourseSearchTerm')
+    courses = Course.objects.select_related('instructor').prefetch_related('tags')
+    for course in courses.iterator(chunk_size=500):
+        CourseSearchTerm.objects.bulk_create([
+            CourseSearchTerm(course_id=course.pk, term=term, weight=weight)
+            for term, weight in course_postings(course).items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='courses.course')),
+            ],
+            options={
+                'verbose_name': 'Course Search Term',
+                'verbose_name_plural': 'Course Search Terms',
+                'db_table': 'course_search_terms',
+                'indexes': [models.Index(fields=['term', 'course'], name='course_sear_term_00395f_idx'), models.Index(fields=['term'], name='course_search_term_prefix', opclasses=['varchar_pattern_ops'])],
+                'unique_together': {('course', 'term')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_terms'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='courses_status_6ba8e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'price', 'id'], name='courses_status_bc671b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'average_rating', 'id'], name='courses_status_894fd7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['status', 'total_students', 'id'], name='courses_status_5ccea3_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_published_courses(apps, schema_editor):
+    Category = apps.get_model('courses', 'Category')
+    Course = apps.get_model('courses', 'Course')
+    published = Course.objects.filter(
+        category=OuterRef('pk'), status='published'
+    ).order_by().values('category').annotate(total=Count('pk')).values('total')
+    Category.objects.update(published_course_count=Coalesce(Subquery(published), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('key', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Change Stamp',
+                'verbose_name_plural': 'Change Stamps',
+                'db_table': 'change_stamps',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_course_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_published_courses, migrations.RunPython.noop),
+    ]
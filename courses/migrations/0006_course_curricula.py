@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:47
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Prefetch
+import django.db.models.deletion
+
+
+def compile_curricula(apps, schema_editor):
+    # Mirrors the SectionSerializer document of courses.curriculum as of
+    # this migration; the app compiles later changes itself
+    Course = apps.get_model('courses', 'Course')
+    CourseCurriculum = apps.get_model('courses', 'CourseCurriculum')
+    Lesson = apps.get_model('courses', 'Lesson')
+    Section = apps.get_model('courses', 'Section')
+
+    documents = defaultdict(list)
+    sections = Section.objects.order_by('course_id', 'order').prefetch_related(
+        Prefetch('lessons', queryset=Lesson.objects.order_by('order'))
+    )
+    for section in sections.iterator(chunk_size=500):
+        lessons = [
+            {
+                'id': lesson.pk,
+                'title': lesson.title,
+                'description': lesson.description,
+                'lesson_type': lesson.lesson_type,
+                'duration_minutes': lesson.duration_minutes,
+                'order': lesson.order,
+                'is_preview': lesson.is_preview,
+                'is_mandatory': lesson.is_mandatory,
+            }
+            for lesson in section.lessons.all()
+        ]
+        documents[section.course_id].append({
+            'id': section.pk,
+            'title': section.title,
+            'description': section.description,
+            'order': section.order,
+            'lessons': lessons,
+            'lesson_count': len(lessons),
+            'total_duration': sum(lesson['duration_minutes'] for lesson in lessons),
+        })
+
+    CourseCurriculum.objects.bulk_create([
+        CourseCurriculum(
+            course_id=course_id,
+            sections=documents[course_id],
+            lesson_count=sum(section['lesson_count'] for section in documents[course_id]),
+            total_duration_minutes=sum(section['total_duration'] for section in documents[course_id]),
+        )
+        for course_id in Course.objects.values_list('pk', flat=True).iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_category_counts_change_stamps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCurriculum',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='curriculum', serialize=False, to='courses.course')),
+                ('sections', models.JSONField(default=list)),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('total_duration_minutes', models.PositiveIntegerField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Course Curriculum',
+                'verbose_name_plural': 'Course Curricula',
+                'db_table': 'course_curricula',
+            },
+        ),
+        migrations.RunPython(compile_curricula, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_curricula'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='courses.course')),
+                ('recommended_course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+            ],
+            options={
+                'verbose_name': 'Course Recommendation',
+                'verbose_name_plural': 'Course Recommendations',
+                'db_table': 'course_recommendations',
+                'ordering': ['course', 'rank'],
+                'unique_together': {('course', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_recommendations'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='courserecommendation',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='courserecommendation',
+            name='source',
+            field=models.CharField(choices=[('co_enrollment', 'Students also took'), ('content', 'Similar content')], default='co_enrollment', max_length=20),
+        ),
+        migrations.AlterUniqueTogether(
+            name='courserecommendation',
+            unique_together={('course', 'source', 'rank')},
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_recommendation_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCourse',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='courses.course')),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'verbose_name': 'Trending Course',
+                'verbose_name_plural': 'Trending Courses',
+                'db_table': 'trending_courses',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='trending_co_score_46dc11_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour')),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='courses.course')),
+            ],
+            options={
+                'verbose_name': 'Course Activity',
+                'verbose_name_plural': 'Course Activity',
+                'db_table': 'course_activity',
+                'indexes': [models.Index(fields=['bucket'], name='course_acti_bucket_c4678b_idx')],
+                'unique_together': {('course', 'bucket')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:00
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+def count_course_stats(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    Review = apps.get_model('reviews', 'Review')
+
+    students = Enrollment.objects.filter(
+        course=OuterRef('pk')
+    ).order_by().values('course').annotate(total=Count('pk')).values('total')
+    reviews = Review.objects.filter(
+        course=OuterRef('pk'), is_approved=True
+    ).order_by().values('course').annotate(total=Count('pk'), rating=Sum('rating'))
+
+    Course.objects.update(
+        total_students=Coalesce(Subquery(students), 0),
+        total_reviews=Coalesce(Subquery(reviews.values('total')), 0),
+        rating_sum=Coalesce(Subquery(reviews.values('rating'), output_field=IntegerField()), 0),
+    )
+    Course.objects.update(average_rating=Case(
+        When(total_reviews__gt=0, then=Cast('rating_sum', FloatField()) / F('total_reviews')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_activity'),
+        ('enrollments', '0003_keyset_pagination_indexes'),
+        ('reviews', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of approved review ratings'),
+        ),
+        migrations.RunPython(count_course_stats, migrations.RunPython.noop),
+    ]
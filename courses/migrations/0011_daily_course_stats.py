@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0010_course_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCourseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('enrollments', models.PositiveIntegerField(default=0)),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.category')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course')),
+                ('instructor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Course Stats',
+                'verbose_name_plural': 'Daily Course Stats',
+                'db_table': 'daily_course_stats',
+                'indexes': [models.Index(fields=['date'], name='daily_cours_date_680d6a_idx'), models.Index(fields=['instructor', 'date'], name='daily_cours_instruc_e153ef_idx'), models.Index(fields=['category', 'date'], name='daily_cours_categor_c0c38d_idx')],
+                'unique_together': {('course', 'date')},
+            },
+        ),
+    ]
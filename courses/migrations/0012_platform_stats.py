@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_daily_course_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_users', models.PositiveIntegerField(default=0)),
+                ('total_students', models.PositiveIntegerField(default=0)),
+                ('total_instructors', models.PositiveIntegerField(default=0)),
+                ('total_courses', models.PositiveIntegerField(default=0)),
+                ('published_courses', models.PositiveIntegerField(default=0)),
+                ('total_enrollments', models.PositiveIntegerField(default=0)),
+                ('total_reviews', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('top_courses', models.JSONField(default=list, help_text='Top published courses by students')),
+                ('counts_estimated', models.BooleanField(default=False)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Platform Stats',
+                'verbose_name_plural': 'Platform Stats',
+                'db_table': 'platform_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at'], name='courses_created_0aa93c_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_platform_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursecurriculum',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Bumped when the lesson sequence changes'),
+        ),
+    ]
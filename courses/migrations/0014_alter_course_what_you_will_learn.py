@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_curriculum_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='what_you_will_learn',
+            field=models.TextField(blank=True, help_text='JSON array of learning outcomes'),
+        ),
+    ]
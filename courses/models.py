@@ -16,6 +16,9 @@ class Category(models.Model):
     color = models.CharField(max_length=7, default="#3B82F6", help_text="Hex color code")
     is_active = models.BooleanField(default=True)
     
+    # Denormalized number of published courses (maintained via signals)
+    published_course_count = models.PositiveIntegerField(default=0)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -82,6 +85,7 @@ class Course(models.Model):
     total_students = models.PositiveIntegerField(default=0)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
     total_reviews = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0, help_text="Sum of approved review ratings")
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -97,8 +101,17 @@ class Course(models.Model):
             models.Index(fields=['status', 'is_featured']),
             models.Index(fields=['category', 'difficulty_level']),
             models.Index(fields=['price', 'is_free']),
+            # Keyset pagination seeks for each catalog ordering
+            models.Index(fields=['status', 'created_at', 'id']),
+            models.Index(fields=['status', 'price', 'id']),
+            models.Index(fields=['status', 'average_rating', 'id']),
+            models.Index(fields=['status', 'total_students', 'id']),
+            models.Index(fields=['created_at']),
         ]
     
+    # Maintained with F() deltas by courses.counters (read-only in the admin)
+    COUNTER_FIELDS = ('total_students', 'total_reviews', 'rating_sum', 'average_rating')
+    
     def __str__(self):
         return self.title
     
@@ -187,4 +200,173 @@ class CourseTag(models.Model):
 # Many-to-many relationship for course tags
 Course.add_to_class('tags', models.ManyToManyField(CourseTag, blank=True, related_name='courses'))
 
+class CourseSearchTerm(models.Model):
+    """Inverted search index: one weighted posting per course and term"""
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'course_search_terms'
+        verbose_name = 'Course Search Term'
+        verbose_name_plural = 'Course Search Terms'
+        unique_together = ['course', 'term']
+        indexes = [
+            models.Index(fields=['term', 'course']),
+            # Serves prefix (LIKE 'abc%') lookups on PostgreSQL
+            models.Index(fields=['term'], name='course_search_term_prefix', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.weight})"
+
+class CourseCurriculum(models.Model):
+    """Compiled curriculum document, rebuilt when sections or lessons change"""
+
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='curriculum')
+    sections = models.JSONField(default=list)
+    lesson_count = models.PositiveIntegerField(default=0)
+    total_duration_minutes = models.PositiveIntegerField(default=0)
+    version = models.PositiveIntegerField(default=1, help_text="Bumped when the lesson sequence changes")
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'course_curricula'
+        verbose_name = 'Course Curriculum'
+        verbose_name_plural = 'Course Curricula'
+
+    def __str__(self):
+        return f"Curriculum: {self.course_id}"
+
+class CourseRecommendation(models.Model):
+    """Precomputed top-k related courses, best first"""
+
+    SOURCE_CHOICES = (
+        ('co_enrollment', 'Students also took'),
+        ('content', 'Similar content'),
+    )
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='co_enrollment')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'course_recommendations'
+        verbose_name = 'Course Recommendation'
+        verbose_name_plural = 'Course Recommendations'
+        ordering = ['course', 'rank']
+        unique_together = ['course', 'source', 'rank']
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_course_id} ({self.score:.3f})"
+
+class CourseActivity(models.Model):
+    """Enrollments and reviews received by a course in one hour"""
+
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='activity')
+    bucket = models.DateTimeField(help_text="Start of the hour")
+    enrollments = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'course_activity'
+        verbose_name = 'Course Activity'
+        verbose_name_plural = 'Course Activity'
+        unique_together = ['course', 'bucket']
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} @ {self.bucket:%Y-%m-%d %H:00}"
+
+class TrendingCourse(models.Model):
+    """Time-decayed activity score of a course, as of the trending stamp"""
+
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'trending_courses'
+        verbose_name = 'Trending Course'
+        verbose_name_plural = 'Trending Courses'
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} ({self.score:.2f})"
+
+class DailyCourseStats(models.Model):
+    """Per-course daily facts for dashboards, see courses.rollups"""
+
+    date = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    instructor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    enrollments = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'daily_course_stats'
+        verbose_name = 'Daily Course Stats'
+        verbose_name_plural = 'Daily Course Stats'
+        unique_together = ['course', 'date']
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['instructor', 'date']),
+            models.Index(fields=['category', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} {self.date}"
+
+class PlatformStats(models.Model):
+    """Platform-wide totals and leaderboard for the admin dashboard (one row)"""
+
+    total_users = models.PositiveIntegerField(default=0)
+    total_students = models.PositiveIntegerField(default=0)
+    total_instructors = models.PositiveIntegerField(default=0)
+    total_courses = models.PositiveIntegerField(default=0)
+    published_courses = models.PositiveIntegerField(default=0)
+    total_enrollments = models.PositiveIntegerField(default=0)
+    total_reviews = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    top_courses = models.JSONField(default=list, help_text="Top published courses by students")
+    counts_estimated = models.BooleanField(default=False)
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'platform_stats'
+        verbose_name = 'Platform Stats'
+        verbose_name_plural = 'Platform Stats'
+
+    def __str__(self):
+        return f"Platform stats ({self.refreshed_at})"
+
+    @classmethod
+    def load(cls):
+        stats, _ = cls.objects.get_or_create(pk=1)
+        return stats
+
+class ChangeStamp(models.Model):
+    """Last change time of a slice of data, used to key caches and validators"""
+
+    key = models.CharField(max_length=100, primary_key=True)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'change_stamps'
+        verbose_name = 'Change Stamp'
+        verbose_name_plural = 'Change Stamps'
+
+    def __str__(self):
+        return f"{self.key} @ {self.changed_at}"
+
 print("✅ Course models created successfully!")
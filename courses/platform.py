@@ -0,0 +1,102 @@
+"""
+Platform-wide totals for the admin dashboard.
+
+``refresh_platform_stats`` (run periodically) recomputes the
+``PlatformStats`` row and its top-course leaderboard. For the largest
+tables it can take the planner's estimate instead of counting every row.
+Between refreshes, enrollment and review events keep the headline totals
+moving with ``F()`` deltas applied after each commit, so the dashboard
+itself is a primary-key lookup.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from lms_backend.pagination import estimate_count
+from . import rollups
+from .counters import DeltaBuffer
+from .models import Course, DailyCourseStats, PlatformStats
+
+PLATFORM_STATS_FLUSH_INTERVAL = getattr(settings, 'PLATFORM_STATS_FLUSH_INTERVAL', 0)
+
+LEADERBOARD_SIZE = 10
+
+# Every event updates the single PlatformStats row. Setting
+# PLATFORM_STATS_FLUSH_INTERVAL coalesces its deltas so each process writes
+# the row at most once per interval, at the cost of losing what is still in
+# memory when a process dies (until the next refresh_platform_stats).
+platform_counters = DeltaBuffer(PlatformStats, interval=PLATFORM_STATS_FLUSH_INTERVAL)
+
+
+def record_platform_event(**deltas):
+    # Deltas are summed in memory, so a float amount must not meet a Decimal one
+    platform_counters.add(1, **{
+        name: PlatformStats._meta.get_field(name).to_python(delta) for name, delta in deltas.items()
+    })
+
+
+def _count(queryset, estimate):
+    return estimate_count(queryset) if estimate else queryset.count()
+
+
+def leaderboard(size=LEADERBOARD_SIZE):
+    """Top published courses by students, read off the (status, total_students) index"""
+    courses = Course.objects.filter(status='published').order_by('-total_students', '-id').values(
+        'id', 'title', 'slug', 'instructor__first_name', 'instructor__last_name',
+        'total_students', 'average_rating'
+    )[:size]
+    return [
+        {
+            'id': str(course['id']),
+            'title': course['title'],
+            'slug': course['slug'],
+            'instructor__first_name': course['instructor__first_name'],
+            'instructor__last_name': course['instructor__last_name'],
+            'enrollment_count': course['total_students'],
+            'average_rating': float(course['average_rating']),
+        }
+        for course in courses
+    ]
+
+
+def refresh_platform_stats(estimate=False, leaderboard_size=LEADERBOARD_SIZE):
+    """Recompute the PlatformStats row; ``estimate`` trades exact counts for speed"""
+    from enrollments.models import Enrollment
+    from reviews.models import Review
+
+    User = get_user_model()
+    courses = Course.objects.aggregate(
+        total=Count('pk'), published=Count('pk', filter=Q(status='published'))
+    )
+
+    boundary = rollups.materialized_until()
+    revenue = DailyCourseStats.objects.aggregate(total=Sum('revenue'))['total'] or 0
+    tail = Enrollment.objects.all()
+    if boundary:
+        tail = tail.filter(enrolled_at__gte=boundary)
+    revenue += tail.aggregate(total=Sum('amount_paid'))['total'] or 0
+
+    values = {
+        'total_users': _count(User.objects.all(), estimate),
+        'total_students': _count(User.objects.filter(user_type='student'), estimate),
+        'total_instructors': User.objects.filter(user_type='instructor').count(),
+        'total_courses': courses['total'],
+        'published_courses': courses['published'],
+        'total_enrollments': _count(Enrollment.objects.all(), estimate),
+        'total_reviews': _count(Review.objects.all(), estimate),
+        'total_revenue': revenue,
+        'top_courses': leaderboard(leaderboard_size),
+        'counts_estimated': estimate,
+        'refreshed_at': timezone.now(),
+    }
+    PlatformStats.objects.update_or_create(pk=1, defaults=values)
+    return values
+
+
+def get_platform_stats():
+    """The PlatformStats row, computed on first use"""
+    stats = PlatformStats.load()
+    if stats.refreshed_at is None:
+        refresh_platform_stats()
+        stats.refresh_from_db()
+    return stats
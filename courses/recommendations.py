@@ -0,0 +1,186 @@
+"""
+Co-enrollment ("students also took") recommendations.
+
+The builder streams ``Enrollment`` rows ordered by student into sparse
+student x course blocks and accumulates the course co-occurrence matrix
+``A.T @ A`` one block at a time, so memory depends on the catalog size and
+the block size, never on the number of enrollments. Courses are compared by
+the cosine of their enrollment vectors and the top-k of each course are
+stored in ``CourseRecommendation``.
+"""
+import numpy as np
+from scipy import sparse
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from . import stamps
+from .models import Course, CourseRecommendation
+
+CO_ENROLLMENT = 'co_enrollment'
+CO_ENROLLMENT_STAMP = 'recommendations:co_enrollment'
+
+DEFAULT_TOP_K = 12
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def _student_blocks(enrollments, chunk_size):
+    """
+    Yield lists of ``(student_id, course_id)`` holding complete students.
+
+    The rows of the last student of a chunk are carried into the next one
+    so that no student's enrollments are split across blocks.
+    """
+    rows = enrollments.order_by('student_id').values_list('student_id', 'course_id')
+    block = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        if len(block) >= chunk_size and row[0] != block[-1][0]:
+            yield block
+            block = []
+        block.append(row)
+    if block:
+        yield block
+
+
+def _block_matrix(block, course_index):
+    """Binary (students in block) x (all courses) CSR matrix"""
+    students = np.fromiter((student for student, _ in block), dtype=np.int64, count=len(block))
+    courses = np.fromiter((course_index.get(course, -1) for _, course in block), dtype=np.int64, count=len(block))
+    known = courses >= 0
+    _, student_rows = np.unique(students[known], return_inverse=True)
+    return sparse.csr_matrix(
+        (np.ones(known.sum(), dtype=np.float32), (student_rows, courses[known])),
+        shape=(student_rows.max() + 1 if student_rows.size else 0, len(course_index)),
+    )
+
+
+def co_occurrence(enrollments, course_index, row_courses=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return the sparse co-enrollment matrix for ``row_courses`` (all
+    courses when None) against every course in ``course_index``.
+    """
+    row_idx = None
+    if row_courses is not None:
+        row_idx = np.array([course_index[course] for course in row_courses], dtype=np.int64)
+
+    rows = len(course_index) if row_idx is None else len(row_idx)
+    total = sparse.csr_matrix((rows, len(course_index)), dtype=np.float32)
+    for block in _student_blocks(enrollments, chunk_size):
+        matrix = _block_matrix(block, course_index)
+        left = matrix if row_idx is None else matrix[:, row_idx]
+        total = total + (left.T @ matrix).tocsr()
+    return total
+
+
+def top_k_similar(co_matrix, row_courses, course_ids, enrollment_counts, allowed, top_k, min_support=1):
+    """
+    Turn co-occurrence counts into cosine scores and keep the ``top_k`` of
+    each row. Returns ``{course_id: [(course_id, score), ...]}``.
+    """
+    counts = np.asarray(enrollment_counts, dtype=np.float64)
+    course_position = {course: index for index, course in enumerate(course_ids)}
+    results = {}
+
+    co_matrix = co_matrix.tocsr()
+    for row, course in enumerate(row_courses):
+        start, end = co_matrix.indptr[row], co_matrix.indptr[row + 1]
+        columns = co_matrix.indices[start:end]
+        shared = co_matrix.data[start:end].astype(np.float64)
+
+        own = course_position[course]
+        keep = (columns != own) & allowed[columns] & (shared >= min_support)
+        columns, shared = columns[keep], shared[keep]
+        if columns.size == 0 or counts[own] == 0:
+            results[course] = []
+            continue
+
+        scores = shared / np.sqrt(counts[own] * counts[columns])
+        if scores.size > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            best = np.arange(scores.size)
+        best = best[np.argsort(-scores[best], kind='stable')]
+        results[course] = [(course_ids[columns[i]], float(scores[i])) for i in best]
+    return results
+
+
+def store_recommendations(results, source=CO_ENROLLMENT):
+    """Replace the stored ``source`` lists of the given courses"""
+    with transaction.atomic():
+        CourseRecommendation.objects.filter(course_id__in=list(results), source=source).delete()
+        CourseRecommendation.objects.bulk_create([
+            CourseRecommendation(
+                course_id=course, recommended_course_id=other, source=source, rank=rank, score=score
+            )
+            for course, similar in results.items()
+            for rank, (other, score) in enumerate(similar, start=1)
+        ], batch_size=5000)
+
+
+def changed_courses(since):
+    """
+    Courses whose co-occurrence counts moved since ``since``: every course
+    taken by a student with an enrollment created or updated after it.
+    """
+    from enrollments.models import Enrollment
+
+    students = Enrollment.objects.filter(
+        Q(enrolled_at__gte=since) | Q(updated_at__gte=since)
+    ).values('student_id')
+    return set(
+        Enrollment.objects.filter(student_id__in=students).values_list('course_id', flat=True).distinct()
+    )
+
+
+def build_recommendations(incremental=False, top_k=DEFAULT_TOP_K, chunk_size=DEFAULT_CHUNK_SIZE,
+                          min_support=1, batch_size=1000):
+    """
+    Rebuild co-enrollment recommendations.
+
+    With ``incremental`` only courses sharing a student with an enrollment
+    changed since the previous run are recomputed; the cosine norms of other
+    courses drift slightly until the next full run. A deleted enrollment
+    leaves no row to find the affected courses by, so an incremental run
+    after a deletion (``stamps.ENROLLMENTS_REMOVED``) rebuilds everything.
+    Returns the number of courses written.
+    """
+    from enrollments.models import Enrollment
+
+    started_at = timezone.now()
+    courses = list(Course.objects.order_by('pk').values_list('pk', 'status'))
+    course_ids = [pk for pk, _ in courses]
+    course_index = {pk: index for index, pk in enumerate(course_ids)}
+    allowed = np.array([status == 'published' for _, status in courses], dtype=bool)
+
+    counts = dict(Enrollment.objects.order_by().values('course_id').annotate(
+        total=Count('pk')
+    ).values_list('course_id', 'total'))
+    enrollment_counts = [counts.get(pk, 0) for pk in course_ids]
+
+    enrollments = Enrollment.objects.all()
+    targets, row_courses = course_ids, None
+    if incremental:
+        run_stamps = stamps.get_stamps(CO_ENROLLMENT_STAMP, stamps.ENROLLMENTS_REMOVED)
+        last_run = run_stamps.get(CO_ENROLLMENT_STAMP)
+        removed = run_stamps.get(stamps.ENROLLMENTS_REMOVED)
+        if last_run is not None and (removed is None or removed < last_run):
+            targets = row_courses = [pk for pk in changed_courses(last_run) if pk in course_index]
+            # Only students who took a changed course contribute to its row
+            enrollments = Enrollment.objects.filter(
+                student__in=Enrollment.objects.filter(course__in=targets).values('student')
+            )
+
+    written = 0
+    if targets:
+        matrix = co_occurrence(enrollments, course_index, row_courses, chunk_size)
+        for offset in range(0, len(targets), batch_size):
+            batch = targets[offset:offset + batch_size]
+            results = top_k_similar(
+                matrix[offset:offset + batch_size], batch, course_ids,
+                enrollment_counts, allowed, top_k, min_support
+            )
+            store_recommendations(results)
+            written += len(batch)
+
+    stamps.touch(CO_ENROLLMENT_STAMP, at=started_at)
+    return written
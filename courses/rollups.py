@@ -0,0 +1,204 @@
+"""
+Daily course facts.
+
+``DailyCourseStats`` holds, for each course and calendar day, the number
+of enrollments and completions, the revenue and the number of approved
+reviews, denormalized with the course's instructor and category so that
+dashboards can group by any of them without joins.
+
+``materialize_daily_stats`` recomputes whole days from the source tables
+and replaces them, so running it again over the same days is harmless.
+The ``rollups:daily`` change stamp records the first day that is not
+materialized yet; readers add the live tail after it themselves.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from . import stamps
+from .models import DailyCourseStats
+
+DAILY_STATS_STAMP = 'rollups:daily'
+
+# Days recomputed before the last boundary on incremental runs, to pick
+# up rows that were edited after their day was materialized
+DEFAULT_LOOKBACK_DAYS = 2
+# Days materialized per transaction
+WINDOW_DAYS = 31
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def materialized_until():
+    """Start of the first day that is not in the fact table, or None"""
+    return stamps.get_stamp(DAILY_STATS_STAMP)
+
+
+def _facts(start, end):
+    """``{(course_id, day): row}`` computed from the source tables"""
+    from enrollments.models import Enrollment
+    from reviews.models import Review
+
+    sources = (
+        Enrollment.objects.filter(enrolled_at__gte=start, enrolled_at__lt=end).annotate(
+            day=TruncDate('enrolled_at')
+        ).values('course_id', 'day').annotate(enrollments=Count('pk'), revenue=Sum('amount_paid')),
+        Enrollment.objects.filter(completed_at__gte=start, completed_at__lt=end).annotate(
+            day=TruncDate('completed_at')
+        ).values('course_id', 'day').annotate(completions=Count('pk')),
+        Review.objects.filter(created_at__gte=start, created_at__lt=end, is_approved=True).annotate(
+            day=TruncDate('created_at')
+        ).values('course_id', 'day').annotate(reviews=Count('pk')),
+    )
+    facts = {}
+    for source in sources:
+        for row in source.order_by():
+            key = (row.pop('course_id'), row.pop('day'))
+            facts.setdefault(key, {}).update(row)
+    return facts
+
+
+def materialize_days(first_day, last_day):
+    """Replace the facts of ``[first_day, last_day)`` in one transaction"""
+    from .models import Course
+
+    start, end = day_start(first_day), day_start(last_day)
+    facts = _facts(start, end)
+    courses = dict(
+        (pk, (instructor_id, category_id))
+        for pk, instructor_id, category_id in Course.objects.filter(
+            pk__in={course_id for course_id, _ in facts}
+        ).values_list('pk', 'instructor_id', 'category_id')
+    )
+
+    rows = []
+    for (course_id, day), values in facts.items():
+        instructor_id, category_id = courses[course_id]
+        rows.append(DailyCourseStats(
+            course_id=course_id, date=day, instructor_id=instructor_id, category_id=category_id,
+            enrollments=values.get('enrollments', 0),
+            completions=values.get('completions', 0),
+            revenue=values.get('revenue') or 0,
+            reviews=values.get('reviews', 0),
+        ))
+
+    with transaction.atomic():
+        DailyCourseStats.objects.filter(date__gte=first_day, date__lt=last_day).delete()
+        DailyCourseStats.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def materialize_daily_stats(since=None, lookback_days=DEFAULT_LOOKBACK_DAYS):
+    """
+    Materialize every complete day from ``since`` (a date) up to yesterday.
+
+    Without ``since`` the run continues from the stored boundary minus
+    ``lookback_days``, or starts with the first enrollment when the table
+    has never been built. A ``since`` after the first unmaterialized day is
+    moved back to it, so no day is skipped. Returns the number of fact rows
+    written.
+    """
+    from enrollments.models import Enrollment
+
+    today = timezone.localdate()
+    boundary = materialized_until()
+    if boundary is not None:
+        pending = timezone.localtime(boundary).date()
+        resume = pending - timedelta(days=lookback_days)
+    else:
+        first = Enrollment.objects.order_by('enrolled_at').values_list('enrolled_at', flat=True).first()
+        pending = resume = timezone.localtime(first).date() if first else today
+    # Days before the boundary are served from the facts and days after it
+    # from the live tail; skipping one would drop it from both
+    since = resume if since is None else min(since, pending)
+
+    written = 0
+    day = since
+    while day < today:
+        window_end = min(day + timedelta(days=WINDOW_DAYS), today)
+        written += materialize_days(day, window_end)
+        day = window_end
+
+    stamps.touch(DAILY_STATS_STAMP, at=day_start(today))
+    return written
+
+
+def period_starts(period, count, today=None):
+    """The ``count`` most recent calendar months or ISO weeks, oldest first"""
+    today = today or timezone.localdate()
+    starts = []
+    if period == 'month':
+        year, month = today.year, today.month
+        for _ in range(count):
+            starts.append(today.replace(year=year, month=month, day=1))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    else:
+        monday = today - timedelta(days=today.weekday())
+        starts = [monday - timedelta(weeks=i) for i in range(count)]
+    return starts[::-1]
+
+
+def tail_start(period, boundary):
+    """
+    Start of the live tail added to the current period: the materialized
+    boundary, but never before the period itself begins.
+    """
+    current = day_start(period_starts(period, 1)[0])
+    return max(boundary, current) if boundary else current
+
+
+def tail_aggregates(name, since):
+    """Conditional aggregates to add to an ``Enrollment`` aggregate() for a live tail"""
+    recent = Q(enrolled_at__gte=since)
+    return {
+        f'{name}_revenue': Sum('amount_paid', filter=recent),
+        f'{name}_enrollments': Count('pk', filter=recent),
+    }
+
+
+def pop_tail(row, name):
+    return {
+        'revenue': row.pop(f'{name}_revenue'),
+        'enrollments': row.pop(f'{name}_enrollments'),
+    }
+
+
+def series(period, count, live_tail=None, **filters):
+    """
+    Revenue and enrollments per calendar month or ISO week, from one
+    grouped query over the fact table.
+
+    ``live_tail`` holds the revenue and enrollments after ``tail_start``,
+    which are added to the current period.
+    """
+    starts = period_starts(period, count)
+    trunc = TruncMonth('date') if period == 'month' else TruncWeek('date')
+    rows = DailyCourseStats.objects.filter(date__gte=starts[0], **filters).annotate(
+        period=trunc
+    ).values('period').annotate(
+        revenue=Sum('revenue'), enrollments=Sum('enrollments')
+    ).order_by()
+    totals = {row['period']: row for row in rows}
+
+    points = []
+    for start in starts:
+        row = totals.get(start, {})
+        points.append({
+            'period': start,
+            'revenue': float(row.get('revenue') or 0),
+            'enrollments': row.get('enrollments') or 0,
+        })
+    return add_tail(points, live_tail)
+
+
+def add_tail(points, live_tail):
+    """Add a live tail to the current (last) period of a series"""
+    if live_tail and points:
+        points[-1]['revenue'] += float(live_tail.get('revenue') or 0)
+        points[-1]['enrollments'] += live_tail.get('enrollments') or 0
+    return points
+
@@ -0,0 +1,143 @@
+"""
+Ranked full-text search for the course catalog.
+
+Every course is tokenized into ``CourseSearchTerm`` postings (one row per
+course and term, weighted by the field the term came from). A query is
+answered with indexed lookups on ``term`` instead of ``icontains`` scans,
+so it runs the same way on SQLite, MySQL and PostgreSQL.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+# Relative importance of each indexed field
+FIELD_WEIGHTS = {
+    'title': 10,
+    'tags': 6,
+    'instructor': 5,
+    'short_description': 3,
+    'description': 1,
+}
+
+# Repeated occurrences of a term stop counting after this many
+MAX_TERM_FREQUENCY = 3
+
+MAX_TERM_LENGTH = 64
+MIN_PREFIX_LENGTH = 2
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how',
+    'in', 'into', 'is', 'it', 'of', 'on', 'or', 'that', 'the', 'this', 'to',
+    'with', 'you', 'your',
+})
+
+
+def tokenize(text):
+    """Split text into lowercase index terms"""
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def course_postings(course):
+    """Return a ``{term: weight}`` mapping for a course"""
+    instructor = course.instructor
+    fields = {
+        'title': course.title,
+        'short_description': course.short_description,
+        'description': course.description,
+        'tags': ' '.join(tag.name for tag in course.tags.all()),
+        'instructor': f'{instructor.first_name} {instructor.last_name}',
+    }
+    postings = Counter()
+    for field, text in fields.items():
+        counts = Counter(tokenize(text))
+        for term, count in counts.items():
+            postings[term] += FIELD_WEIGHTS[field] * min(count, MAX_TERM_FREQUENCY)
+    return postings
+
+
+def index_course(course_id):
+    """Rebuild the postings of a single course"""
+    from .models import Course, CourseSearchTerm
+
+    course = Course.objects.select_related('instructor').prefetch_related(
+        'tags'
+    ).filter(pk=course_id).first()
+
+    with transaction.atomic():
+        CourseSearchTerm.objects.filter(course_id=course_id).delete()
+        if course is None:
+            return 0
+        rows = [
+            CourseSearchTerm(course_id=course_id, term=term, weight=weight)
+            for term, weight in course_postings(course).items()
+        ]
+        CourseSearchTerm.objects.bulk_create(rows)
+    return len(rows)
+
+
+def parse_query(query):
+    """
+    Turn a raw search string into ``(term, is_prefix)`` pairs.
+
+    The last word is matched as a prefix unless the query ends with
+    whitespace, so results keep up while the user is still typing.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    parsed = [(term, False) for term in terms[:-1]]
+    last = terms[-1]
+    if query[-1:].isspace():
+        parsed.append((last, False))
+    elif len(last) >= MIN_PREFIX_LENGTH:
+        parsed.append((last, True))
+    return parsed
+
+
+def _term_q(term, is_prefix):
+    if is_prefix:
+        return Q(term__startswith=term)
+    return Q(term=term)
+
+
+def search_courses(queryset, query, ranked=True):
+    """
+    Restrict a course queryset to courses matching every query term and,
+    when ``ranked``, annotate it with ``search_rank`` (higher is more
+    relevant).
+    """
+    from .models import CourseSearchTerm
+
+    terms = parse_query(query)
+    if not terms:
+        return queryset
+
+    any_term = Q()
+    for term, is_prefix in terms:
+        queryset = queryset.filter(
+            pk__in=CourseSearchTerm.objects.filter(
+                _term_q(term, is_prefix)
+            ).values('course_id')
+        )
+        any_term |= _term_q(term, is_prefix)
+
+    if not ranked:
+        return queryset
+
+    rank = CourseSearchTerm.objects.filter(
+        any_term, course=OuterRef('pk')
+    ).values('course').annotate(rank=Sum('weight')).values('rank')
+
+    return queryset.annotate(search_rank=Coalesce(Subquery(rank), 0))
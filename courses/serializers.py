@@ -1,19 +1,18 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 from .models import Category, Course, Section, Lesson, CourseTag
 from users.serializers import UserListSerializer
+from .curriculum import get_curriculum
 import json
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for course categories"""
     
-    course_count = serializers.SerializerMethodField()
+    course_count = serializers.IntegerField(source='published_course_count', read_only=True)
     
     class Meta:
         model = Category
         fields = ['id', 'name', 'slug', 'description', 'icon', 'color', 'course_count']
-    
-    def get_course_count(self, obj):
-        return obj.courses.filter(status='published').count()
 
 class CourseTagSerializer(serializers.ModelSerializer):
     """Serializer for course tags"""
@@ -46,14 +45,12 @@ class SectionSerializer(serializers.ModelSerializer):
             'lessons', 'lesson_count', 'total_duration'
         ]
     
+    # Both read the prefetched lessons instead of querying per section
     def get_lesson_count(self, obj):
-        return obj.lessons.count()
+        return len(obj.lessons.all())
     
     def get_total_duration(self, obj):
-        from django.db.models import Sum
-        return obj.lessons.aggregate(
-            total=Sum('duration_minutes')
-        )['total'] or 0
+        return sum(lesson.duration_minutes for lesson in obj.lessons.all())
 
 class CourseListSerializer(serializers.ModelSerializer):
     """Serializer for course list view"""
@@ -79,9 +76,13 @@ class CourseDetailSerializer(serializers.ModelSerializer):
     instructor = UserListSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     tags = CourseTagSerializer(many=True, read_only=True)
-    sections = SectionSerializer(many=True, read_only=True)
     discount_percentage = serializers.ReadOnlyField()
     
+    # Served from the compiled curriculum document
+    sections = serializers.SerializerMethodField()
+    total_lessons = serializers.SerializerMethodField()
+    total_duration_minutes = serializers.SerializerMethodField()
+    
     # Parse JSON fields
     what_you_will_learn_list = serializers.SerializerMethodField()
     requirements_list = serializers.SerializerMethodField()
@@ -97,9 +98,18 @@ class CourseDetailSerializer(serializers.ModelSerializer):
             'requirements', 'requirements_list', 'target_audience', 'target_audience_list',
             'is_bestseller', 'is_featured', 'total_students', 'average_rating',
             'total_reviews', 'discount_percentage', 'tags', 'sections',
-            'created_at', 'published_at'
+            'total_lessons', 'total_duration_minutes', 'created_at', 'published_at'
         ]
     
+    def get_sections(self, obj):
+        return get_curriculum(obj).sections
+    
+    def get_total_lessons(self, obj):
+        return get_curriculum(obj).lesson_count
+    
+    def get_total_duration_minutes(self, obj):
+        return get_curriculum(obj).total_duration_minutes
+    
     def get_what_you_will_learn_list(self, obj):
         try:
             return json.loads(obj.what_you_will_learn) if obj.what_you_will_learn else []
@@ -116,4 +126,46 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         try:
             return json.loads(obj.target_audience) if obj.target_audience else []
         except json.JSONDecodeError:
-            return []
\ No newline at end of file
+            return []
+
+class CourseSummarySerializer(serializers.Serializer):
+    """Compact course representation read from a values() projection"""
+    
+    FIELDS = (
+        'id', 'title', 'slug', 'thumbnail', 'price', 'is_free',
+        'average_rating', 'total_students'
+    )
+    
+    id = serializers.UUIDField()
+    title = serializers.CharField()
+    slug = serializers.SlugField()
+    thumbnail = serializers.SerializerMethodField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    is_free = serializers.BooleanField()
+    average_rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+    total_students = serializers.IntegerField()
+    
+    @classmethod
+    def value_fields(cls, prefix=''):
+        """Lookups to pass to values() for courses reached through ``prefix``"""
+        return [f'{prefix}{field}' for field in cls.FIELDS]
+    
+    @classmethod
+    def strip_prefix(cls, rows, prefix):
+        """Rename values() keys back to the summary field names"""
+        return [
+            {key[len(prefix):] if key.startswith(prefix) else key: value for key, value in row.items()}
+            for row in rows
+        ]
+    
+    def get_thumbnail(self, obj):
+        if not obj.get('thumbnail'):
+            return None
+        url = default_storage.url(obj['thumbnail'])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class RecommendedCourseSerializer(CourseSummarySerializer):
+    """Course summary with its recommendation score"""
+    
+    score = serializers.FloatField()
@@ -0,0 +1,208 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Category, Course, CourseTag, Section, Lesson
+from . import search, stamps
+from .autocomplete import catalog_autocomplete
+from .curriculum import rebuild_curriculum
+from .counters import refresh_category_counts
+from .dashboards import invalidate_instructor_dashboard
+
+User = get_user_model()
+
+
+def _reindex_on_commit(course_ids):
+    course_ids = list(course_ids)
+
+    def reindex():
+        for course_id in course_ids:
+            search.index_course(course_id)
+
+    transaction.on_commit(reindex)
+
+
+@receiver(post_save, sender=Course)
+def reindex_course(sender, instance, raw=False, **kwargs):
+    """Keep the search index in step with course edits"""
+    if raw:
+        return
+    _reindex_on_commit([instance.pk])
+
+
+def _mark_courses_edited(course_ids):
+    # Tag changes bypass Course.save; bump updated_at so incremental jobs
+    # (similar courses) pick the courses up
+    Course.objects.filter(pk__in=course_ids).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def reindex_course_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex courses whose tags were added or removed"""
+    if action == 'pre_clear' and reverse:
+        # The cleared courses are gone by post_clear
+        instance._cleared_course_ids = list(instance.courses.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        course_ids = [instance.pk]
+    elif action == 'post_clear':
+        course_ids = instance.__dict__.pop('_cleared_course_ids', [])
+    else:
+        course_ids = list(pk_set or ())
+    if course_ids:
+        _mark_courses_edited(course_ids)
+        _reindex_on_commit(course_ids)
+    stamps.touch(stamps.CATALOG)
+
+
+@receiver(post_save, sender=CourseTag)
+def reindex_tagged_courses(sender, instance, created, raw=False, **kwargs):
+    """A renamed tag changes the postings of every course using it"""
+    if raw or created:
+        return
+    course_ids = list(instance.courses.values_list('pk', flat=True))
+    _mark_courses_edited(course_ids)
+    _reindex_on_commit(course_ids)
+
+
+@receiver(pre_delete, sender=CourseTag)
+def reindex_untagged_courses(sender, instance, **kwargs):
+    """Deleting a tag drops it from its courses without m2m_changed"""
+    course_ids = list(instance.courses.values_list('pk', flat=True))
+    _mark_courses_edited(course_ids)
+    _reindex_on_commit(course_ids)
+
+
+# User fields that UserListSerializer embeds in course payloads
+# (``full_name`` is derived from the names)
+INSTRUCTOR_PAYLOAD_FIELDS = ('username', 'first_name', 'last_name', 'profile_picture', 'user_type')
+
+
+def _instructor_payload_state(instance):
+    # Read from __dict__ so deferred fields are not loaded; files compare by name
+    return {
+        name: getattr(instance.__dict__.get(name), 'name', instance.__dict__.get(name))
+        for name in INSTRUCTOR_PAYLOAD_FIELDS
+    }
+
+
+@receiver(post_init, sender=User)
+def remember_instructor_payload(sender, instance, **kwargs):
+    instance._instructor_payload = _instructor_payload_state(instance)
+
+
+@receiver(post_save, sender=User)
+def reindex_instructor_courses(sender, instance, created, raw=False, **kwargs):
+    """Instructor details are embedded in course payloads and names are indexed"""
+    old_state = instance._instructor_payload
+    instance._instructor_payload = new_state = _instructor_payload_state(instance)
+    if raw or created:
+        return
+    changed = {name for name in INSTRUCTOR_PAYLOAD_FIELDS if old_state[name] != new_state[name]}
+    if not changed:
+        return
+    course_ids = list(instance.courses_taught.values_list('pk', flat=True))
+    if not course_ids:
+        return
+    if changed & {'first_name', 'last_name'}:
+        _reindex_on_commit(course_ids)
+    stamps.touch(stamps.CATALOG)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=CourseTag)
+@receiver(post_delete, sender=CourseTag)
+def touch_catalog(sender, raw=False, **kwargs):
+    """Invalidate catalog validators and caches on any catalog edit"""
+    if not raw:
+        stamps.touch(stamps.CATALOG)
+
+
+@receiver(post_init, sender=Course)
+def remember_catalog_state(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    instance._catalog_state = (instance.__dict__.get('status'), instance.__dict__.get('category_id'))
+
+
+@receiver(post_save, sender=Course)
+def update_category_counts(sender, instance, created, raw=False, **kwargs):
+    """Recount categories when a course is published, archived or recategorized"""
+    if raw:
+        return
+    old_status, old_category = (None, None) if created else instance._catalog_state
+    new_state = (instance.status, instance.category_id)
+    instance._catalog_state = new_state
+    if (old_status, old_category) == new_state:
+        return
+    if 'published' not in (old_status, instance.status):
+        return
+    refresh_category_counts({old_category, instance.category_id})
+    stamps.touch(stamps.CATEGORIES)
+
+
+@receiver(post_delete, sender=Course)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        refresh_category_counts([instance.category_id])
+        stamps.touch(stamps.CATEGORIES)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_list(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stamps.touch(stamps.CATEGORIES, stamps.CATALOG)
+
+
+def _rebuild_curriculum_on_commit(course_id):
+    if course_id is None:
+        return
+
+    def rebuild():
+        rebuild_curriculum(course_id)
+        stamps.touch(stamps.CATALOG)
+
+    transaction.on_commit(rebuild)
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_delete, sender=Section)
+def rebuild_section_curriculum(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _rebuild_curriculum_on_commit(instance.course_id)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def rebuild_lesson_curriculum(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    course_id = Section.objects.filter(pk=instance.section_id).values_list('course_id', flat=True).first()
+    _rebuild_curriculum_on_commit(course_id)
+
+
+@receiver(post_save, sender=Course)
+def refresh_autocomplete(sender, instance, raw=False, **kwargs):
+    """Patch this process's typeahead index; other workers poll the stamp"""
+    if not raw:
+        course_id = instance.pk
+        transaction.on_commit(lambda: catalog_autocomplete.refresh_courses([course_id]))
+
+
+@receiver(post_delete, sender=Course)
+def remove_from_autocomplete(sender, instance, **kwargs):
+    course_id = instance.pk
+    transaction.on_commit(lambda: catalog_autocomplete.remove_course(course_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_dashboard(sender, instance, raw=False, **kwargs):
+    """Course counts by status are part of the instructor dashboard"""
+    if not raw:
+        instructor_id = instance.instructor_id
+        transaction.on_commit(lambda: invalidate_instructor_dashboard(instructor_id))
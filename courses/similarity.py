@@ -0,0 +1,178 @@
+"""
+Content-based "similar courses".
+
+Every course becomes a bag of weighted terms taken from its text fields,
+tags, category and difficulty level. The catalog is vectorized into a
+sparse TF-IDF matrix with L2-normalized rows, so cosine similarity is a
+sparse matrix product computed in row blocks. The top-k published
+neighbours of each course are stored as ``content`` recommendations, which
+places new courses that have no enrollments yet.
+"""
+import math
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from django.db.models import Count, Min
+from django.utils import timezone
+from . import stamps
+from .models import Course, CourseRecommendation
+from .recommendations import DEFAULT_TOP_K, store_recommendations
+from .search import tokenize
+
+CONTENT = 'content'
+CONTENT_STAMP = 'recommendations:content'
+
+# Relative importance of each text field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.0,
+    'short_description': 1.5,
+    'what_you_will_learn': 1.0,
+    'description': 1.0,
+}
+
+# Category and difficulty level are added as one synthetic term each
+CATEGORY_WEIGHT = 2.0
+DIFFICULTY_WEIGHT = 1.0
+
+# Rows multiplied against the whole catalog at a time
+BLOCK_SIZE = 256
+
+
+def course_terms(course, tags):
+    """Return ``{term: weight}`` with sublinear term frequencies"""
+    terms = Counter()
+    for field, weight in FIELD_WEIGHTS.items():
+        text = ' '.join(tags) if field == 'tags' else course[field]
+        for term, count in Counter(tokenize(text)).items():
+            terms[term] += weight * (1 + math.log(count))
+    terms[f'category:{course["category_id"]}'] += CATEGORY_WEIGHT
+    terms[f'difficulty:{course["difficulty_level"]}'] += DIFFICULTY_WEIGHT
+    return terms
+
+
+class ContentIndex:
+    """Row-normalized TF-IDF matrix over the whole catalog"""
+
+    def __init__(self, course_ids, published, matrix):
+        self.course_ids = course_ids
+        self.positions = {pk: row for row, pk in enumerate(course_ids)}
+        self.published = published
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls):
+        text_fields = [field for field in FIELD_WEIGHTS if field != 'tags']
+        courses = list(Course.objects.order_by('pk').values(
+            'pk', 'status', 'category_id', 'difficulty_level', *text_fields
+        ))
+        tags = {}
+        for course_id, name in Course.objects.filter(tags__isnull=False).values_list('pk', 'tags__name'):
+            tags.setdefault(course_id, []).append(name)
+
+        vocabulary, rows, columns, weights = {}, [], [], []
+        for row, course in enumerate(courses):
+            for term, weight in course_terms(course, tags.get(course['pk'], ())).items():
+                rows.append(row)
+                columns.append(vocabulary.setdefault(term, len(vocabulary)))
+                weights.append(weight)
+
+        shape = (len(courses), len(vocabulary))
+        tf = sparse.csr_matrix((weights, (rows, columns)), shape=shape, dtype=np.float64)
+
+        document_frequency = np.bincount(tf.indices, minlength=shape[1])
+        idf = np.log((1 + shape[0]) / (1 + document_frequency)) + 1
+        matrix = tf @ sparse.diags(idf)
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = (sparse.diags(1 / norms) @ matrix).tocsr()
+
+        published = np.array([course['status'] == 'published' for course in courses], dtype=bool)
+        return cls([course['pk'] for course in courses], published, matrix)
+
+    def scores(self, rows):
+        """Cosine similarity of the given rows against every course"""
+        return (self.matrix[rows] @ self.matrix.T).tocsr()
+
+    def similar(self, rows, top_k):
+        """Return ``{course_id: [(course_id, score), ...]}`` for the given rows"""
+        results = {}
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = rows[start:start + BLOCK_SIZE]
+            scores = self.scores(block)
+            for offset, row in enumerate(block):
+                begin, end = scores.indptr[offset], scores.indptr[offset + 1]
+                columns, values = scores.indices[begin:end], scores.data[begin:end]
+                keep = (columns != row) & self.published[columns] & (values > 0)
+                columns, values = columns[keep], values[keep]
+
+                if values.size > top_k:
+                    best = np.argpartition(-values, top_k - 1)[:top_k]
+                else:
+                    best = np.arange(values.size)
+                best = best[np.argsort(-values[best], kind='stable')]
+                results[self.course_ids[row]] = [
+                    (self.course_ids[columns[i]], float(values[i])) for i in best
+                ]
+        return results
+
+
+def _affected_rows(index, changed, top_k):
+    """
+    Rows whose stored list may move because of the ``changed`` rows: the
+    changed courses themselves, courses currently listing one of them, and
+    courses for which a changed course now beats their weakest entry.
+    """
+    changed_ids = [index.course_ids[row] for row in changed]
+    affected = set(changed)
+
+    listing = CourseRecommendation.objects.filter(
+        source=CONTENT, recommended_course_id__in=changed_ids
+    ).values_list('course_id', flat=True)
+    affected.update(index.positions[pk] for pk in listing if pk in index.positions)
+
+    stored = CourseRecommendation.objects.filter(source=CONTENT).values('course_id').annotate(
+        weakest=Min('score'), entries=Count('pk')
+    ).values_list('course_id', 'weakest', 'entries')
+    thresholds = np.zeros(len(index.course_ids))
+    for course_id, weakest, entries in stored:
+        if entries >= top_k and course_id in index.positions:
+            thresholds[index.positions[course_id]] = weakest
+
+    candidates = [row for row in changed if index.published[row]]
+    if candidates:
+        best = np.asarray(index.scores(candidates).max(axis=0).todense()).ravel()
+        affected.update(np.flatnonzero((best > thresholds) & index.published).tolist())
+    return sorted(affected)
+
+
+def build_similar_courses(incremental=False, top_k=DEFAULT_TOP_K):
+    """
+    Rebuild content-similarity lists.
+
+    With ``incremental`` only the courses edited since the previous run and
+    the lists they can enter or leave are recomputed. Returns the number of
+    courses written.
+    """
+    started_at = timezone.now()
+    index = ContentIndex.build()
+    rows = list(range(len(index.course_ids)))
+
+    if incremental:
+        last_run = stamps.get_stamp(CONTENT_STAMP)
+        if last_run is not None:
+            edited = Course.objects.filter(updated_at__gte=last_run).values_list('pk', flat=True)
+            changed = [index.positions[pk] for pk in edited if pk in index.positions]
+            rows = _affected_rows(index, changed, top_k) if changed else []
+
+    published_rows = [row for row in rows if index.published[row]]
+    results = index.similar(published_rows, top_k)
+    # Unpublished courses neither get a list nor appear in one
+    results.update({index.course_ids[row]: [] for row in rows if not index.published[row]})
+    store_recommendations(results, source=CONTENT)
+
+    stamps.touch(CONTENT_STAMP, at=started_at)
+    return len(results)
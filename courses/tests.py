@@ -1,3 +1,393 @@
-from django.test import TestCase
+import base64
+import itertools
+import json
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from enrollments.models import Enrollment
+from lms_backend.concurrency import QUERY_CONN_MAX_AGE, gather, run_concurrently
+from lms_backend.reconcile import reconcile
+from reviews.models import Review
+from .counters import course_counters, refresh_course_stats
+from .models import Category, Course, CourseRecommendation, CourseSearchTerm, CourseTag
+from . import stamps
+from .dashboards import build_admin_dashboard
+from .search import course_postings, parse_query, tokenize
+from .similarity import build_similar_courses
+
+User = get_user_model()
+
+_sequence = itertools.count()
+
+
+def create_user(**fields):
+    number = next(_sequence)
+    fields = {'username': f'user{number}', 'email': f'user{number}@example.com', **fields}
+    return User.objects.create_user(password='pw-123456', **fields)
+
+
+def create_category(**fields):
+    number = next(_sequence)
+    return Category.objects.create(**{'name': f'Category {number}', 'slug': f'category-{number}', **fields})
+
+
+def create_course(**fields):
+    number = next(_sequence)
+    defaults = {
+        'title': f'Course {number}', 'slug': f'course-{number}', 'description': 'd', 'short_description': 's',
+        'difficulty_level': 'beginner', 'duration_hours': 1, 'price': 10, 'status': 'published',
+    }
+    if 'instructor' not in fields:
+        defaults['instructor'] = create_user(user_type='instructor')
+    if 'category' not in fields:
+        defaults['category'] = create_category()
+    return Course.objects.create(**{**defaults, **fields})
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query, **params):
+        response = self.client.get('/api/courses/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [course['title'] for course in response.data['results']]
+
+    def test_tokenize_drops_stop_words_and_single_characters(self):
+        self.assertEqual(tokenize('The Basics of C and Python_3!'), ['basics', 'python'])
+
+    def test_last_word_is_a_prefix_while_typing(self):
+        self.assertEqual(parse_query('machine lea'), [('machine', False), ('lea', True)])
+        self.assertEqual(parse_query('machine lea '), [('machine', False), ('lea', False)])
+        self.assertEqual(parse_query('the a '), [])
+
+    def test_postings_weight_terms_by_field(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course = create_course(title='Python', description='python python python python')
+        postings = course_postings(course)
+        self.assertEqual(postings['python'], 10 + 3)
+        self.assertEqual(
+            dict(CourseSearchTerm.objects.filter(course=course).values_list('term', 'weight'))['python'], 13
+        )
+
+    def test_results_are_ranked_by_weight(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_course(title='Advanced JavaScript', description='python appears once here')
+            create_course(title='Python for beginners')
+            create_course(title='Cooking')
+        self.assertEqual(self.search('python'), ['Python for beginners', 'Advanced JavaScript'])
+        self.assertEqual(self.search('pyth'), ['Python for beginners', 'Advanced JavaScript'])
+        self.assertEqual(len(self.search('python', ordering='price')), 2)
+
+    def test_every_term_must_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_course(title='Machine learning')
+            create_course(title='Machine maintenance')
+        self.assertEqual(self.search('machine learn'), ['Machine learning'])
+
+    def test_instructor_and_tag_changes_are_reindexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            instructor = create_user(user_type='instructor', first_name='Guido', last_name='Rossum')
+            course = create_course(title='Cooking', instructor=instructor)
+            tag = CourseTag.objects.create(name='Machine Learning', slug='machine-learning')
+            course.tags.add(tag)
+        self.assertEqual(self.search('guido'), ['Cooking'])
+        self.assertEqual(self.search('machine'), ['Cooking'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Deep Stuff'
+            tag.save()
+            instructor.first_name = 'Ada'
+            instructor.save()
+        self.assertEqual(self.search('deep'), ['Cooking'])
+        self.assertEqual(self.search('ada'), ['Cooking'])
+        self.assertEqual(self.search('guido'), [])
+
+
+class InstructorPayloadTests(TestCase):
+    def setUp(self):
+        self.instructor = create_user(user_type='instructor')
+        create_course(instructor=self.instructor)
+
+    def assertTouched(self, touched):
+        stamps.touch(stamps.CATALOG, at=stamps.get_stamp(stamps.CATALOG).replace(year=2000))
+        before = stamps.get_stamp(stamps.CATALOG)
+        self.instructor.save()
+        self.assertEqual(stamps.get_stamp(stamps.CATALOG) != before, touched)
+
+    def test_any_serialized_field_touches_the_catalog(self):
+        self.instructor.email = 'other@example.com'
+        self.assertTouched(False)
+        for name, value in (('username', 'renamed'), ('profile_picture', 'profile_pics/a.png'),
+                            ('user_type', 'admin'), ('last_name', 'Hopper')):
+            setattr(self.instructor, name, value)
+            self.assertTouched(True)
+        self.assertTouched(False)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        instructor = create_user(user_type='instructor')
+        category = create_category()
+        # Three pages of 20, with repeated prices so pages must break ties
+        # on the primary key
+        self.ids = {str(create_course(instructor=instructor, category=category, price=number % 4).pk)
+                    for number in range(45)}
+
+    def walk(self, **params):
+        response = self.client.get('/api/courses/', {'paginate': 'cursor', **params})
+        pages = [response.data]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).data)
+        return pages
+
+    def cursor(self, **position):
+        return base64.urlsafe_b64encode(json.dumps({'v': 1, 'pk': '', 'r': 0, **position}).encode()).decode()
+
+    def test_walks_every_row_once_in_both_directions(self):
+        for ordering in ('-created_at', 'price', '-price'):
+            pages = self.walk(ordering=ordering)
+            forward = [course['id'] for page in pages for course in page['results']]
+            self.assertEqual(len(pages), 3, ordering)
+            self.assertEqual(len(forward), len(self.ids), ordering)
+            self.assertEqual(set(forward), self.ids, ordering)
+
+            backward = []
+            page = pages[-1]
+            while page['previous']:
+                page = self.client.get(page['previous']).data
+                backward = [course['id'] for course in page['results']] + backward
+            self.assertEqual(backward, forward[:len(backward)], ordering)
+            self.assertEqual(len(backward), len(forward) - len(pages[-1]['results']), ordering)
+
+    def test_counts_only_on_request(self):
+        self.assertNotIn('count', self.walk()[0])
+        self.assertEqual(self.walk(count='exact')[0]['count'], len(self.ids))
+        self.assertEqual(self.walk(count='estimate')[0]['count'], len(self.ids))
+
+    def test_page_numbers_still_work(self):
+        response = self.client.get('/api/courses/', {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.ids))
+
+    def test_malformed_cursors_are_not_found(self):
+        cursors = [
+            'garbage',
+            base64.urlsafe_b64encode(b'[1, 2]').decode(),
+            self.cursor(v='not a date'),
+            self.cursor(v='2024-01-01T00:00:00', pk='not-a-uuid'),
+            self.cursor(v='2024-01-01T00:00:00', pk=[1]),
+        ]
+        for cursor in cursors:
+            response = self.client.get('/api/courses/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class CategoryCountTests(TestCase):
+    def setUp(self):
+        self.first = create_category()
+        self.second = create_category()
+
+    def assertCounts(self, first, second):
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.published_course_count, self.second.published_course_count), (first, second))
+
+    def test_counts_follow_publishing_moves_and_deletions(self):
+        published = create_course(category=self.first)
+        draft = create_course(category=self.first, status='draft')
+        self.assertCounts(1, 0)
+
+        draft.status = 'published'
+        draft.save()
+        self.assertCounts(2, 0)
+
+        draft.category = self.second
+        draft.save()
+        self.assertCounts(1, 1)
+
+        published.status = 'archived'
+        published.save()
+        draft.delete()
+        self.assertCounts(0, 0)
+
+    def test_category_list_is_cached_until_a_count_changes(self):
+        client = APIClient()
+        first = client.get('/api/courses/categories/')
+        # Only the change stamp is read
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/courses/categories/').data, first.data)
+
+        create_course(category=self.second)
+        counts = {
+            category['slug']: category['course_count']
+            for category in client.get('/api/courses/categories/').data['results']
+        }
+        self.assertEqual(counts, {self.first.slug: 0, self.second.slug: 1})
+
+
+class CourseCounterTests(TestCase):
+    def setUp(self):
+        self.course = create_course()
+        self.students = [create_user() for _ in range(2)]
+
+    def counters(self):
+        self.course.refresh_from_db()
+        return (
+            self.course.total_students, self.course.total_reviews, self.course.rating_sum,
+            self.course.average_rating,
+        )
+
+    def review(self, student, rating):
+        return Review.objects.create(course=self.course, student=student, rating=rating, comment='c')
+
+    def test_enrollments_and_reviews_move_the_counters(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment = Enrollment.objects.create(student=self.students[0], course=self.course)
+            Enrollment.objects.create(student=self.students[1], course=self.course)
+            first = self.review(self.students[0], 5)
+            second = self.review(self.students[1], 2)
+        self.assertEqual(self.counters(), (2, 2, 7, Decimal('3.50')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.rating = 4
+            second.save()
+            first.is_approved = False
+            first.save()
+            enrollment.delete()
+        self.assertEqual(self.counters(), (1, 1, 4, Decimal('4.00')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(self.counters(), (1, 0, 0, Decimal('0.00')))
+
+    def test_rolled_back_events_do_not_count(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            Enrollment.objects.create(student=self.students[0], course=self.course)
+        self.assertEqual(self.counters()[0], 0)
+
+    def test_counters_never_go_negative(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            course_counters.add(self.course.pk, total_students=-1)
+        self.assertEqual(self.counters()[0], 0)
+
+    def test_refresh_recounts_from_scratch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.students[0], course=self.course)
+        Course.objects.filter(pk=self.course.pk).update(total_students=99)
+        refresh_course_stats([self.course.pk])
+        self.assertEqual(self.counters()[0], 1)
+
+
+class ReconcileTests(TestCase):
+    def setUp(self):
+        self.courses = [create_course() for _ in range(5)]
+        student = create_user()
+        with self.captureOnCommitCallbacks(execute=True):
+            for course in self.courses:
+                Enrollment.objects.create(student=student, course=course)
+
+    def test_reports_and_repairs_drift(self):
+        Course.objects.filter(pk=self.courses[1].pk).update(total_students=7)
+        category = self.courses[2].category
+        Category.objects.filter(pk=category.pk).update(published_course_count=3)
+
+        reports = reconcile(['course', 'category'], chunk_size=2, workers=1)
+        self.assertEqual((reports['course'].scanned, reports['course'].drifted), (5, 1))
+        self.assertEqual(reports['category'].drifted, 1)
+
+        reports = reconcile(['course', 'category'], fix=True, chunk_size=2, workers=1)
+        self.assertEqual((reports['course'].fixed, reports['category'].fixed), (1, 1))
+        reports = reconcile(['course', 'category'], chunk_size=2, workers=1)
+        self.assertEqual((reports['course'].drifted, reports['category'].drifted), (0, 0))
+        self.courses[1].refresh_from_db()
+        self.assertEqual(self.courses[1].total_students, 1)
+
+    def test_averages_round_half_up(self):
+        course = self.courses[0]
+        # 33 / 8 = 4.125, stored as 4.13
+        Review.objects.bulk_create([
+            Review(course=course, student=create_user(), rating=rating, comment='c')
+            for rating in (5, 5, 4, 4, 4, 4, 4, 3)
+        ])
+        Course.objects.filter(pk=course.pk).update(
+            total_reviews=8, rating_sum=33, average_rating=Decimal('4.13')
+        )
+        self.assertEqual(reconcile(['course'], workers=1)['course'].drifted, 0)
+
+
+class SimilarCoursesTests(TestCase):
+    def setUp(self):
+        category = create_category()
+        self.first, self.second, self.third = [
+            create_course(title=title, description=title, category=category)
+            for title in ('Knitting', 'Pottery', 'Gardening')
+        ]
+        self.tag = CourseTag.objects.create(name='Weekend Hobby', slug='weekend-hobby')
+        self.first.tags.add(self.tag)
+        self.second.tags.add(self.tag)
+        build_similar_courses(top_k=1)
+
+    def most_similar(self, course):
+        return CourseRecommendation.objects.filter(course=course, source='content').values_list(
+            'recommended_course', flat=True
+        ).first()
+
+    def test_retagging_is_picked_up_incrementally(self):
+        self.assertEqual(self.most_similar(self.first), self.second.pk)
+        self.assertEqual(build_similar_courses(incremental=True, top_k=1), 0)
+
+        self.tag.courses.remove(self.second)
+        self.third.tags.add(self.tag)
+        self.assertGreater(build_similar_courses(incremental=True, top_k=1), 0)
+        self.assertEqual(self.most_similar(self.first), self.third.pk)
+
+        self.tag.courses.clear()
+        self.second.tags.add(CourseTag.objects.create(name='Clay', slug='clay'))
+        self.first.tags.add(CourseTag.objects.get(slug='clay'))
+        build_similar_courses(incremental=True, top_k=1)
+        self.assertEqual(self.most_similar(self.first), self.second.pk)
+
+
+class QueryGroupTests(TransactionTestCase):
+    """Dashboard query groups run on the query pool unless turned off"""
+
+    def setUp(self):
+        create_course()
+        self.groups = {
+            name: lambda: (threading.current_thread().name, Course.objects.count())
+            for name in ('first', 'second')
+        }
+
+    def threads(self, results):
+        self.assertEqual({count for _, count in results.values()}, {1})
+        return {thread.split('_')[0] for thread, _ in results.values()}
+
+    def test_groups_run_on_the_pool_by_default(self):
+        self.assertEqual(self.threads(run_concurrently(self.groups)), {'query-group'})
+        self.assertEqual(self.threads(async_to_sync(gather)(self.groups)), {'query-group'})
+        # Pool threads keep their connections whatever CONN_MAX_AGE says
+        max_ages = run_concurrently({
+            name: lambda: connection.settings_dict['CONN_MAX_AGE'] for name in self.groups
+        })
+        self.assertEqual(set(max_ages.values()), {QUERY_CONN_MAX_AGE})
+
+    def test_groups_run_inline_when_turned_off_or_in_a_transaction(self):
+        caller = threading.current_thread().name
+        with mock.patch('lms_backend.concurrency.PARALLEL_QUERIES', False):
+            self.assertEqual(self.threads(run_concurrently(self.groups)), {caller})
+            self.assertNotIn('query-group', self.threads(async_to_sync(gather)(self.groups)))
+        with transaction.atomic():
+            self.assertEqual(self.threads(run_concurrently(self.groups)), {caller})
+
+    def test_both_paths_build_the_same_dashboard(self):
+        parallel = build_admin_dashboard()
+        with mock.patch('lms_backend.concurrency.PARALLEL_QUERIES', False):
+            self.assertEqual(build_admin_dashboard(), parallel)
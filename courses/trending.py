@@ -0,0 +1,135 @@
+"""
+Trending courses.
+
+Enrollments and reviews are counted into hourly ``CourseActivity`` buckets
+as they happen. A course's trending score is the sum of its buckets over
+the last ``TRENDING_WINDOW_DAYS``, each weighted by an exponential decay
+with a half-life of ``TRENDING_HALF_LIFE_HOURS``.
+
+Scores are kept in the ``TrendingCourse`` snapshot as of a whole hour,
+recorded in the ``trending`` change stamp. Moving the snapshot forward
+only reads the buckets that entered or left the window since then: the
+stored scores are decayed in one UPDATE, the new hours are added and the
+expired hours subtracted.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from . import stamps
+from .models import CourseActivity, TrendingCourse
+
+WINDOW_DAYS = getattr(settings, 'TRENDING_WINDOW_DAYS', 7)
+HALF_LIFE_HOURS = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24)
+# A review signals more interest than an enrollment
+REVIEW_WEIGHT = getattr(settings, 'TRENDING_REVIEW_WEIGHT', 2.0)
+# Buckets older than this are deleted by prune_activity
+RETENTION_DAYS = getattr(settings, 'TRENDING_RETENTION_DAYS', 30)
+
+HOUR = timedelta(hours=1)
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_activity(course_id, enrollments=0, reviews=0, at=None):
+    """Add to the activity bucket of the hour containing ``at``"""
+    bucket = hour_bucket(at or timezone.now())
+    counts = {'enrollments': F('enrollments') + enrollments, 'reviews': F('reviews') + reviews}
+
+    if CourseActivity.objects.filter(course_id=course_id, bucket=bucket).update(**counts):
+        return
+    try:
+        with transaction.atomic():
+            CourseActivity.objects.create(
+                course_id=course_id, bucket=bucket, enrollments=enrollments, reviews=reviews
+            )
+    except IntegrityError:
+        # Another request created the bucket first
+        CourseActivity.objects.filter(course_id=course_id, bucket=bucket).update(**counts)
+
+
+def _decay(hours):
+    return 0.5 ** (hours / HALF_LIFE_HOURS)
+
+
+def _weighted_activity(start, end, as_of):
+    """``{course_id: score}`` of the buckets in ``[start, end)`` seen from ``as_of``"""
+    scores = defaultdict(float)
+    buckets = CourseActivity.objects.filter(bucket__gte=start, bucket__lt=end).values_list(
+        'course_id', 'bucket', 'enrollments', 'reviews'
+    )
+    for course_id, bucket, enrollments, reviews in buckets.iterator():
+        age = (as_of - bucket - HOUR).total_seconds() / 3600
+        scores[course_id] += (enrollments + REVIEW_WEIGHT * reviews) * _decay(age)
+    return scores
+
+
+def _write_scores(deltas, replace=False):
+    existing = {
+        row.pk: row for row in TrendingCourse.objects.filter(pk__in=list(deltas))
+    }
+    changed, created = [], []
+    for course_id, delta in deltas.items():
+        row = existing.get(course_id)
+        if row is None:
+            created.append(TrendingCourse(course_id=course_id, score=max(delta, 0)))
+        else:
+            row.score = max(delta if replace else row.score + delta, 0)
+            changed.append(row)
+    TrendingCourse.objects.bulk_update(changed, ['score'], batch_size=1000)
+    TrendingCourse.objects.bulk_create(created, batch_size=1000)
+
+
+def rebuild_trending(now=None):
+    """Recompute every score from the buckets in the window"""
+    as_of = hour_bucket(now or timezone.now())
+    window_start = as_of - timedelta(days=WINDOW_DAYS)
+
+    with transaction.atomic():
+        scores = _weighted_activity(window_start, as_of, as_of)
+        TrendingCourse.objects.exclude(pk__in=list(scores)).delete()
+        _write_scores(scores, replace=True)
+        stamps.touch(stamps.TRENDING, at=as_of)
+    return len(scores)
+
+
+def update_trending(now=None):
+    """
+    Move the snapshot forward to the current hour. Falls back to a full
+    rebuild when there is no snapshot or it is older than the window.
+    """
+    as_of = hour_bucket(now or timezone.now())
+    window = timedelta(days=WINDOW_DAYS)
+    last = stamps.get_stamp(stamps.TRENDING)
+
+    if last is None or as_of - last >= window:
+        return rebuild_trending(as_of)
+    if as_of <= last:
+        return 0
+
+    with transaction.atomic():
+        elapsed = (as_of - last).total_seconds() / 3600
+        TrendingCourse.objects.update(score=F('score') * _decay(elapsed))
+
+        deltas = _weighted_activity(last, as_of, as_of)
+        for course_id, score in _weighted_activity(last - window, as_of - window, as_of).items():
+            deltas[course_id] -= score
+        _write_scores(deltas)
+
+        # Courses without any activity left in the window drop out
+        active = CourseActivity.objects.filter(bucket__gte=as_of - window, bucket__lt=as_of).values('course_id')
+        TrendingCourse.objects.exclude(pk__in=active).delete()
+        stamps.touch(stamps.TRENDING, at=as_of)
+    return len(deltas)
+
+
+def prune_activity(now=None):
+    """Delete buckets past the retention period"""
+    cutoff = hour_bucket(now or timezone.now()) - timedelta(days=max(RETENTION_DAYS, WINDOW_DAYS + 1))
+    deleted, _ = CourseActivity.objects.filter(bucket__lt=cutoff).delete()
+    return deleted
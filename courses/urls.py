@@ -1,26 +1,43 @@
+from django.conf import settings
 from django.urls import path
 from . import views, analytics
 
 app_name = 'courses'
 
+if getattr(settings, 'ASYNC_DASHBOARDS', False):
+    instructor_dashboard = analytics.instructor_dashboard_async
+    student_dashboard = analytics.student_dashboard_async
+    admin_dashboard = analytics.admin_dashboard_async
+else:
+    instructor_dashboard = analytics.instructor_dashboard
+    student_dashboard = analytics.student_dashboard
+    admin_dashboard = analytics.admin_dashboard
+
 urlpatterns = [
     # Categories
     path('categories/', views.CategoryListView.as_view(), name='category-list'),
     
     # Courses
     path('', views.CourseListView.as_view(), name='course-list'),
+    path('facets/', views.course_facets, name='course-facets'),
+    path('autocomplete/', views.course_autocomplete, name='course-autocomplete'),
+    path('recommendations/', views.my_recommendations, name='my-recommendations'),
     path('<slug:slug>/', views.CourseDetailView.as_view(), name='course-detail'),
+    path('<slug:slug>/recommendations/', views.course_recommendations, name='course-recommendations'),
+    path('<slug:slug>/similar/', views.similar_courses, name='similar-courses'),
     
     # Statistics and special lists
     path('stats/overview/', views.course_stats, name='course-stats'),
     path('lists/featured/', views.featured_courses, name='featured-courses'),
     path('lists/bestsellers/', views.bestseller_courses, name='bestseller-courses'),
     path('lists/popular/', views.popular_courses, name='popular-courses'),
+    path('lists/trending/', views.trending_courses, name='trending-courses'),
 
     # Analytics
-    path('analytics/instructor-dashboard/', analytics.instructor_dashboard, name='instructor-dashboard'),
-    path('analytics/student-dashboard/', analytics.student_dashboard, name='student-dashboard'),
-    path('analytics/admin-dashboard/', analytics.admin_dashboard, name='admin-dashboard'),
+    path('analytics/instructor-dashboard/', instructor_dashboard, name='instructor-dashboard'),
+    path('analytics/student-dashboard/', student_dashboard, name='student-dashboard'),
+    path('analytics/admin-dashboard/', admin_dashboard, name='admin-dashboard'),
+    path('analytics/courses/<slug:slug>/funnel/', analytics.lesson_funnel, name='lesson-funnel'),
 ]
 
 print("✅ Course URLs created successfully!")
@@ -2,29 +2,52 @@ from rest_framework import generics, filters, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg
-from .models import Category, Course, Section, Lesson
+from django.db.models import Q, Count, Avg, Sum
+from django.core.cache import cache
+from .models import Category, Course, Section, Lesson, CourseRecommendation, TrendingCourse
 from .serializers import (
     CategorySerializer, CourseListSerializer, CourseDetailSerializer, 
-    SectionSerializer, LessonSerializer
+    SectionSerializer, LessonSerializer, CourseSummarySerializer, RecommendedCourseSerializer
 )
-from .filters import CourseFilter
+from .filters import CourseFilter, CourseSearchFilter, CourseOrderingFilter
+from .facets import compute_facets
+from .autocomplete import catalog_autocomplete, COURSE, TAG, INSTRUCTOR
+from lms_backend.pagination import KeysetPagination
+from . import stamps
 
+# Seconds cached catalog payloads may live; invalidation happens via stamps
+CATEGORY_LIST_CACHE_TIMEOUT = 60 * 60
+FACETS_CACHE_TIMEOUT = 10 * 60
+
+@method_decorator(stamps.conditional([stamps.CATEGORIES]), name='get')
 class CategoryListView(generics.ListAPIView):
     """List all active categories"""
     
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    
+    def list(self, request, *args, **kwargs):
+        key = stamps.cache_key(
+            'category-list', stamps.request_stamp(request, [stamps.CATEGORIES]), request.get_full_path()
+        )
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, CATEGORY_LIST_CACHE_TIMEOUT)
+            return response
+        return Response(data)
 
+@method_decorator(stamps.conditional([stamps.CATALOG]), name='get')
 class CourseListView(generics.ListAPIView):
     """List courses with filtering and search"""
     
     serializer_class = CourseListSerializer
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'instructor__first_name', 'instructor__last_name']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, CourseSearchFilter, CourseOrderingFilter]
     filterset_class = CourseFilter
     ordering_fields = ['created_at', 'price', 'average_rating', 'total_students']
     ordering = ['-created_at']
@@ -34,6 +57,7 @@ class CourseListView(generics.ListAPIView):
             'instructor', 'category'
         ).prefetch_related('tags')
 
+@method_decorator(stamps.conditional([stamps.CATALOG]), name='get')
 class CourseDetailView(generics.RetrieveAPIView):
     """Get course details"""
     
@@ -43,8 +67,8 @@ class CourseDetailView(generics.RetrieveAPIView):
     
     def get_queryset(self):
         return Course.objects.filter(status='published').select_related(
-            'instructor', 'category'
-        ).prefetch_related('tags', 'sections__lessons')
+            'instructor', 'category', 'curriculum'
+        ).prefetch_related('tags')
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -62,6 +86,49 @@ def course_stats(request):
     
     return Response(stats)
 
+@stamps.conditional([stamps.CATALOG])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def course_facets(request):
+    """Get facet counts for the catalog sidebar (accepts the course list filters)"""
+    
+    key = stamps.cache_key(
+        'course-facets', stamps.request_stamp(request, [stamps.CATALOG]), request.get_full_path()
+    )
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(request.query_params)
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return Response(facets)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def course_autocomplete(request):
+    """Typeahead suggestions for course titles, tags and instructors"""
+    
+    prefix = request.query_params.get('q', '')
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 5)), 20))
+    except ValueError:
+        limit = 5
+    
+    matches = catalog_autocomplete.search(prefix, limit)
+    return Response({
+        'courses': [
+            {'id': entry['id'], 'title': entry['label'], 'slug': entry['slug']}
+            for entry in matches.get(COURSE, [])
+        ],
+        'tags': [
+            {'id': entry['id'], 'name': entry['label'], 'slug': entry['slug']}
+            for entry in matches.get(TAG, [])
+        ],
+        'instructors': [
+            {'id': entry['id'], 'name': entry['label']}
+            for entry in matches.get(INSTRUCTOR, [])
+        ],
+    })
+
+@stamps.conditional([stamps.CATALOG])
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def featured_courses(request):
@@ -74,6 +141,7 @@ def featured_courses(request):
     serializer = CourseListSerializer(courses, many=True)
     return Response(serializer.data)
 
+@stamps.conditional([stamps.CATALOG])
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def bestseller_courses(request):
@@ -86,6 +154,7 @@ def bestseller_courses(request):
     serializer = CourseListSerializer(courses, many=True)
     return Response(serializer.data)
 
+@stamps.conditional([stamps.CATALOG])
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def popular_courses(request):
@@ -98,4 +167,74 @@ def popular_courses(request):
     )[:6]
     
     serializer = CourseListSerializer(courses, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serializer.data)
+
+@stamps.conditional([stamps.CATALOG, stamps.TRENDING])
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def trending_courses(request):
+    """Get trending courses from the precomputed snapshot"""
+    
+    trending = TrendingCourse.objects.filter(course__status='published')
+    category = request.query_params.get('category')
+    if category:
+        trending = trending.filter(course__category__slug=category)
+    
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 12)), 50))
+    except ValueError:
+        limit = 12
+    
+    prefix = 'course__'
+    rows = trending.order_by('-score').values(*CourseSummarySerializer.value_fields(prefix))[:limit]
+    rows = CourseSummarySerializer.strip_prefix(rows, prefix)
+    return Response(CourseSummarySerializer(rows, many=True, context={'request': request}).data)
+
+def _recommended_courses(request, recommendations):
+    prefix = 'recommended_course__'
+    rows = recommendations.filter(recommended_course__status='published').values(
+        *RecommendedCourseSerializer.value_fields(prefix), 'score'
+    )
+    rows = RecommendedCourseSerializer.strip_prefix(rows, prefix)
+    return RecommendedCourseSerializer(rows, many=True, context={'request': request}).data
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def course_recommendations(request, slug):
+    """Students who took this course also took (precomputed)"""
+    
+    recommendations = CourseRecommendation.objects.filter(
+        course__slug=slug, source='co_enrollment'
+    ).order_by('rank')
+    return Response(_recommended_courses(request, recommendations))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_courses(request, slug):
+    """Courses with similar content (precomputed)"""
+    
+    recommendations = CourseRecommendation.objects.filter(
+        course__slug=slug, source='content'
+    ).order_by('rank')
+    return Response(_recommended_courses(request, recommendations))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def my_recommendations(request):
+    """Recommendations for the current student from their enrollments"""
+    
+    from enrollments.models import Enrollment
+    
+    enrolled = Enrollment.objects.filter(student=request.user).values('course_id')
+    recommendations = CourseRecommendation.objects.filter(
+        course__in=enrolled, source='co_enrollment', recommended_course__status='published'
+    ).exclude(
+        recommended_course__in=enrolled
+    ).values('recommended_course').annotate(
+        score=Sum('score')
+    ).order_by('-score')[:12]
+    
+    prefix = 'recommended_course__'
+    rows = recommendations.values(*RecommendedCourseSerializer.value_fields(prefix), 'score')
+    rows = RecommendedCourseSerializer.strip_prefix(rows, prefix)
+    return Response(RecommendedCourseSerializer(rows, many=True, context={'request': request}).data)
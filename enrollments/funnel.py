@@ -0,0 +1,233 @@
+"""
+Lesson drop-off funnel.
+
+Every ``LessonProgress`` row is counted in exactly one ``LessonFunnelStats``
+row, keyed by its lesson, the curriculum version it was started under, the
+day it was started and the histogram bucket of its time spent. Progress
+writes move that contribution with ``F()`` updates: a new row adds a
+student, flipping ``is_completed`` adds or removes a completion, and time
+spent adds minutes, moving the student to another bucket when it crosses a
+boundary. Reading the funnel of a course is one grouped query over a
+handful of rows per lesson and day, however many students it has; the
+median time spent is read off the cumulative histogram.
+
+Rows are cohorts by start day, so completion rates over a date range stay
+within 100%.
+"""
+from bisect import bisect_right
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from courses.curriculum import get_curriculum
+from courses.models import CourseCurriculum
+from .models import Enrollment, LessonFunnelStats, LessonProgress
+
+# Lower bounds of the time spent histogram, in minutes
+TIME_BUCKETS = (0, 1, 2, 3, 5, 8, 10, 15, 20, 30, 45, 60, 90, 120, 180, 240)
+
+STAT_FIELDS = ('students', 'completions', 'time_spent_minutes')
+
+
+def time_bucket(minutes):
+    return TIME_BUCKETS[bisect_right(TIME_BUCKETS, minutes) - 1]
+
+
+def current_curriculum_version(course_id):
+    version = CourseCurriculum.objects.filter(course_id=course_id).values_list('version', flat=True).first()
+    return version or 1
+
+
+def progress_state(progress):
+    """``(is_completed, time_spent_minutes)`` of a progress row, or None if not loaded"""
+    values = progress.__dict__
+    if 'is_completed' not in values or 'time_spent_minutes' not in values:
+        return None
+    return bool(values['is_completed']), values['time_spent_minutes']
+
+
+def _bump(key, deltas):
+    lesson_id, course_id, version, day, bucket = key
+    counts = {name: F(name) + value for name, value in deltas.items()}
+    rows = LessonFunnelStats.objects.filter(
+        lesson_id=lesson_id, curriculum_version=version, date=day, time_bucket=bucket
+    )
+    if rows.update(**counts):
+        return
+    try:
+        with transaction.atomic():
+            LessonFunnelStats.objects.create(
+                lesson_id=lesson_id, course_id=course_id, curriculum_version=version,
+                date=day, time_bucket=bucket, **deltas
+            )
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(**counts)
+
+
+def record_progress_changes(changes):
+    """
+    Move the contribution of progress rows from their ``before`` state to
+    their ``after`` state. ``changes`` yields ``(lesson_id, course_id,
+    version, day, before, after)``, where each state is
+    ``(is_completed, time_spent_minutes)`` or None for a row that did not
+    exist / no longer exists. Changes to the same funnel row are merged
+    into one update.
+    """
+    deltas = defaultdict(Counter)
+    for lesson_id, course_id, version, day, before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            completed, minutes = state
+            values = deltas[(lesson_id, course_id, version, day, time_bucket(minutes))]
+            values['students'] += sign
+            values['completions'] += sign * int(completed)
+            values['time_spent_minutes'] += sign * minutes
+
+    for key, values in deltas.items():
+        values = {name: value for name, value in values.items() if value}
+        if values:
+            _bump(key, values)
+
+
+def record_progress_change(lesson_id, course_id, version, day, before=None, after=None):
+    record_progress_changes([(lesson_id, course_id, version, day, before, after)])
+
+
+def progress_course_id(progress):
+    if LessonProgress._meta.get_field('enrollment').is_cached(progress):
+        return progress.enrollment.course_id
+    return Enrollment.objects.filter(pk=progress.enrollment_id).values_list('course_id', flat=True).first()
+
+
+def record_progress(progress, before=None, after=None, course_id=None):
+    """``record_progress_change`` for a ``LessonProgress`` instance"""
+    course_id = course_id or progress_course_id(progress)
+    if course_id is None:
+        return
+    day = timezone.localdate(progress.started_at or timezone.now())
+    record_progress_change(progress.lesson_id, course_id, progress.curriculum_version, day, before, after)
+
+
+def rebuild_funnel(course_ids=None):
+    """Recompute the funnel rows of the given courses (all by default) from LessonProgress"""
+    progress = LessonProgress.objects.all()
+    stats = LessonFunnelStats.objects.all()
+    if course_ids is not None:
+        progress = progress.filter(enrollment__course_id__in=course_ids)
+        stats = stats.filter(course_id__in=course_ids)
+
+    totals = defaultdict(Counter)
+    rows = progress.values_list(
+        'lesson_id', 'enrollment__course_id', 'curriculum_version', 'started_at',
+        'is_completed', 'time_spent_minutes'
+    )
+    for lesson_id, course_id, version, started_at, completed, minutes in rows.iterator(chunk_size=5000):
+        key = (lesson_id, course_id, version, timezone.localdate(started_at), time_bucket(minutes))
+        totals[key].update(students=1, completions=int(completed), time_spent_minutes=minutes)
+
+    with transaction.atomic():
+        stats.delete()
+        LessonFunnelStats.objects.bulk_create([
+            LessonFunnelStats(
+                lesson_id=lesson_id, course_id=course_id, curriculum_version=version, date=day,
+                time_bucket=bucket, **{name: values[name] for name in STAT_FIELDS}
+            )
+            for (lesson_id, course_id, version, day, bucket), values in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def median_minutes(histogram):
+    """Median of ``{bucket: students}``, interpolated within its bucket"""
+    total = sum(histogram.values())
+    if total <= 0:
+        return None
+    half = total / 2
+    seen = 0
+    for bucket in sorted(histogram):
+        count = histogram[bucket]
+        if count > 0 and seen + count >= half:
+            position = TIME_BUCKETS.index(bucket)
+            if position + 1 == len(TIME_BUCKETS):
+                return float(bucket)
+            width = TIME_BUCKETS[position + 1] - bucket
+            return round(bucket + width * (half - seen) / count, 1)
+        seen += count
+    return None
+
+
+def _percent(part, whole):
+    return round(part * 100 / whole, 2) if whole else 0
+
+
+def course_funnel(course, version=None, since=None, until=None):
+    """
+    Per-lesson starts, completions, rates and time spent of one curriculum
+    version (the current one by default), for students who started each
+    lesson between ``since`` and ``until`` (dates, inclusive).
+
+    Lessons are listed in the order of the current curriculum, and only
+    lessons still in it are included: a deleted lesson takes its progress
+    and funnel rows with it, so its starts and completions are gone from
+    every version, and start and drop-off rates run between the lessons
+    that remain.
+    """
+    curriculum = get_curriculum(course)
+    versions = list(
+        LessonFunnelStats.objects.filter(course=course).order_by('curriculum_version').values_list(
+            'curriculum_version', flat=True
+        ).distinct()
+    )
+    version = version or curriculum.version
+
+    rows = LessonFunnelStats.objects.filter(course=course, curriculum_version=version)
+    if since:
+        rows = rows.filter(date__gte=since)
+    if until:
+        rows = rows.filter(date__lte=until)
+    rows = rows.values('lesson_id', 'time_bucket').annotate(
+        **{f'total_{name}': Sum(name) for name in STAT_FIELDS}
+    ).order_by()
+
+    totals = defaultdict(Counter)
+    histograms = defaultdict(dict)
+    for row in rows:
+        totals[row['lesson_id']].update({name: row[f'total_{name}'] for name in STAT_FIELDS})
+        histograms[row['lesson_id']][row['time_bucket']] = row['total_students']
+
+    lessons = []
+    first_starts = previous_starts = None
+    for section in curriculum.sections:
+        for lesson in section['lessons']:
+            if version != curriculum.version and lesson['id'] not in totals:
+                continue
+            stats = totals[lesson['id']]
+            starts = stats['students']
+            if first_starts is None:
+                first_starts = starts
+            lessons.append({
+                'lesson_id': lesson['id'],
+                'title': lesson['title'],
+                'section': section['title'],
+                'starts': starts,
+                'completions': stats['completions'],
+                'start_rate': _percent(starts, first_starts),
+                'completion_rate': _percent(stats['completions'], starts),
+                'drop_off_rate': 100 - _percent(starts, previous_starts) if previous_starts else 0,
+                'average_time_minutes': round(stats['time_spent_minutes'] / starts, 1) if starts else None,
+                'median_time_minutes': median_minutes(histograms[lesson['id']]),
+            })
+            previous_starts = starts
+
+    return {
+        'course': course.slug,
+        'version': version,
+        'current_version': curriculum.version,
+        'versions': versions,
+        'since': since,
+        'until': until,
+        'lessons': lessons,
+    }
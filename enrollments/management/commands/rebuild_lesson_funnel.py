@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import Course
+from enrollments.funnel import rebuild_funnel
+
+
+class Command(BaseCommand):
+    help = 'Recompute the lesson funnel aggregates from lesson progress (after deploys or for repairs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', action='append', dest='courses', metavar='SLUG',
+                            help='Only rebuild this course (repeatable)')
+
+    def handle(self, *args, **options):
+        course_ids = None
+        if options['courses']:
+            course_ids = list(Course.objects.filter(slug__in=options['courses']).values_list('pk', flat=True))
+            if len(course_ids) != len(set(options['courses'])):
+                raise CommandError('Unknown course slug')
+
+        written = rebuild_funnel(course_ids)
+        self.stdout.write(self.style.SUCCESS(f'Lesson funnel rows written: {written}'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'enrolled_at', 'id'], name='enrollments_student_40dc29_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_curriculum_version'),
+        ('enrollments', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='curriculum_version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.CreateModel(
+            name='LessonFunnelStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('curriculum_version', models.PositiveIntegerField()),
+                ('date', models.DateField(help_text='Day the students started the lesson')),
+                ('time_bucket', models.PositiveIntegerField(help_text='Lower bound of the time spent, in minutes')),
+                ('students', models.IntegerField(default=0)),
+                ('completions', models.IntegerField(default=0)),
+                ('time_spent_minutes', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_funnel_stats', to='courses.course')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='funnel_stats', to='courses.lesson')),
+            ],
+            options={
+                'verbose_name': 'Lesson Funnel Stats',
+                'verbose_name_plural': 'Lesson Funnel Stats',
+                'db_table': 'lesson_funnel_stats',
+                'indexes': [models.Index(fields=['course', 'curriculum_version', 'date'], name='lesson_funn_course__0cd7b1_idx')],
+                'unique_together': {('lesson', 'curriculum_version', 'date', 'time_bucket')},
+            },
+        ),
+    ]
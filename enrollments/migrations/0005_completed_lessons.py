@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_completed_lessons(apps, schema_editor):
+    Enrollment = apps.get_model('enrollments', 'Enrollment')
+    LessonProgress = apps.get_model('enrollments', 'LessonProgress')
+
+    completed = LessonProgress.objects.filter(
+        enrollment=OuterRef('pk'), is_completed=True
+    ).order_by().values('enrollment').annotate(total=Count('pk')).values('total')
+    Enrollment.objects.update(completed_lessons=Coalesce(Subquery(completed), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0004_lesson_funnel_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_completed_lessons, migrations.RunPython.noop),
+    ]
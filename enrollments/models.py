@@ -26,6 +26,7 @@ class Enrollment(models.Model):
     
     # Progress tracking
     progress_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    completed_lessons = models.PositiveIntegerField(default=0)
     last_accessed_at = models.DateTimeField(blank=True, null=True)
     
     # Payment information
@@ -49,26 +50,18 @@ class Enrollment(models.Model):
             models.Index(fields=['student', 'status']),
             models.Index(fields=['course', 'status']),
             models.Index(fields=['enrolled_at']),
+            models.Index(fields=['student', 'enrolled_at', 'id']),
         ]
     
     def __str__(self):
         return f"{self.student.full_name} - {self.course.title}"
     
     def calculate_progress(self):
-        """Calculate and update progress percentage"""
-        total_lessons = self.course.sections.aggregate(
-            total=models.Count('lessons')
-        )['total'] or 0
-        
-        if total_lessons == 0:
-            return 0
-        
-        completed_lessons = self.lesson_progress.filter(is_completed=True).count()
-        progress = (completed_lessons / total_lessons) * 100
-        
-        self.progress_percentage = round(progress, 2)
-        self.save(update_fields=['progress_percentage'])
+        """Recount completed lessons and update progress percentage"""
+        from .progress import refresh_progress
         
+        refresh_progress(self.course_id, [self.pk])
+        self.refresh_from_db(fields=['completed_lessons', 'progress_percentage'])
         return self.progress_percentage
 
 class LessonProgress(models.Model):
@@ -81,6 +74,7 @@ class LessonProgress(models.Model):
     is_completed = models.BooleanField(default=False)
     completion_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
     time_spent_minutes = models.PositiveIntegerField(default=0)
+    curriculum_version = models.PositiveIntegerField(default=1)
     
     # Timestamps
     started_at = models.DateTimeField(auto_now_add=True)
@@ -104,6 +98,35 @@ class LessonProgress(models.Model):
     def __str__(self):
         return f"{self.enrollment.student.full_name} - {self.lesson.title}"
 
+class LessonFunnelStats(models.Model):
+    """
+    Students who started a lesson on one day, under one curriculum version,
+    and whose time spent falls in one histogram bucket
+    """
+    
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='funnel_stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lesson_funnel_stats')
+    curriculum_version = models.PositiveIntegerField()
+    date = models.DateField(help_text="Day the students started the lesson")
+    time_bucket = models.PositiveIntegerField(help_text="Lower bound of the time spent, in minutes")
+    
+    # Moves between buckets subtract, so these are plain integers
+    students = models.IntegerField(default=0)
+    completions = models.IntegerField(default=0)
+    time_spent_minutes = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'lesson_funnel_stats'
+        verbose_name = 'Lesson Funnel Stats'
+        verbose_name_plural = 'Lesson Funnel Stats'
+        unique_together = ['lesson', 'curriculum_version', 'date', 'time_bucket']
+        indexes = [
+            models.Index(fields=['course', 'curriculum_version', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.lesson_id} v{self.curriculum_version} @ {self.date} ({self.time_bucket}+ min)"
+
 class Certificate(models.Model):
     """Course completion certificates"""
     
@@ -0,0 +1,448 @@
+"""
+Enrollment progress.
+
+``Enrollment.completed_lessons`` counts the completed ``LessonProgress``
+rows of an enrollment and only moves when ``is_completed`` flips. A flip
+updates the counter and ``progress_percentage`` in one UPDATE, which reads
+the course's lesson count from its compiled curriculum, so a
+progress write that does not complete a lesson costs nothing here.
+
+``ingest_progress`` applies a batch of progress events (offline replays)
+with a handful of statements: duplicates are merged, existing rows are
+locked and bulk updated, new rows bulk inserted, and the counters above
+and the lesson funnel are moved once per enrollment and funnel row.
+
+``upsert_progress`` records a single progress update: it creates the
+``LessonProgress`` row or adds to it in one ``INSERT ... ON CONFLICT DO
+UPDATE`` statement, so concurrent heartbeats neither lose time nor trip
+over the unique constraint.
+
+Completion is sticky on both paths: an update can complete a lesson but
+never un-complete it, so a late heartbeat or replayed event cannot undo a
+completion.
+
+With ``PROGRESS_FLUSH_INTERVAL`` set, ``progress_buffer`` holds watch-time
+heartbeats back and writes them as such batches.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Least, NullIf, Round
+from django.utils import timezone
+from courses.curriculum import rebuild_curriculum
+from courses.models import CourseCurriculum, Lesson
+from .funnel import progress_state, record_progress, record_progress_changes
+from .models import Enrollment, LessonProgress
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_BATCH_MAX_EVENTS = getattr(settings, 'PROGRESS_BATCH_MAX_EVENTS', 1000)
+# Seconds during which watch-time heartbeats are merged in memory before
+# being written; 0 writes every progress update through
+PROGRESS_FLUSH_INTERVAL = getattr(settings, 'PROGRESS_FLUSH_INTERVAL', 0)
+# Pending lessons that force an early flush
+PROGRESS_BUFFER_MAX_ENTRIES = getattr(settings, 'PROGRESS_BUFFER_MAX_ENTRIES', 5000)
+
+
+def lesson_count_expression():
+    """
+    Lesson count of an enrollment's course, read from its compiled
+    curriculum, or counted from the lessons when it has none yet
+    """
+    counted = Lesson.objects.filter(section__course_id=OuterRef('course_id')).order_by().values(
+        'section__course_id'
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(
+            CourseCurriculum.objects.filter(course_id=OuterRef('course_id')).values('lesson_count')[:1],
+            output_field=IntegerField(),
+        ),
+        Subquery(counted, output_field=IntegerField()),
+    )
+
+
+def percentage_expression(completed):
+    """``progress_percentage`` of an enrollment with ``completed`` lessons"""
+    # Read in the same statement, so every worker uses the current count
+    percentage = ExpressionWrapper(
+        completed * 100.0 / NullIf(lesson_count_expression(), 0), output_field=FloatField()
+    )
+    return Coalesce(Least(Round(percentage, 2), 100), 0.0, output_field=FloatField())
+
+
+def record_completions(enrollment_id, delta):
+    """Add ``delta`` completed lessons to an enrollment and move its percentage with them"""
+    completed = F('completed_lessons') + delta
+    # The percentage is assigned first: MySQL evaluates SET clauses left to
+    # right, so it must still see the old counter
+    Enrollment.objects.filter(pk=enrollment_id).update(
+        progress_percentage=percentage_expression(completed),
+        completed_lessons=completed,
+    )
+
+
+def completed_lessons_expression():
+    return Coalesce(Subquery(
+        LessonProgress.objects.filter(enrollment=OuterRef('pk'), is_completed=True).order_by().values(
+            'enrollment'
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def refresh_progress(course_id, enrollment_ids=None):
+    """Recount completed lessons and progress of a course's enrollments (all by default)"""
+    if not CourseCurriculum.objects.filter(course_id=course_id).exists():
+        rebuild_curriculum(course_id)
+    enrollments = Enrollment.objects.filter(course_id=course_id)
+    if enrollment_ids is not None:
+        enrollments = enrollments.filter(pk__in=enrollment_ids)
+    completed = completed_lessons_expression()
+    return enrollments.update(
+        progress_percentage=percentage_expression(completed),
+        completed_lessons=completed,
+    )
+
+
+UPSERT_FIELDS = [
+    LessonProgress._meta.get_field(name) for name in (
+        'enrollment', 'lesson', 'is_completed', 'completion_percentage', 'time_spent_minutes',
+        'curriculum_version', 'started_at', 'completed_at', 'last_accessed_at', 'notes', 'is_bookmarked',
+    )
+]
+
+
+def _upsert_sql(update_columns):
+    quote = connection.ops.quote_name
+    table = quote(LessonProgress._meta.db_table)
+    column = {field.name: quote(field.column) for field in LessonProgress._meta.concrete_fields}
+
+    values = ['%s'] * len(UPSERT_FIELDS)
+    # New rows start under the course's current curriculum version
+    values[UPSERT_FIELDS.index(LessonProgress._meta.get_field('curriculum_version'))] = (
+        f'COALESCE((SELECT {quote("version")} FROM {quote(CourseCurriculum._meta.db_table)} '
+        f'WHERE {quote("course_id")} = %s), 1)'
+    )
+    assignments = {
+        'time_spent_minutes': f'{table}.{column["time_spent_minutes"]} + EXCLUDED.{column["time_spent_minutes"]}',
+        'completion_percentage': f'EXCLUDED.{column["completion_percentage"]}',
+        'is_completed': f'EXCLUDED.{column["is_completed"]}',
+        # Kept when the lesson was already complete, which is how the
+        # returned row tells a new completion apart
+        'completed_at': (
+            f'CASE WHEN {table}.{column["is_completed"]} THEN {table}.{column["completed_at"]} '
+            f'ELSE EXCLUDED.{column["completed_at"]} END'
+        ),
+        'last_accessed_at': f'EXCLUDED.{column["last_accessed_at"]}',
+    }
+    return (
+        f'INSERT INTO {table} ({", ".join(column[field.name] for field in UPSERT_FIELDS)}) '
+        f'VALUES ({", ".join(values)}) '
+        f'ON CONFLICT ({column["enrollment"]}, {column["lesson"]}) DO UPDATE SET '
+        + ', '.join(f'{column[name]} = {assignments[name]}' for name in update_columns)
+        + f' RETURNING {", ".join(column.values())}'
+    )
+
+
+def _single_statement_upsert(enrollment, lesson_id, time_spent_minutes, completion_percentage, complete, now):
+    values = {
+        'enrollment': enrollment.pk,
+        'lesson': lesson_id,
+        'is_completed': complete,
+        'completion_percentage': completion_percentage if completion_percentage is not None else 0,
+        'time_spent_minutes': time_spent_minutes,
+        'started_at': now,
+        'completed_at': now if complete else None,
+        'last_accessed_at': now,
+        'notes': '',
+        'is_bookmarked': False,
+    }
+    update_columns = ['time_spent_minutes', 'last_accessed_at']
+    if completion_percentage is not None:
+        update_columns.append('completion_percentage')
+    if complete:
+        update_columns += ['is_completed', 'completed_at']
+    params = [
+        # The version placeholder takes the course id of its subquery
+        Enrollment._meta.get_field('course').get_db_prep_save(enrollment.course_id, connection)
+        if field.name == 'curriculum_version' else field.get_db_prep_save(values[field.name], connection)
+        for field in UPSERT_FIELDS
+    ]
+
+    with transaction.atomic():
+        progress = list(LessonProgress.objects.raw(_upsert_sql(update_columns), params))[0]
+        created = progress.started_at == now
+        newly_completed = complete and progress.completed_at == now
+        after = progress_state(progress)
+        before = None if created else (after[0] and not newly_completed, after[1] - time_spent_minutes)
+        if newly_completed:
+            record_completions(enrollment.pk, 1)
+        if before != after:
+            record_progress(progress, before, after, enrollment.course_id)
+    return progress
+
+
+def _locked_upsert(enrollment, lesson_id, time_spent_minutes, completion_percentage, complete, now):
+    # Counters follow through the LessonProgress signals here
+    rows = LessonProgress.objects.select_for_update().filter(enrollment=enrollment, lesson_id=lesson_id)
+    with transaction.atomic():
+        progress = rows.first()
+        if progress is None:
+            try:
+                with transaction.atomic():
+                    return LessonProgress.objects.create(
+                        enrollment=enrollment,
+                        lesson_id=lesson_id,
+                        is_completed=complete,
+                        completion_percentage=completion_percentage if completion_percentage is not None else 0,
+                        time_spent_minutes=time_spent_minutes,
+                        completed_at=now if complete else None,
+                    )
+            except IntegrityError:
+                progress = rows.get()
+
+        progress.time_spent_minutes += time_spent_minutes
+        changed = ['time_spent_minutes', 'last_accessed_at']
+        if completion_percentage is not None:
+            progress.completion_percentage = completion_percentage
+            changed.append('completion_percentage')
+        if complete and not progress.is_completed:
+            progress.is_completed = True
+            progress.completed_at = now
+            changed += ['is_completed', 'completed_at']
+        progress.save(update_fields=changed)
+    return progress
+
+
+def upsert_progress(enrollment, lesson_id, time_spent_minutes=0, completion_percentage=None, complete=False):
+    """
+    Create or add to the progress row of a lesson and return it. Backends
+    without ``ON CONFLICT ... RETURNING`` (MySQL) lock the row instead.
+    """
+    now = timezone.now()
+    features = connection.features
+    if features.supports_update_conflicts_with_target and features.can_return_columns_from_insert:
+        upsert = _single_statement_upsert
+    else:
+        upsert = _locked_upsert
+    return upsert(enrollment, lesson_id, time_spent_minutes, completion_percentage, complete, now)
+
+
+def merge_events(events):
+    """
+    Fold events for the same enrollment and lesson into one, in order:
+    time spent adds up, the last completion percentage wins and any
+    completion completes the lesson.
+    """
+    merged = {}
+    for event in events:
+        current = merged.setdefault((event['enrollment'], event['lesson']), {'time_spent_minutes': 0})
+        current['time_spent_minutes'] += event.get('time_spent_minutes', 0)
+        if 'completion_percentage' in event:
+            current['completion_percentage'] = event['completion_percentage']
+        if 'is_completed' in event:
+            current['is_completed'] = current.get('is_completed', False) or event['is_completed']
+    return merged
+
+
+def _apply(merged, enrollments):
+    now = timezone.now()
+    existing = {
+        (progress.enrollment_id, progress.lesson_id): progress
+        for progress in LessonProgress.objects.select_for_update().filter(
+            enrollment_id__in={enrollment_id for enrollment_id, _ in merged},
+            lesson_id__in={lesson_id for _, lesson_id in merged},
+        ).order_by('pk')
+    }
+    versions = dict(CourseCurriculum.objects.filter(
+        course_id__in=set(enrollments.values())
+    ).values_list('course_id', 'version'))
+
+    created, updated, changes = [], [], []
+    completions = Counter()
+    for (enrollment_id, lesson_id), event in merged.items():
+        progress = existing.get((enrollment_id, lesson_id))
+        if progress is None:
+            before = None
+            progress = LessonProgress(
+                enrollment_id=enrollment_id,
+                lesson_id=lesson_id,
+                curriculum_version=versions.get(enrollments[enrollment_id], 1),
+                completion_percentage=event.get('completion_percentage', 0),
+                is_completed=event.get('is_completed', False),
+                time_spent_minutes=event['time_spent_minutes'],
+            )
+            if progress.is_completed:
+                progress.completed_at = now
+            created.append(progress)
+        else:
+            before = progress_state(progress)
+            progress.completion_percentage = event.get('completion_percentage', progress.completion_percentage)
+            if not progress.is_completed and event.get('is_completed', False):
+                progress.is_completed = True
+                progress.completed_at = now
+            progress.time_spent_minutes += event['time_spent_minutes']
+            progress.last_accessed_at = now
+            updated.append(progress)
+
+        after = progress_state(progress)
+        if bool(before and before[0]) != after[0]:
+            completions[enrollment_id] += 1 if after[0] else -1
+        if before != after:
+            changes.append((progress, before, after))
+
+    LessonProgress.objects.bulk_create(created, batch_size=500)
+    LessonProgress.objects.bulk_update(
+        updated,
+        ['completion_percentage', 'is_completed', 'completed_at', 'time_spent_minutes', 'last_accessed_at'],
+        batch_size=500,
+    )
+
+    record_progress_changes(
+        (
+            progress.lesson_id, enrollments[progress.enrollment_id], progress.curriculum_version,
+            timezone.localdate(progress.started_at), before, after,
+        )
+        for progress, before, after in changes
+    )
+    for enrollment_id, delta in completions.items():
+        if delta:
+            record_completions(enrollment_id, delta)
+    return {'created': len(created), 'updated': len(updated)}
+
+
+def ingest_progress(events, enrollments):
+    """
+    Apply validated progress events; ``enrollments`` maps the enrollment
+    ids they refer to onto course ids.
+    """
+    merged = merge_events(events)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                result = _apply(merged, enrollments)
+            break
+        except IntegrityError:
+            # A concurrent request inserted one of the new rows first; it
+            # is an existing row on the second pass
+            if attempt:
+                raise
+    return {'events': len(events), 'rows': len(merged), **result}
+
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for watch-time heartbeats.
+
+    Time spent and the latest completion percentage are merged per
+    enrollment and lesson in memory and written with ``ingest_progress``
+    at most once per ``interval``, as soon as ``max_entries`` lessons are
+    pending, and when the process exits. Only updates that leave
+    ``is_completed`` alone belong here; completions are written through and
+    take the pending deltas of their lesson with them (see ``pop``).
+    """
+
+    def __init__(self, interval=0, max_entries=PROGRESS_BUFFER_MAX_ENTRIES):
+        self.interval = interval
+        self.max_entries = max_entries
+        self._pending = {}
+        self._courses = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        if interval > 0:
+            atexit.register(self._flush_safely)
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def add(self, enrollment_id, course_id, lesson_id, time_spent_minutes=0, completion_percentage=None):
+        with self._lock:
+            event = self._pending.setdefault((enrollment_id, lesson_id), {
+                'enrollment': enrollment_id, 'lesson': lesson_id, 'time_spent_minutes': 0,
+            })
+            event['time_spent_minutes'] += time_spent_minutes
+            if completion_percentage is not None:
+                event['completion_percentage'] = completion_percentage
+            self._courses[enrollment_id] = course_id
+
+            if len(self._pending) < self.max_entries:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.interval, self._flush_in_thread)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self._flush_safely()
+
+    def pop(self, enrollment_id, lesson_id):
+        """Take the pending event of a lesson out of the buffer ({} if none)"""
+        with self._lock:
+            return self._pending.pop((enrollment_id, lesson_id), {})
+
+    def apply_pending(self, progress):
+        """Add the pending deltas of a ``LessonProgress`` row to the instance (not saved)"""
+        with self._lock:
+            event = dict(self._pending.get((progress.enrollment_id, progress.lesson_id), {}))
+        progress.time_spent_minutes += event.get('time_spent_minutes', 0)
+        if 'completion_percentage' in event:
+            progress.completion_percentage = event['completion_percentage']
+        return progress
+
+    def _flush_in_thread(self):
+        try:
+            self._flush_safely()
+        finally:
+            connections.close_all()
+
+    def _flush_safely(self):
+        # Called from requests, the timer and at exit: a failed write must
+        # not turn into an error for whoever happened to trigger it
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Could not write buffered progress; kept for the next flush')
+
+    def flush(self):
+        """Write every pending heartbeat now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            courses, self._courses = self._courses, {}
+            self._timer = None
+        if not pending:
+            return
+
+        # Heartbeats for enrollments or lessons deleted since they were
+        # buffered are dropped; kept, they would fail every later flush
+        existing = set(Enrollment.objects.filter(pk__in=list(courses)).values_list('pk', flat=True))
+        lesson_courses = dict(Lesson.objects.filter(
+            pk__in={event['lesson'] for event in pending.values()}
+        ).values_list('pk', 'section__course_id'))
+        events = [
+            event for event in pending.values()
+            if event['enrollment'] in existing
+            and lesson_courses.get(event['lesson']) == courses[event['enrollment']]
+        ]
+        try:
+            if events:
+                ingest_progress(events, {pk: courses[pk] for pk in existing})
+        except Exception:
+            # Keep the heartbeats for the next flush
+            with self._lock:
+                for event in events:
+                    key = (event['enrollment'], event['lesson'])
+                    newer = self._pending.get(key)
+                    if newer is not None:
+                        event['time_spent_minutes'] += newer['time_spent_minutes']
+                        if 'completion_percentage' in newer:
+                            event['completion_percentage'] = newer['completion_percentage']
+                    self._pending[key] = event
+                    self._courses.setdefault(event['enrollment'], courses[event['enrollment']])
+            raise
+
+
+progress_buffer = ProgressBuffer(interval=PROGRESS_FLUSH_INTERVAL)
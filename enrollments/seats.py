@@ -0,0 +1,147 @@
+"""
+Enrollment creation.
+
+``enroll`` inserts first and only reads the existing row back when the
+(student, course) constraint says it is already there, so repeated or
+concurrent requests all end up with the same enrollment.
+
+``assign_seats`` enrolls many students in many courses at once (corporate
+seats) and ``enroll_pairs`` enrolls arbitrary (student, course) pairs, e.g.
+from an import file. Pairs are inserted in chunks with
+``bulk_create(ignore_conflicts=True)``, one transaction per chunk;
+enrollment ids are generated up front, so reading them back tells the new
+rows from those that already existed.
+``bulk_create`` skips the Enrollment signals, so the course counters,
+trending activity, platform totals and instructor dashboards are updated
+here once per batch.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from courses.counters import course_counters
+from courses.dashboards import invalidate_instructor_dashboard
+from courses.models import Course
+from courses.platform import record_platform_event
+from courses.trending import record_activity
+from .models import Enrollment
+
+SEAT_ASSIGNMENT_CHUNK_SIZE = getattr(settings, 'SEAT_ASSIGNMENT_CHUNK_SIZE', 500)
+SEAT_ASSIGNMENT_MAX_ROWS = getattr(settings, 'SEAT_ASSIGNMENT_MAX_ROWS', 20000)
+
+SEAT_PAYMENT_METHOD = 'seat_assignment'
+
+
+def enroll(student, course):
+    """Enroll ``student`` in ``course`` unless already enrolled; returns ``(enrollment, created)``"""
+    try:
+        with transaction.atomic():
+            enrollment = Enrollment.objects.create(
+                student=student,
+                course=course,
+                amount_paid=course.price if not course.is_free else 0
+            )
+        return enrollment, True
+    except IntegrityError:
+        enrollment = Enrollment.objects.select_related('student', 'course').get(student=student, course=course)
+        return enrollment, False
+
+
+def _chunks(items, size):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+
+def _lookup(queryset, field, values, chunk_size):
+    found = {}
+    for chunk in _chunks(list(values), chunk_size):
+        found.update(queryset.filter(**{f'{field}__in': chunk}).values_list(field, 'pk'))
+    return found
+
+
+def _count_new_enrollments(created_by_course, instructors):
+    course_counters.add_many({
+        course_id: {'total_students': count} for course_id, count in created_by_course.items()
+    })
+    for course_id, count in created_by_course.items():
+        record_activity(course_id, enrollments=count)
+    record_platform_event(total_enrollments=sum(created_by_course.values()))
+    for instructor_id in {instructors[course_id] for course_id in created_by_course}:
+        invalidate_instructor_dashboard(instructor_id)
+
+
+def assign_seats(student_emails, course_slugs, payment_reference='', chunk_size=SEAT_ASSIGNMENT_CHUNK_SIZE):
+    """Enroll every student (by email) in every course (by slug); see ``enroll_pairs``"""
+    student_emails = list(dict.fromkeys(student_emails))
+    course_slugs = list(dict.fromkeys(course_slugs))
+    pairs = [(email, slug) for slug in course_slugs for email in student_emails]
+    return enroll_pairs(pairs, payment_reference, chunk_size)
+
+
+def _lookup_courses(slugs, courses):
+    missing = [slug for slug in slugs if slug not in courses]
+    if missing:
+        found = {
+            course['slug']: course
+            for course in Course.objects.filter(slug__in=missing).values('pk', 'slug', 'status', 'instructor_id')
+        }
+        courses.update({slug: found.get(slug) for slug in missing})
+    return courses
+
+
+def enroll_pairs(pairs, payment_reference='', chunk_size=SEAT_ASSIGNMENT_CHUNK_SIZE, courses=None):
+    """
+    Enroll each ``(student email, course slug)`` pair. Returns one
+    ``{'student', 'course', 'status'}`` row per pair, where status is one of
+    ``created``, ``already_enrolled``, ``unknown_student``,
+    ``unknown_course`` or ``course_unavailable``. Pass the same ``courses``
+    dict to repeated calls to look every course up only once.
+    """
+    User = get_user_model()
+    # Stored emails have a lowercased domain (create_user and the user import
+    # normalize them), so look them up the same way
+    normalized = {email: User.objects.normalize_email(email) for email, _ in pairs}
+    students = _lookup(User.objects.filter(is_active=True), 'email', set(normalized.values()), chunk_size)
+    courses = _lookup_courses(list(dict.fromkeys(slug for _, slug in pairs)), {} if courses is None else courses)
+
+    results = []
+    pending = []
+    for email, slug in pairs:
+        course = courses[slug]
+        row = {'student': email, 'course': slug}
+        results.append(row)
+        if course is None:
+            row['status'] = 'unknown_course'
+        elif course['status'] != 'published':
+            row['status'] = 'course_unavailable'
+        elif normalized[email] not in students:
+            row['status'] = 'unknown_student'
+        else:
+            pending.append((row, Enrollment(
+                student_id=students[normalized[email]],
+                course_id=course['pk'],
+                amount_paid=0,
+                payment_method=SEAT_PAYMENT_METHOD,
+                transaction_id=payment_reference,
+            )))
+
+    created_by_course = Counter()
+    for chunk in _chunks(pending, chunk_size):
+        enrollments = [enrollment for _, enrollment in chunk]
+        with transaction.atomic():
+            Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True)
+            inserted = set(Enrollment.objects.filter(
+                pk__in=[enrollment.pk for enrollment in enrollments]
+            ).values_list('pk', flat=True))
+        for row, enrollment in chunk:
+            if enrollment.pk in inserted:
+                row['status'] = 'created'
+                created_by_course[enrollment.course_id] += 1
+            else:
+                row['status'] = 'already_enrolled'
+
+    if created_by_course:
+        instructors = {course['pk']: course['instructor_id'] for course in courses.values() if course}
+        _count_new_enrollments(created_by_course, instructors)
+    return results
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Enrollment, LessonProgress
-from courses.serializers import CourseListSerializer
+from .progress import PROGRESS_BATCH_MAX_EVENTS
+from .seats import SEAT_ASSIGNMENT_MAX_ROWS
+from courses.models import Course, Lesson
+from courses.serializers import CourseListSerializer, CourseSummarySerializer
 from users.serializers import UserListSerializer
 
 class EnrollmentSerializer(serializers.ModelSerializer):
@@ -18,6 +21,60 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'enrolled_at', 'progress_percentage']
 
+class EnrollmentSummaryListSerializer(serializers.ListSerializer):
+    """Reads the tags of all courses on the page with one query when asked to"""
+    
+    def to_representation(self, data):
+        rows = list(data)
+        if self.context.get('include_tags'):
+            tags = {}
+            through = Course.tags.through.objects.filter(
+                course_id__in={row['course__id'] for row in rows}
+            ).order_by('coursetag__name').values_list(
+                'course_id', 'coursetag_id', 'coursetag__name', 'coursetag__slug'
+            )
+            for course_id, tag_id, name, slug in through:
+                tags.setdefault(course_id, []).append({'id': tag_id, 'name': name, 'slug': slug})
+            self.context['course_tags'] = tags
+        return super().to_representation(rows)
+
+class EnrollmentSummarySerializer(serializers.Serializer):
+    """Compact "my courses" row read from a values() projection"""
+    
+    FIELDS = (
+        'id', 'status', 'enrolled_at', 'completed_at', 'progress_percentage',
+        'completed_lessons', 'last_accessed_at', 'certificate_issued'
+    )
+    COURSE_PREFIX = 'course__'
+    
+    id = serializers.UUIDField()
+    status = serializers.CharField()
+    enrolled_at = serializers.DateTimeField()
+    completed_at = serializers.DateTimeField()
+    progress_percentage = serializers.DecimalField(max_digits=5, decimal_places=2)
+    completed_lessons = serializers.IntegerField()
+    last_accessed_at = serializers.DateTimeField()
+    certificate_issued = serializers.BooleanField()
+    
+    class Meta:
+        list_serializer_class = EnrollmentSummaryListSerializer
+    
+    @classmethod
+    def value_fields(cls):
+        """Lookups to pass to values() on an Enrollment queryset"""
+        return [*cls.FIELDS, *CourseSummarySerializer.value_fields(cls.COURSE_PREFIX)]
+    
+    def to_representation(self, row):
+        data = super().to_representation(row)
+        prefix = self.COURSE_PREFIX
+        course = CourseSummarySerializer(context=self.context).to_representation({
+            key[len(prefix):]: value for key, value in row.items() if key.startswith(prefix)
+        })
+        if self.context.get('include_tags'):
+            course['tags'] = self.context.get('course_tags', {}).get(row['course__id'], [])
+        data['course'] = course
+        return data
+
 class LessonProgressSerializer(serializers.ModelSerializer):
     """Serializer for lesson progress"""
     
@@ -27,4 +84,60 @@ class LessonProgressSerializer(serializers.ModelSerializer):
             'id', 'lesson', 'is_completed', 'completion_percentage',
             'time_spent_minutes', 'started_at', 'completed_at',
             'notes', 'is_bookmarked'
-        ]
\ No newline at end of file
+        ]
+
+class ProgressEventSerializer(serializers.Serializer):
+    """One lesson progress event of a batch"""
+    
+    enrollment = serializers.UUIDField()
+    lesson = serializers.IntegerField()
+    completion_percentage = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=100, required=False
+    )
+    is_completed = serializers.BooleanField(required=False)
+    time_spent_minutes = serializers.IntegerField(min_value=0, default=0)
+
+class ProgressBatchSerializer(serializers.Serializer):
+    """Lesson progress events across the student's enrollments"""
+    
+    events = ProgressEventSerializer(many=True, allow_empty=False, max_length=PROGRESS_BATCH_MAX_EVENTS)
+    
+    def validate(self, attrs):
+        # Ownership and lessons are checked with one query each for the whole batch
+        events = attrs['events']
+        enrollments = dict(Enrollment.objects.filter(
+            student=self.context['request'].user,
+            pk__in={event['enrollment'] for event in events}
+        ).values_list('pk', 'course_id'))
+        lessons = dict(Lesson.objects.filter(
+            pk__in={event['lesson'] for event in events}
+        ).values_list('pk', 'section__course_id'))
+        
+        errors = {}
+        for index, event in enumerate(events):
+            course_id = enrollments.get(event['enrollment'])
+            if course_id is None:
+                errors[index] = ['Enrollment not found.']
+            elif lessons.get(event['lesson']) != course_id:
+                errors[index] = ['Lesson is not part of the enrolled course.']
+        if errors:
+            raise serializers.ValidationError({'events': errors})
+        
+        attrs['enrollments'] = enrollments
+        return attrs
+
+
+class SeatAssignmentSerializer(serializers.Serializer):
+    """Students (by email) to enroll in every listed course"""
+    
+    students = serializers.ListField(child=serializers.EmailField(), allow_empty=False)
+    courses = serializers.ListField(child=serializers.SlugField(), allow_empty=False)
+    payment_reference = serializers.CharField(max_length=100, required=False, default='')
+    
+    def validate(self, attrs):
+        rows = len(set(attrs['students'])) * len(set(attrs['courses']))
+        if rows > SEAT_ASSIGNMENT_MAX_ROWS:
+            raise serializers.ValidationError(
+                f'At most {SEAT_ASSIGNMENT_MAX_ROWS} seats per request, got {rows}.'
+            )
+        return attrs
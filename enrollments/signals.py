@@ -0,0 +1,121 @@
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
+from django.db import transaction
+from django.dispatch import receiver
+from courses import stamps
+from courses.counters import course_counters
+from courses.dashboards import invalidate_course_dashboards
+from courses.models import Course, Lesson, Section
+from courses.platform import record_platform_event
+from courses.trending import record_activity
+from .funnel import current_curriculum_version, progress_course_id, progress_state, record_progress
+from .progress import record_completions
+from .models import Enrollment, LessonProgress
+
+# Deleting a course cascades to all of its enrollments; one stamp write per
+# burst is enough
+removed_stamp = stamps.ThrottledTouch(stamps.ENROLLMENTS_REMOVED, 1)
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_enrolled_course(sender, instance, **kwargs):
+    instance._counted_course = instance.__dict__.get('course_id')
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment(sender, instance, created, raw=False, **kwargs):
+    """Keep Course.total_students in step with enrollments"""
+    if raw:
+        return
+    old_course = None if created else instance._counted_course
+    instance._counted_course = instance.course_id
+    if old_course == instance.course_id:
+        return
+    deltas = {instance.course_id: {'total_students': 1}}
+    if old_course is not None:
+        deltas[old_course] = {'total_students': -1}
+    course_counters.add_many(deltas)
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    course_counters.add(instance.course_id, total_students=-1)
+
+
+@receiver(post_delete, sender=Enrollment)
+def note_removed_enrollment(sender, instance, **kwargs):
+    """Make the next incremental recommendations run a full one"""
+    transaction.on_commit(removed_stamp.touch)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment_activity(sender, instance, created, raw=False, **kwargs):
+    """Feed the hourly activity buckets behind trending courses"""
+    if created and not raw:
+        record_activity(instance.course_id, enrollments=1, at=instance.enrolled_at)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_instructor_dashboard(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_course_dashboards(instance)
+
+
+@receiver(post_save, sender=Enrollment)
+def count_platform_enrollment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_platform_event(total_enrollments=1, total_revenue=instance.amount_paid)
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_platform_enrollment(sender, instance, **kwargs):
+    record_platform_event(total_enrollments=-1, total_revenue=-instance.amount_paid)
+
+
+@receiver(post_init, sender=LessonProgress)
+def remember_progress_state(sender, instance, **kwargs):
+    instance._progress_state = progress_state(instance)
+
+
+@receiver(pre_save, sender=LessonProgress)
+def stamp_curriculum_version(sender, instance, raw=False, **kwargs):
+    """New progress rows belong to the curriculum version current when they start"""
+    if instance._state.adding and not raw:
+        instance.curriculum_version = current_curriculum_version(progress_course_id(instance))
+
+
+@receiver(post_save, sender=LessonProgress)
+def count_lesson_progress(sender, instance, created, raw=False, **kwargs):
+    """Keep Enrollment.completed_lessons and the lesson funnel in step with progress rows"""
+    if raw:
+        return
+    before = None if created else instance._progress_state
+    after = progress_state(instance)
+    instance._progress_state = after
+    if (before is None and not created) or before == after:
+        return
+
+    course_id = progress_course_id(instance)
+    was_completed = bool(before and before[0])
+    if after[0] != was_completed:
+        record_completions(instance.enrollment_id, 1 if after[0] else -1)
+    record_progress(instance, before, after, course_id)
+
+
+@receiver(post_delete, sender=LessonProgress)
+def uncount_lesson_progress(sender, instance, origin=None, **kwargs):
+    # Deleting a lesson, section or course cascades to its funnel rows as
+    # well, and a removed lesson recounts progress through the curriculum
+    # rebuild. Any other deletion (the progress row, its enrollment or its
+    # student) leaves funnel rows behind, so its contribution is subtracted.
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin_model in (Lesson, Section, Course):
+        return
+    before = instance._progress_state
+    course_id = progress_course_id(instance)
+    if course_id is None:
+        return
+    if before and before[0] and origin_model is LessonProgress:
+        # Otherwise the enrollment itself is being deleted
+        record_completions(instance.enrollment_id, -1)
+    record_progress(instance, before=before, course_id=course_id)
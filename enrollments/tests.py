@@ -1,3 +1,284 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+from courses.curriculum import rebuild_curriculum
+from courses.models import Category, Course, CourseCurriculum, Lesson, Section
+from .funnel import course_funnel, median_minutes, rebuild_funnel, time_bucket
+from .models import Enrollment, LessonFunnelStats, LessonProgress
+from .progress import ProgressBuffer, _locked_upsert, _single_statement_upsert
+
+User = get_user_model()
+
+
+def create_course(lessons=1, slug='course'):
+    """A published course with one section of ``lessons`` video lessons"""
+    instructor = User.objects.create_user(
+        username=f'{slug}-instructor', email=f'{slug}-instructor@example.com', password='pw-123456',
+        user_type='instructor'
+    )
+    category = Category.objects.create(name=f'Category {slug}', slug=f'category-{slug}')
+    course = Course.objects.create(
+        title=slug.title(), slug=slug, description='d', short_description='s',
+        instructor=instructor, category=category, difficulty_level='beginner',
+        duration_hours=1, price=0, status='published'
+    )
+    section = Section.objects.create(course=course, title='Section', order=1)
+    for order in range(1, lessons + 1):
+        Lesson.objects.create(
+            section=section, title=f'Lesson {order}', order=order, lesson_type='video', duration_minutes=10
+        )
+    return course
+
+
+def create_student(username='student'):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='pw-123456')
+
+
+class LessonProgressConcurrencyTests(TransactionTestCase):
+    """Parallel heartbeats for the same lesson must not lose time or fail"""
+
+    THREADS = 8
+    HEARTBEATS = 20
+
+    def setUp(self):
+        self.student = create_student()
+        course = create_course()
+        self.lesson = Lesson.objects.get(section__course=course)
+        self.enrollment = Enrollment.objects.create(student=self.student, course=course)
+
+    def _heartbeats(self, errors, complete):
+        client = APIClient()
+        client.force_authenticate(self.student)
+        url = f'/api/enrollments/{self.enrollment.pk}/lessons/{self.lesson.pk}/progress/'
+        try:
+            for beat in range(self.HEARTBEATS):
+                data = {'time_spent_minutes': 1}
+                if complete and beat == self.HEARTBEATS // 2:
+                    data['is_completed'] = True
+                response = client.post(url, data, format='json')
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    def test_parallel_heartbeats_lose_no_updates(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite serializes writers with table locks')
+
+        errors = []
+        threads = [
+            threading.Thread(target=self._heartbeats, args=(errors, index % 2 == 0))
+            for index in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        progress = LessonProgress.objects.get(enrollment=self.enrollment, lesson=self.lesson)
+        self.assertEqual(progress.time_spent_minutes, self.THREADS * self.HEARTBEATS)
+        self.assertTrue(progress.is_completed)
+
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+        self.assertEqual(self.enrollment.progress_percentage, 100)
+
+        # The incrementally maintained funnel matches a rebuild from scratch
+        fields = ('lesson_id', 'date', 'time_bucket', 'students', 'completions', 'time_spent_minutes')
+        maintained = sorted(LessonFunnelStats.objects.exclude(students=0).values_list(*fields))
+        rebuild_funnel()
+        self.assertEqual(maintained, sorted(LessonFunnelStats.objects.values_list(*fields)))
+
+
+class ProgressBufferTests(TestCase):
+    def setUp(self):
+        self.course = create_course(lessons=2)
+        self.first, self.second = Lesson.objects.filter(section__course=self.course).order_by('order')
+        self.enrollment = Enrollment.objects.create(student=create_student(), course=self.course)
+        # A long interval: the test flushes by hand
+        self.buffer = ProgressBuffer(interval=3600)
+
+    def tearDown(self):
+        if self.buffer._timer is not None:
+            self.buffer._timer.cancel()
+
+    def buffer_minutes(self, lesson, minutes):
+        self.buffer.add(self.enrollment.pk, self.course.pk, lesson.pk, time_spent_minutes=minutes)
+
+    def test_flush_merges_heartbeats(self):
+        self.buffer_minutes(self.first, 2)
+        self.buffer_minutes(self.first, 3)
+        self.buffer.flush()
+        progress = LessonProgress.objects.get(enrollment=self.enrollment, lesson=self.first)
+        self.assertEqual(progress.time_spent_minutes, 5)
+        self.assertFalse(progress.is_completed)
+
+    def test_heartbeats_of_deleted_lessons_are_dropped(self):
+        self.buffer_minutes(self.first, 2)
+        self.buffer_minutes(self.second, 7)
+        self.first.delete()
+        self.buffer.flush()
+        self.assertEqual(
+            LessonProgress.objects.get(enrollment=self.enrollment, lesson=self.second).time_spent_minutes, 7
+        )
+        self.assertEqual(self.buffer._pending, {})
+
+    def test_heartbeats_of_deleted_enrollments_are_dropped(self):
+        self.buffer_minutes(self.first, 2)
+        self.enrollment.delete()
+        self.buffer.flush()
+        self.assertFalse(LessonProgress.objects.exists())
+        self.assertEqual(self.buffer._pending, {})
+
+
+class ProgressPercentageTests(TestCase):
+    def setUp(self):
+        self.course = create_course(lessons=4)
+        self.lesson = Lesson.objects.filter(section__course=self.course).order_by('order').first()
+        self.enrollment = Enrollment.objects.create(student=create_student(), course=self.course)
+
+    def complete_lesson(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            LessonProgress.objects.create(enrollment=self.enrollment, lesson=self.lesson, is_completed=True)
+        self.enrollment.refresh_from_db()
+
+    def test_percentage_uses_the_compiled_lesson_count(self):
+        rebuild_curriculum(self.course.pk)
+        self.complete_lesson()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+        self.assertEqual(self.enrollment.progress_percentage, 25)
+
+    def test_percentage_counts_lessons_without_a_compiled_curriculum(self):
+        CourseCurriculum.objects.filter(course=self.course).delete()
+        self.complete_lesson()
+        self.assertEqual(self.enrollment.progress_percentage, 25)
+
+
+class UpsertProgressTests(TestCase):
+    """Both upsert strategies merge updates the same way"""
+
+    def setUp(self):
+        course = create_course(lessons=2)
+        rebuild_curriculum(course.pk)
+        self.lesson = Lesson.objects.filter(section__course=course).order_by('order').first()
+        self.enrollment = Enrollment.objects.create(student=create_student(), course=course)
+
+    def check_merge(self, upsert):
+        def update(minutes, percentage=None, complete=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                upsert(self.enrollment, self.lesson.pk, minutes, percentage, complete, timezone.now())
+            return LessonProgress.objects.get(enrollment=self.enrollment, lesson=self.lesson)
+
+        progress = update(3, percentage=10)
+        self.assertEqual((progress.time_spent_minutes, progress.completion_percentage), (3, 10))
+        self.assertFalse(progress.is_completed)
+
+        progress = update(2, complete=True)
+        completed_at = progress.completed_at
+        self.assertEqual(progress.time_spent_minutes, 5)
+        self.assertTrue(progress.is_completed)
+        self.assertIsNotNone(completed_at)
+
+        # A later heartbeat adds time and keeps the completion and its time
+        progress = update(4, percentage=60)
+        self.assertEqual((progress.time_spent_minutes, progress.completion_percentage), (9, 60))
+        self.assertTrue(progress.is_completed)
+        self.assertEqual(progress.completed_at, completed_at)
+
+        # Completing again does not count the lesson twice
+        update(1, complete=True)
+        self.enrollment.refresh_from_db()
+        self.assertEqual(self.enrollment.completed_lessons, 1)
+        self.assertEqual(self.enrollment.progress_percentage, 50)
+
+    @skipUnlessDBFeature('supports_update_conflicts_with_target', 'can_return_columns_from_insert')
+    def test_single_statement_upsert(self):
+        self.check_merge(_single_statement_upsert)
+
+    def test_locked_upsert(self):
+        self.check_merge(_locked_upsert)
+
+
+class LessonFunnelTests(TestCase):
+    FIELDS = ('lesson_id', 'date', 'time_bucket', 'students', 'completions', 'time_spent_minutes')
+
+    def setUp(self):
+        self.course = create_course(lessons=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_curriculum(self.course.pk)
+        self.lessons = list(Lesson.objects.filter(section__course=self.course).order_by('order'))
+        self.enrollments = [
+            Enrollment.objects.create(student=create_student(f'student{number}'), course=self.course)
+            for number in range(4)
+        ]
+
+    def progress(self, enrollment, lesson, minutes, completed=False):
+        return LessonProgress.objects.create(
+            enrollment=enrollment, lesson=lesson, time_spent_minutes=minutes, is_completed=completed
+        )
+
+    def assertMatchesRebuild(self):
+        maintained = sorted(LessonFunnelStats.objects.exclude(students=0).values_list(*self.FIELDS))
+        rebuild_funnel([self.course.pk])
+        self.assertEqual(maintained, sorted(LessonFunnelStats.objects.values_list(*self.FIELDS)))
+
+    def funnel(self, version=None):
+        self.course.refresh_from_db()
+        return {lesson['lesson_id']: lesson for lesson in course_funnel(self.course, version)['lessons']}
+
+    def test_time_buckets_and_median(self):
+        self.assertEqual([time_bucket(minutes) for minutes in (0, 4, 5, 7, 250)], [0, 3, 5, 5, 240])
+        self.assertEqual(median_minutes({0: 1, 5: 2, 8: 1}), 6.5)
+        self.assertIsNone(median_minutes({}))
+
+    def test_progress_writes_keep_the_funnel_in_step(self):
+        first, second, _ = self.lessons
+        rows = [self.progress(enrollment, first, 4 + number, completed=number < 3)
+                for number, enrollment in enumerate(self.enrollments)]
+        for enrollment in self.enrollments[:2]:
+            self.progress(enrollment, second, 1)
+        # More time moves a student to another bucket
+        rows[0].time_spent_minutes += 20
+        rows[0].save()
+        self.assertMatchesRebuild()
+
+        funnel = self.funnel()
+        self.assertEqual(
+            (funnel[first.pk]['starts'], funnel[first.pk]['completions'], funnel[second.pk]['starts']), (4, 3, 2)
+        )
+        self.assertEqual(funnel[second.pk]['start_rate'], 50.0)
+        self.assertEqual(funnel[second.pk]['drop_off_rate'], 50.0)
+        self.assertEqual(funnel[first.pk]['average_time_minutes'], (24 + 5 + 6 + 7) / 4)
+
+    def test_deleted_enrollments_and_students_leave_the_funnel(self):
+        for enrollment in self.enrollments[:3]:
+            self.progress(enrollment, self.lessons[0], 7, completed=True)
+        self.enrollments[0].delete()
+        self.enrollments[1].student.delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.funnel()[self.lessons[0].pk]['starts'], 1)
+
+    def test_removed_lessons_are_excluded(self):
+        first, second, third = self.lessons
+        for enrollment in self.enrollments:
+            self.progress(enrollment, first, 5, completed=True)
+            self.progress(enrollment, second, 5, completed=True)
+        self.progress(self.enrollments[0], third, 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertMatchesRebuild()
+        # The progress was recorded under the version that still had the lesson
+        self.assertEqual(self.course.curriculum.version, 2)
+        funnel = self.funnel(version=1)
+        self.assertEqual(list(funnel), [first.pk, third.pk])
+        self.assertEqual(funnel[third.pk]['starts'], 1)
+        # The drop-off runs from the lesson before the removed one
+        self.assertEqual(funnel[third.pk]['drop_off_rate'], 75.0)
@@ -8,8 +8,10 @@ urlpatterns = [
     path('', views.EnrollmentListView.as_view(), name='enrollment-list'),
     path('<uuid:pk>/', views.EnrollmentDetailView.as_view(), name='enrollment-detail'),
     path('enroll/<slug:course_slug>/', views.enroll_course, name='enroll-course'),
+    path('seats/', views.assign_course_seats, name='assign-course-seats'),
     
     # Progress tracking
     path('<uuid:enrollment_id>/lessons/<int:lesson_id>/progress/', 
          views.update_lesson_progress, name='update-lesson-progress'),
+    path('progress/batch/', views.batch_lesson_progress, name='batch-lesson-progress'),
 ]
\ No newline at end of file
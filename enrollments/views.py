@@ -4,20 +4,41 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from .models import Enrollment, LessonProgress
-from .serializers import EnrollmentSerializer, LessonProgressSerializer
-from courses.models import Course
+from .progress import ingest_progress, progress_buffer, upsert_progress
+from .seats import assign_seats, enroll
+from .serializers import (
+    EnrollmentSerializer, EnrollmentSummarySerializer, LessonProgressSerializer, ProgressBatchSerializer,
+    ProgressEventSerializer, SeatAssignmentSerializer,
+)
+from courses.models import Course, Lesson
+from lms_backend.pagination import KeysetPagination
 
 
 class EnrollmentListView(generics.ListAPIView):
-    """List user's enrollments"""
+    """List user's enrollments (?view=compact for course summaries and progress only)"""
     
-    serializer_class = EnrollmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    
+    def is_compact(self):
+        return self.request.query_params.get('view') == 'compact'
+    
+    def get_serializer_class(self):
+        return EnrollmentSummarySerializer if self.is_compact() else EnrollmentSerializer
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_tags'] = 'tags' in self.request.query_params.get('include', '').split(',')
+        return context
     
     def get_queryset(self):
-        return Enrollment.objects.filter(
-            student=self.request.user
-        ).select_related('course', 'course__instructor', 'course__category')
+        enrollments = Enrollment.objects.filter(student=self.request.user).order_by('-enrolled_at')
+        if self.is_compact():
+            # One flat query per page; tags cost one more query when included
+            return enrollments.values(*EnrollmentSummarySerializer.value_fields())
+        return enrollments.select_related(
+            'student', 'course__instructor', 'course__category'
+        ).prefetch_related('course__tags')
 
 class EnrollmentDetailView(generics.RetrieveAPIView):
     """Get enrollment details"""
@@ -28,7 +49,9 @@ class EnrollmentDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         return Enrollment.objects.filter(
             student=self.request.user
-        ).select_related('course', 'course__instructor', 'course__category')
+        ).select_related(
+            'student', 'course__instructor', 'course__category'
+        ).prefetch_related('course__tags')
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -37,22 +60,11 @@ def enroll_course(request, course_slug):
     
     course = get_object_or_404(Course, slug=course_slug, status='published')
     
-    # Check if already enrolled
-    if Enrollment.objects.filter(student=request.user, course=course).exists():
-        return Response(
-            {'error': 'Already enrolled in this course'}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Create enrollment
-    enrollment = Enrollment.objects.create(
-        student=request.user,
-        course=course,
-        amount_paid=course.price if not course.is_free else 0
-    )
+    # Enrolling twice returns the existing enrollment
+    enrollment, created = enroll(request.user, course)
     
     serializer = EnrollmentSerializer(enrollment)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -64,25 +76,83 @@ def update_lesson_progress(request, enrollment_id, lesson_id):
         id=enrollment_id, 
         student=request.user
     )
+    if not Lesson.objects.filter(pk=lesson_id, section__course_id=enrollment.course_id).exists():
+        return Response({'error': 'Lesson not found in this course'}, status=status.HTTP_404_NOT_FOUND)
     
-    progress, created = LessonProgress.objects.get_or_create(
-        enrollment=enrollment,
-        lesson_id=lesson_id,
-        defaults={
-            'completion_percentage': request.data.get('completion_percentage', 0),
-            'is_completed': request.data.get('is_completed', False),
-            'time_spent_minutes': request.data.get('time_spent_minutes', 0),
-        }
-    )
+    fields = {
+        name: request.data[name]
+        for name in ('time_spent_minutes', 'completion_percentage', 'is_completed') if name in request.data
+    }
+    event = ProgressEventSerializer(data={'enrollment': enrollment.pk, 'lesson': lesson_id, **fields})
+    event.is_valid(raise_exception=True)
+    time_spent_minutes = event.validated_data['time_spent_minutes']
+    completion_percentage = event.validated_data.get('completion_percentage')
+    complete = event.validated_data.get('is_completed', False)
+    
+    if progress_buffer.enabled:
+        progress = LessonProgress.objects.filter(enrollment=enrollment, lesson_id=lesson_id).first()
+        if progress is not None and (progress.is_completed or not complete):
+            # Watch-time heartbeat: merged in memory and written behind
+            progress_buffer.add(
+                enrollment.pk, enrollment.course_id, lesson_id,
+                time_spent_minutes=time_spent_minutes,
+                completion_percentage=completion_percentage,
+            )
+            serializer = LessonProgressSerializer(progress_buffer.apply_pending(progress))
+            return Response(serializer.data)
     
-    if not created:
-        progress.completion_percentage = request.data.get('completion_percentage', progress.completion_percentage)
-        progress.is_completed = request.data.get('is_completed', progress.is_completed)
-        progress.time_spent_minutes += request.data.get('time_spent_minutes', 0)
-        progress.save()
+    # First views and completions are written through, together with
+    # whatever is still buffered for the lesson
+    pending = progress_buffer.pop(enrollment.pk, lesson_id)
+    if completion_percentage is None:
+        completion_percentage = pending.get('completion_percentage')
     
-    # Update overall enrollment progress
-    enrollment.calculate_progress()
+    progress = upsert_progress(
+        enrollment, lesson_id,
+        time_spent_minutes=time_spent_minutes + pending.get('time_spent_minutes', 0),
+        completion_percentage=completion_percentage,
+        complete=complete,
+    )
     
     serializer = LessonProgressSerializer(progress)
     return Response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_lesson_progress(request):
+    """Apply a batch of lesson progress events (e.g. an offline sync)"""
+    
+    # Accept a bare list of events as well as {"events": [...]}
+    data = {'events': request.data} if isinstance(request.data, list) else request.data
+    serializer = ProgressBatchSerializer(data=data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    
+    enrollments = serializer.validated_data['enrollments']
+    result = ingest_progress(serializer.validated_data['events'], enrollments)
+    result['enrollments'] = list(Enrollment.objects.filter(pk__in=list(enrollments)).values(
+        'id', 'progress_percentage', 'completed_lessons'
+    ))
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def assign_course_seats(request):
+    """Enroll a list of students in a list of courses (staff only)"""
+    
+    if not request.user.is_staff:
+        return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+    
+    serializer = SeatAssignmentSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    results = assign_seats(
+        serializer.validated_data['students'],
+        serializer.validated_data['courses'],
+        payment_reference=serializer.validated_data['payment_reference'],
+    )
+    summary = {}
+    for row in results:
+        summary[row['status']] = summary.get(row['status'], 0) + 1
+    return Response({'summary': summary, 'results': results})
@@ -0,0 +1,32 @@
+"""Gunicorn settings (picked up automatically from the working directory)"""
+import logging
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# SERVER_MODE=asgi serves lms_backend.asgi through uvicorn workers, so the
+# async dashboard views run on an event loop
+if config('SERVER_MODE', default='wsgi') == 'asgi':
+    wsgi_app = 'lms_backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'lms_backend.wsgi:application'
+
+
+def post_worker_init(worker):
+    # Build the per-process typeahead index before the worker takes traffic
+    try:
+        from courses.autocomplete import catalog_autocomplete
+        catalog_autocomplete.ensure_fresh()
+    except Exception:
+        logger.exception('Could not warm the autocomplete index')
+
+
+def worker_exit(server, worker):
+    # Write buffered watch-time heartbeats before the worker goes away
+    try:
+        from enrollments.progress import progress_buffer
+        progress_buffer.flush()
+    except Exception:
+        logger.exception('Could not flush buffered lesson progress')
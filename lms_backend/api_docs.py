@@ -47,6 +47,12 @@ def api_documentation(request):
                 }
             }
         },
+        'pagination': {
+            'description': 'Course, review and enrollment lists support page-number and keyset (cursor) pagination',
+            'page_number': '?page=2',
+            'cursor': '?paginate=cursor, then follow the next/previous links',
+            'count': '?count=exact or ?count=estimate (cursor mode only)'
+        },
         'courses': {
             'list': {
                 'url': f'{base_url}courses/',
@@ -68,21 +74,82 @@ def api_documentation(request):
                 'url': f'{base_url}courses/categories/',
                 'method': 'GET'
             },
+            'facets': {
+                'url': f'{base_url}courses/facets/',
+                'method': 'GET',
+                'description': 'Facet counts for the catalog sidebar; accepts the same filters as the course list'
+            },
+            'autocomplete': {
+                'url': f'{base_url}courses/autocomplete/?q=pyth',
+                'method': 'GET',
+                'params': {'q': 'prefix', 'limit': '5 (max 20)'}
+            },
+            'also_took': {
+                'url': f'{base_url}courses/{{slug}}/recommendations/',
+                'method': 'GET',
+                'description': 'Courses frequently taken by students of this course'
+            },
+            'similar': {
+                'url': f'{base_url}courses/{{slug}}/similar/',
+                'method': 'GET',
+                'description': 'Courses with similar content, also available for new courses'
+            },
+            'recommendations': {
+                'url': f'{base_url}courses/recommendations/',
+                'method': 'GET',
+                'auth_required': True
+            },
             'featured': {
                 'url': f'{base_url}courses/lists/featured/',
                 'method': 'GET'
+            },
+            'trending': {
+                'url': f'{base_url}courses/lists/trending/',
+                'method': 'GET',
+                'params': {'category': 'category slug', 'limit': '12 (max 50)'}
             }
         },
         'enrollments': {
             'list': {
                 'url': f'{base_url}enrollments/',
                 'method': 'GET',
-                'auth_required': True
+                'auth_required': True,
+                'params': {
+                    'view': 'compact (course summary and progress only)',
+                    'include': 'tags (compact view)'
+                }
             },
             'enroll': {
                 'url': f'{base_url}enrollments/enroll/{{course_slug}}/',
                 'method': 'POST',
-                'auth_required': True
+                'auth_required': True,
+                'description': 'Returns 201 for a new enrollment, 200 with the existing one if already enrolled'
+            },
+            'seats': {
+                'url': f'{base_url}enrollments/seats/',
+                'method': 'POST',
+                'auth_required': True,
+                'description': 'Staff only. Enroll every listed student in every listed course; reports a status per pair',
+                'body': {
+                    'students': ['student@example.com'],
+                    'courses': ['course-slug'],
+                    'payment_reference': 'PO-1234'
+                }
+            },
+            'progress_batch': {
+                'url': f'{base_url}enrollments/progress/batch/',
+                'method': 'POST',
+                'auth_required': True,
+                'description': 'Apply many lesson progress events at once (e.g. offline sync)',
+                'body': {
+                    'events': [{
+                        'enrollment': 'uuid',
+                        'lesson': 1,
+                        'time_spent_minutes': 5,
+                        'completion_percentage': 50,
+                        'is_completed': False
+                    }]
+                }
             }
         },
         'reviews': {
@@ -113,6 +180,13 @@ def api_documentation(request):
                 'method': 'GET',
                 'auth_required': True,
                 'user_type': 'student'
+            },
+            'lesson_funnel': {
+                'url': f'{base_url}courses/analytics/courses/{{slug}}/funnel/',
+                'method': 'GET',
+                'auth_required': True,
+                'user_type': 'instructor',
+                'params': {'version': 'curriculum version (default current)', 'from': 'YYYY-MM-DD', 'to': 'YYYY-MM-DD'}
             }
         }
     }
@@ -0,0 +1,68 @@
+"""
+Concurrent execution of independent query groups.
+
+Django's async ORM still runs the queries of a request one after another
+on a single connection, so overlapping them needs separate connections.
+Query groups are submitted to a bounded thread pool of
+``DASHBOARD_QUERY_WORKERS`` threads. Every pool thread keeps its own
+database connection open for ``DASHBOARD_QUERY_CONN_MAX_AGE`` seconds,
+even when requests close theirs (``CONN_MAX_AGE = 0``), so a group does
+not pay for a new connection. A view then waits for its slowest group
+instead of the sum of all of them.
+
+With ``DASHBOARD_PARALLEL_QUERIES`` off, and inside a transaction, whose
+uncommitted rows other connections cannot see, groups run one after
+another on the caller's connection.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection, connections
+
+QUERY_WORKERS = getattr(settings, 'DASHBOARD_QUERY_WORKERS', 8)
+QUERY_CONN_MAX_AGE = getattr(settings, 'DASHBOARD_QUERY_CONN_MAX_AGE', 300)
+PARALLEL_QUERIES = getattr(settings, 'DASHBOARD_PARALLEL_QUERIES', True)
+
+
+def _keep_connections():
+    # Connections are per thread, so this only affects the pool threads
+    for alias in connections:
+        wrapper = connections[alias]
+        wrapper.settings_dict = {**wrapper.settings_dict, 'CONN_MAX_AGE': QUERY_CONN_MAX_AGE}
+
+
+_pool = ThreadPoolExecutor(
+    max_workers=QUERY_WORKERS, thread_name_prefix='query-group', initializer=_keep_connections
+)
+
+
+def _run(function):
+    close_old_connections()
+    try:
+        return function()
+    finally:
+        close_old_connections()
+
+
+def _run_inline(groups):
+    return {name: function() for name, function in groups.items()}
+
+
+def run_concurrently(groups):
+    """Run ``{name: callable}`` and return ``{name: result}``"""
+    if not PARALLEL_QUERIES or len(groups) < 2 or connection.in_atomic_block:
+        return _run_inline(groups)
+    futures = {name: _pool.submit(_run, function) for name, function in groups.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+async def gather(groups):
+    """Async counterpart of ``run_concurrently`` for async views"""
+    if not PARALLEL_QUERIES or len(groups) < 2 or await sync_to_async(lambda: connection.in_atomic_block)():
+        return await sync_to_async(_run_inline)(groups)
+    loop = asyncio.get_running_loop()
+    names = list(groups)
+    results = await asyncio.gather(*(loop.run_in_executor(_pool, _run, groups[name]) for name in names))
+    return dict(zip(names, results))
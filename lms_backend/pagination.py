@@ -0,0 +1,183 @@
+"""
+Pagination shared by the catalog and enrollment listings.
+
+``KeysetPagination`` keeps the classic ``?page=`` mode and adds an opt-in
+keyset mode (``?paginate=cursor``). In keyset mode each page seeks past the
+last row of the previous one on ``(ordering field, pk)`` instead of using
+``OFFSET``, so deep pages cost the same as the first one and concurrent
+inserts never shift rows between pages.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for a queryset.
+
+    Only PostgreSQL exposes a usable estimate; other backends fall back to
+    an exact ``COUNT(*)``.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page-number pagination with an opt-in keyset (cursor) mode"""
+
+    mode_query_param = 'paginate'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.get_keyset(queryset, request, view)
+        if self.keyset is None:
+            self.mode = 'page'
+            return super().paginate_queryset(queryset, request, view)
+
+        self.mode = 'cursor'
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.page_query_param)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        field, descending = self.keyset
+        position = self.decode_cursor(request)
+        reverse = bool(position and position['r'])
+
+        # Seek in the requested direction on (field, pk)
+        ascending = descending == reverse
+        order = '' if ascending else '-'
+        results = queryset.order_by(f'{order}{field}', f'{order}pk')
+        if position:
+            value = self.to_python(queryset, field, position['v'])
+            pk = self.to_python(queryset, 'pk', position['pk'])
+            lookup = 'gt' if ascending else 'lt'
+            results = results.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'pk__{lookup}': pk})
+            )
+
+        self.count = self.get_count(queryset, request)
+        page = list(results[:page_size + 1])
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page_items = page
+        return page
+
+    def get_paginated_response(self, data):
+        if self.mode == 'page':
+            return super().get_paginated_response(data)
+
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if self.mode == 'page':
+            return super().get_next_link()
+        if not self.has_next or not self.page_items:
+            return None
+        return self.encode_cursor(self.page_items[-1], reverse=False)
+
+    def get_previous_link(self):
+        if self.mode == 'page':
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_items:
+            return None
+        return self.encode_cursor(self.page_items[0], reverse=True)
+
+    def get_keyset(self, queryset, request, view):
+        """Return ``(field, descending)`` when keyset mode applies, else None"""
+        wants_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not wants_cursor:
+            return None
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if not ordering or not isinstance(ordering[0], str):
+            return None
+        field = ordering[0].lstrip('-')
+        if '__' in field or field == '?':
+            return None
+        return field, ordering[0].startswith('-')
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def to_python(self, queryset, field, value):
+        """Convert a cursor value for ``field``; a malformed one is a 404, not a 500"""
+        opts = queryset.model._meta
+        try:
+            model_field = opts.pk if field == 'pk' else opts.get_field(field)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return model_field.to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        field, _ = self.keyset
+        if isinstance(item, dict):
+            # A values() row
+            value, pk = item[field], item.get('pk', item.get('id'))
+        else:
+            value, pk = getattr(item, field), item.pk
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        position = {'v': value, 'pk': str(pk), 'r': int(reverse)}
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(position, separators=(',', ':')).encode()
+        ).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(position, dict) or not {'v', 'pk', 'r'} <= position.keys():
+                raise ValueError
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        return position
@@ -0,0 +1,305 @@
+"""
+Audit and repair of denormalized counters.
+
+Each ``CounterSpec`` knows how to compute the true value of some stored
+columns for a primary-key range, and how to repair a batch of rows; an
+``ExpressionCounterSpec`` does the former with set-based aggregate
+subqueries annotated on the range. ``reconcile`` splits each table into key ranges,
+audits the ranges in parallel threads (one database connection each) and
+collects drift statistics; with ``fix`` the drifting rows are repaired in
+batches by recomputing them in SQL, so concurrent ``F()`` deltas are never
+overwritten with stale values.
+"""
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from courses import stamps
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_WORKERS = 4
+DEFAULT_FIX_BATCH_SIZE = 1000
+MAX_SAMPLES = 10
+
+
+def _count(queryset, key, aggregate=None):
+    return Coalesce(Subquery(
+        queryset.filter(**{key: OuterRef('pk')}).order_by().values(key).annotate(
+            total=aggregate or Count('pk')
+        ).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+class CounterSpec(ABC):
+    """Stored counters of one model and how to recompute them"""
+
+    name = None
+    fields = ()
+    # Change stamps touched after repairs, so cached pages show the new values
+    stamp_keys = ()
+
+    @abstractmethod
+    def get_model(self):
+        """Model holding the stored counters"""
+
+    @abstractmethod
+    def rows(self, first, last):
+        """Yield ``(pk, stored, expected)`` for the rows in ``[first, last]``"""
+
+    @abstractmethod
+    def repair(self, pks):
+        """Recompute the counters of the given rows"""
+
+
+class ExpressionCounterSpec(CounterSpec):
+    """Counters whose true values are SQL expressions evaluated per row"""
+
+    @abstractmethod
+    def expected(self):
+        """``{field: expression}`` of the true values"""
+
+    def rows(self, first, last):
+        expected = self.expected()
+        annotations = {f'expected_{name}': expression for name, expression in expected.items()}
+        rows = self.get_model().objects.filter(pk__gte=first, pk__lte=last).order_by().annotate(
+            **annotations
+        ).values('pk', *self.fields, *annotations)
+        for row in rows:
+            yield (
+                row['pk'],
+                {name: row[name] for name in self.fields},
+                {name: row[f'expected_{name}'] for name in expected},
+            )
+
+
+class CourseCounters(ExpressionCounterSpec):
+    name = 'course'
+    fields = ('total_students', 'total_reviews', 'rating_sum', 'average_rating')
+    stamp_keys = (stamps.CATALOG,)
+
+    def get_model(self):
+        from courses.models import Course
+        return Course
+
+    def expected(self):
+        from enrollments.models import Enrollment
+        from reviews.models import Review
+
+        approved = Review.objects.filter(is_approved=True)
+        return {
+            'total_students': _count(Enrollment.objects.all(), 'course'),
+            'total_reviews': _count(approved, 'course'),
+            'rating_sum': _count(approved, 'course', Sum('rating')),
+        }
+
+    def rows(self, first, last):
+        # The average follows from the expected sum and count
+        for pk, stored, expected in super().rows(first, last):
+            reviews = expected['total_reviews']
+            average = Decimal(expected['rating_sum']) / reviews if reviews else Decimal(0)
+            # Half up, as numeric(3, 2) and users.stats round
+            expected['average_rating'] = average.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            yield pk, stored, expected
+
+    def repair(self, pks):
+        from courses.counters import refresh_course_stats
+        refresh_course_stats(pks)
+
+
+class CategoryCounters(ExpressionCounterSpec):
+    name = 'category'
+    fields = ('published_course_count',)
+    stamp_keys = (stamps.CATEGORIES, stamps.CATALOG)
+
+    def get_model(self):
+        from courses.models import Category
+        return Category
+
+    def expected(self):
+        from courses.models import Course
+        return {'published_course_count': _count(Course.objects.filter(status='published'), 'category')}
+
+    def repair(self, pks):
+        from courses.counters import refresh_category_counts
+        refresh_category_counts(pks)
+
+
+class ReviewHelpfulCounters(ExpressionCounterSpec):
+    name = 'review_helpful'
+    fields = ('helpful_count',)
+
+    def get_model(self):
+        from reviews.models import Review
+        return Review
+
+    def expected(self):
+        from reviews.models import ReviewHelpful
+        return {'helpful_count': _count(ReviewHelpful.objects.filter(is_helpful=True), 'review')}
+
+    def repair(self, pks):
+        self.get_model().objects.filter(pk__in=pks).update(**self.expected())
+
+
+class InstructorCounters(CounterSpec):
+    name = 'instructor'
+    fields = ('total_courses', 'total_students', 'average_rating')
+
+    def get_model(self):
+        from users.models import InstructorProfile
+        return InstructorProfile
+
+    def rows(self, first, last):
+        from users.stats import compute_instructor_stats
+
+        profiles = list(self.get_model().objects.filter(pk__gte=first, pk__lte=last).values(
+            'pk', 'user_id', *self.fields
+        ))
+        expected = compute_instructor_stats([profile['user_id'] for profile in profiles])
+        for profile in profiles:
+            yield profile['pk'], {name: profile[name] for name in self.fields}, expected[profile['user_id']]
+
+    def repair(self, pks):
+        from users.stats import compute_instructor_stats
+
+        profiles = list(self.get_model().objects.filter(pk__in=pks))
+        expected = compute_instructor_stats([profile.user_id for profile in profiles])
+        for profile in profiles:
+            for name, value in expected[profile.user_id].items():
+                setattr(profile, name, value)
+        self.get_model().objects.bulk_update(profiles, list(self.fields))
+
+
+class EnrollmentProgressCounters(ExpressionCounterSpec):
+    name = 'enrollment_progress'
+    fields = ('completed_lessons',)
+
+    def get_model(self):
+        from enrollments.models import Enrollment
+        return Enrollment
+
+    def expected(self):
+        from enrollments.progress import completed_lessons_expression
+        return {'completed_lessons': completed_lessons_expression()}
+
+    def repair(self, pks):
+        from enrollments.progress import refresh_progress
+
+        by_course = {}
+        for pk, course_id in self.get_model().objects.filter(pk__in=pks).values_list('pk', 'course_id'):
+            by_course.setdefault(course_id, []).append(pk)
+        for course_id, enrollment_ids in by_course.items():
+            refresh_progress(course_id, enrollment_ids)
+
+
+COUNTER_SPECS = {
+    spec.name: spec
+    for spec in (
+        CourseCounters(), CategoryCounters(), ReviewHelpfulCounters(), InstructorCounters(),
+        EnrollmentProgressCounters(),
+    )
+}
+
+
+@dataclass
+class DriftReport:
+    spec: str
+    scanned: int = 0
+    drifted: int = 0
+    fixed: int = 0
+    fields: dict = field(default_factory=dict)   # name -> [rows, total |delta|, max |delta|]
+    samples: list = field(default_factory=list)
+
+    def add(self, pk, stored, expected):
+        drift = False
+        for name, value in expected.items():
+            if stored[name] == value:
+                continue
+            drift = True
+            delta = abs(Decimal(value or 0) - Decimal(stored[name] or 0))
+            entry = self.fields.setdefault(name, [0, Decimal(0), Decimal(0)])
+            entry[0] += 1
+            entry[1] += delta
+            entry[2] = max(entry[2], delta)
+        if drift:
+            self.drifted += 1
+            if len(self.samples) < MAX_SAMPLES:
+                self.samples.append(pk)
+        return drift
+
+    def merge(self, other):
+        self.scanned += other.scanned
+        self.drifted += other.drifted
+        self.fixed += other.fixed
+        for name, (rows, total, largest) in other.fields.items():
+            entry = self.fields.setdefault(name, [0, Decimal(0), Decimal(0)])
+            entry[0] += rows
+            entry[1] += total
+            entry[2] = max(entry[2], largest)
+        self.samples.extend(other.samples[:MAX_SAMPLES - len(self.samples)])
+
+
+def key_ranges(model, chunk_size):
+    """Split a table into ``(first_pk, last_pk)`` ranges of ``chunk_size`` rows"""
+    first = previous = None
+    pks = model.objects.order_by('pk').values_list('pk', flat=True)
+    for position, pk in enumerate(pks.iterator(chunk_size=chunk_size)):
+        if position % chunk_size == 0:
+            if first is not None:
+                yield first, previous
+            first = pk
+        previous = pk
+    if first is not None:
+        yield first, previous
+
+
+def audit_range(spec, first, last, fix=False, batch_size=DEFAULT_FIX_BATCH_SIZE):
+    report = DriftReport(spec.name)
+    drifting = []
+    for pk, stored, expected in spec.rows(first, last):
+        report.scanned += 1
+        if report.add(pk, stored, expected):
+            drifting.append(pk)
+
+    if fix:
+        for offset in range(0, len(drifting), batch_size):
+            batch = drifting[offset:offset + batch_size]
+            spec.repair(batch)
+            report.fixed += len(batch)
+    return report
+
+
+def _audit_in_thread(*args, **kwargs):
+    try:
+        return audit_range(*args, **kwargs)
+    finally:
+        connection.close()
+
+
+def reconcile(spec_names=None, fix=False, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+              batch_size=DEFAULT_FIX_BATCH_SIZE):
+    """Audit (and optionally repair) the selected counters. Returns ``{name: DriftReport}``"""
+    specs = [COUNTER_SPECS[name] for name in (spec_names or COUNTER_SPECS)]
+    reports = {}
+    for spec in specs:
+        report = DriftReport(spec.name)
+        ranges = key_ranges(spec.get_model(), chunk_size)
+        if workers <= 1:
+            for first, last in ranges:
+                report.merge(audit_range(spec, first, last, fix, batch_size))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_audit_in_thread, spec, first, last, fix, batch_size)
+                    for first, last in ranges
+                ]
+                for future in futures:
+                    report.merge(future.result())
+        if report.fixed and spec.stamp_keys:
+            stamps.touch(*spec.stamp_keys)
+        reports[spec.name] = report
+    return reports
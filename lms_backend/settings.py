@@ -85,6 +85,17 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'lms_backend.wsgi.application'
+ASGI_APPLICATION = 'lms_backend.asgi.application'
+
+# 'wsgi' runs sync gunicorn workers, 'asgi' runs uvicorn workers (see gunicorn.conf.py)
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+
+# Serve the analytics dashboards from async views; on by default under ASGI
+ASYNC_DASHBOARDS = config('ASYNC_DASHBOARDS', default=SERVER_MODE == 'asgi', cast=bool)
+# Threads (and so database connections per process) used to run dashboard query groups
+DASHBOARD_QUERY_WORKERS = config('DASHBOARD_QUERY_WORKERS', default=8, cast=int)
+# Seconds those threads keep their connections open, whatever CONN_MAX_AGE says
+DASHBOARD_QUERY_CONN_MAX_AGE = config('DASHBOARD_QUERY_CONN_MAX_AGE', default=300, cast=int)
 
 
 # Database
@@ -93,12 +104,28 @@ WSGI_APPLICATION = 'lms_backend.wsgi.application'
 
 
 
+# Seconds to keep database connections open between requests (0 closes them
+# after every request)
+CONN_MAX_AGE = config('CONN_MAX_AGE', default=0, cast=int)
+
 DATABASES = {
-    'default': dj_database_url.config(default=os.environ.get("DATABASE_URL"))
+    'default': dj_database_url.config(default=os.environ.get("DATABASE_URL"), conn_max_age=CONN_MAX_AGE)
 }
 
 if 'DATABASE_URL' in os.environ:
-    DATABASES['default'] = dj_database_url.parse(os.environ['DATABASE_URL'])
+    DATABASES['default'] = dj_database_url.parse(os.environ['DATABASE_URL'], conn_max_age=CONN_MAX_AGE)
+
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    # Test on a file rather than in memory, so concurrency tests get real
+    # separate connections; writers wait for each other's locks
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('timeout', 30)
+
+# Run dashboard query groups on the parallel connections of the query pool
+# (at most DASHBOARD_QUERY_WORKERS per process, on top of the request
+# connections). Turn off to run the groups one after another on the request's
+# connection, e.g. when the database has no connections to spare.
+DASHBOARD_PARALLEL_QUERIES = config('DASHBOARD_PARALLEL_QUERIES', default=True, cast=bool)
 
 AUTH_USER_MODEL = 'users.user'
 
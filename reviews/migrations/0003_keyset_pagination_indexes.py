@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['course', 'is_approved', 'created_at', 'id'], name='reviews_course__4e774f_idx'),
+        ),
+    ]
@@ -42,6 +42,7 @@ class Review(models.Model):
             models.Index(fields=['course', 'is_approved']),
             models.Index(fields=['student']),
             models.Index(fields=['rating']),
+            models.Index(fields=['course', 'is_approved', 'created_at', 'id']),
         ]
     
     def __str__(self):
@@ -0,0 +1,86 @@
+from collections import Counter, defaultdict
+
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from courses import stamps
+from courses.counters import course_counters
+from courses.dashboards import invalidate_course_dashboards
+from courses.platform import record_platform_event
+from courses.trending import record_activity
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def touch_course_reviews(sender, instance, raw=False, **kwargs):
+    """Invalidate the review validators of the reviewed course"""
+    if not raw:
+        stamps.touch(stamps.reviews_key(instance.course_id))
+
+
+@receiver(post_save, sender=Review)
+def count_review_activity(sender, instance, created, raw=False, **kwargs):
+    """Feed the hourly activity buckets behind trending courses"""
+    if created and not raw and instance.is_approved:
+        record_activity(instance.course_id, reviews=1, at=instance.created_at)
+
+
+def _rating_contribution(course_id, is_approved, rating):
+    """Counter deltas a review adds to its course; only approved reviews count"""
+    if course_id is None or not is_approved:
+        return {}
+    return {course_id: Counter(total_reviews=1, rating_sum=rating or 0)}
+
+
+@receiver(post_init, sender=Review)
+def remember_rating_state(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are not loaded
+    state = instance.__dict__
+    instance._rating_state = (state.get('course_id'), state.get('is_approved'), state.get('rating'))
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    """Maintain total_reviews, rating_sum and average_rating of the course"""
+    if raw:
+        return
+    new_state = (instance.course_id, instance.is_approved, instance.rating)
+    old_state = (None, False, None) if created else instance._rating_state
+    instance._rating_state = new_state
+    if old_state == new_state:
+        return
+
+    deltas = defaultdict(Counter)
+    for course_id, counts in _rating_contribution(*new_state).items():
+        deltas[course_id].update(counts)
+    for course_id, counts in _rating_contribution(*old_state).items():
+        deltas[course_id].subtract(counts)
+    course_counters.add_many(deltas)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review(sender, instance, **kwargs):
+    course_counters.add_many({
+        course_id: {field: -value for field, value in counts.items()}
+        for course_id, counts in _rating_contribution(
+            instance.course_id, instance.is_approved, instance.rating
+        ).items()
+    })
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_instructor_dashboard(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_course_dashboards(instance)
+
+
+@receiver(post_save, sender=Review)
+def count_platform_review(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_platform_event(total_reviews=1)
+
+
+@receiver(post_delete, sender=Review)
+def uncount_platform_review(sender, instance, **kwargs):
+    record_platform_event(total_reviews=-1)
@@ -7,19 +7,24 @@ from django.db import models
 from .models import Review
 from .serializers import ReviewSerializer, ReviewCreateSerializer
 from courses.models import Course
+from courses import stamps
+from lms_backend.pagination import KeysetPagination
 
 class ReviewListView(generics.ListAPIView):
     """List reviews for a course"""
     
     serializer_class = ReviewSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         course_slug = self.kwargs.get('course_slug')
         return Review.objects.filter(
             course__slug=course_slug,
             is_approved=True
-        ).select_related('student', 'course').order_by('-created_at')
+        ).select_related(
+            'student', 'course__instructor', 'course__category'
+        ).prefetch_related('course__tags').order_by('-created_at')
 
 class ReviewCreateView(generics.CreateAPIView):
     """Create a review for a course"""
@@ -41,8 +46,15 @@ class UserReviewsView(generics.ListAPIView):
     def get_queryset(self):
         return Review.objects.filter(
             student=self.request.user
-        ).select_related('course').order_by('-created_at')
+        ).select_related(
+            'student', 'course__instructor', 'course__category'
+        ).prefetch_related('course__tags').order_by('-created_at')
 
+def review_stamp_keys(request, course_slug):
+    course_id = Course.objects.filter(slug=course_slug).values_list('pk', flat=True).first()
+    return [stamps.reviews_key(course_id)] if course_id else []
+
+@stamps.conditional(review_stamp_keys)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def course_reviews_stats(request, course_slug):
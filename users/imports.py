@@ -0,0 +1,260 @@
+"""
+Bulk user and enrollment imports from CSV (university cohorts).
+
+Files are streamed record by record and handled in chunks, so memory use
+depends on the chunk size and not on the file size. Each chunk goes in with
+one ``bulk_create`` in its own transaction.
+
+Hashing a password is slow on purpose (tens of milliseconds per PBKDF2
+hash), which makes it the bottleneck of a user import. Hashes are computed
+in a process pool a few chunks ahead of the inserts. Emails and usernames
+that already exist are skipped before hashing and checked again right
+before the insert, so running an import twice creates nobody twice.
+
+After every committed chunk the position reached in the file and the running
+totals are saved to a checkpoint file; ``resume=True`` continues from there
+after an interruption.
+"""
+import csv
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from courses.platform import record_platform_event
+from .models import InstructorProfile
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+USER_COLUMNS = ('email', 'username', 'first_name', 'last_name', 'user_type', 'password')
+ENROLLMENT_COLUMNS = ('email', 'course')
+
+
+class Checkpoint:
+    """Line reached and running totals of an import, saved after every chunk"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source)
+
+    def load(self):
+        """``(line, totals)`` of the previous run, or a fresh start if there is none"""
+        try:
+            with open(self.path) as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return 0, Counter()
+        if state['source'] != self.source:
+            raise ValueError(f'Checkpoint {self.path} belongs to {state["source"]}')
+        return state['line'], Counter(state['totals'])
+
+    def save(self, line, totals):
+        # Write then rename, so an interruption never leaves half a checkpoint
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump({'source': self.source, 'line': line, 'totals': totals}, handle)
+        os.replace(temporary, self.path)
+
+
+def read_rows(path, columns, required, start_line=0):
+    """Yield ``(line, row)`` for every CSV record ending after ``start_line``"""
+    with open(path, newline='', encoding='utf-8-sig') as source:
+        reader = csv.DictReader(source)
+        missing = set(required) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f'{path} has no {", ".join(sorted(missing))} column')
+        for row in reader:
+            if reader.line_num > start_line:
+                yield reader.line_num, {column: (row.get(column) or '').strip() for column in columns}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _hash_passwords(passwords):
+    # An empty password gives an unusable one; those users set theirs by reset
+    return [make_password(password or None) for password in passwords]
+
+
+def _without_existing(users):
+    User = get_user_model()
+    emails = set(User.objects.filter(email__in=[user.email for user in users]).values_list('email', flat=True))
+    usernames = set(User.objects.filter(
+        username__in=[user.username for user in users]
+    ).values_list('username', flat=True))
+    return [user for user in users if user.email not in emails and user.username not in usernames]
+
+
+def _length_error(model, values):
+    # Too long for the column: reject the row rather than fail the whole chunk
+    for name, value in values.items():
+        max_length = model._meta.get_field(name).max_length
+        if len(value) > max_length:
+            return f'{name} longer than {max_length} characters'
+    return None
+
+
+def _prepare_users(chunk, tallies, report_error):
+    """New ``User`` instances of a chunk and their raw passwords"""
+    User = get_user_model()
+    user_types = dict(User.USER_TYPES)
+    users = []
+    passwords = {}
+    seen = set()
+    for line, row in chunk:
+        email = User.objects.normalize_email(row['email'])
+        values = {
+            'email': email,
+            'username': row['username'] or email,
+            'first_name': row['first_name'],
+            'last_name': row['last_name'],
+        }
+        user_type = row['user_type'] or 'student'
+        error = _length_error(User, values)
+        if error is None:
+            try:
+                validate_email(email)
+            except ValidationError:
+                error = f'invalid email {email!r}'
+        if error is None and user_type not in user_types:
+            error = f'unknown user type {user_type!r}'
+        username = values['username']
+        if error is None and (email in seen or username in seen):
+            error = 'duplicate of an earlier row'
+        if error:
+            tallies['invalid'] += 1
+            report_error(line, error)
+            continue
+        seen.update((email, username))
+        user = User(user_type=user_type, **values)
+        users.append(user)
+        passwords[email] = row['password']
+
+    new_users = _without_existing(users)
+    tallies['existing'] += len(users) - len(new_users)
+    return new_users, [passwords[user.email] for user in new_users]
+
+
+def _insert_users(users, hashes, totals):
+    User = get_user_model()
+    for user, password in zip(users, hashes):
+        user.password = password
+    prepared = len(users)
+    with transaction.atomic():
+        # Rows may have been added since the chunk was prepared
+        users = _without_existing(users)
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        # ignore_conflicts does not say which rows went in; salted password
+        # hashes are unique, so they tell our rows from concurrent ones
+        inserted = {
+            (email, password): pk
+            for pk, email, password in User.objects.filter(
+                email__in=[user.email for user in users]
+            ).values_list('pk', 'email', 'password')
+        }
+        users = [user for user in users if (user.email, user.password) in inserted]
+        instructors = [inserted[(user.email, user.password)] for user in users if user.user_type == 'instructor']
+        if instructors:
+            InstructorProfile.objects.bulk_create(
+                [InstructorProfile(user_id=pk) for pk in instructors], ignore_conflicts=True
+            )
+
+    totals['created'] += len(users)
+    totals['existing'] += prepared - len(users)
+    by_type = Counter(user.user_type for user in users)
+    deltas = {
+        'total_users': len(users),
+        'total_students': by_type['student'],
+        'total_instructors': by_type['instructor'],
+    }
+    deltas = {name: value for name, value in deltas.items() if value}
+    if deltas:
+        record_platform_event(**deltas)
+
+
+def import_users(path, resume=False, checkpoint_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 workers=DEFAULT_WORKERS, progress=None, report_error=None):
+    """
+    Create users from a CSV with an ``email`` column and optional
+    ``username``, ``first_name``, ``last_name``, ``user_type`` and
+    ``password`` columns. Returns the totals: ``created``, ``existing``
+    (skipped) and ``invalid``.
+    """
+    progress = progress or (lambda line, totals, processed: None)
+    report_error = report_error or (lambda line, message: None)
+    checkpoint = Checkpoint(checkpoint_path or f'{path}.checkpoint', path)
+    start_line, totals = checkpoint.load() if resume else (0, Counter())
+
+    processed = 0
+
+    def insert(line, rows, tallies, users, hashes):
+        nonlocal processed
+        # Chunks are prepared ahead; their tallies only count once they are
+        # inserted and checkpointed, so a resumed import counts them once
+        totals.update(tallies)
+        _insert_users(users, hashes.result(), totals)
+        checkpoint.save(line, totals)
+        processed += rows
+        progress(line, totals, processed)
+
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        for chunk in chunked(read_rows(path, USER_COLUMNS, ('email',), start_line), chunk_size):
+            tallies = Counter()
+            users, passwords = _prepare_users(chunk, tallies, report_error)
+            pending.append((chunk[-1][0], len(chunk), tallies, users, pool.submit(_hash_passwords, passwords)))
+            # Keep every worker busy, but only a bounded number of chunks in memory
+            if len(pending) > workers:
+                insert(*pending.popleft())
+        while pending:
+            insert(*pending.popleft())
+    return totals
+
+
+def import_enrollments(path, resume=False, checkpoint_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                       payment_reference='', progress=None, report_error=None):
+    """
+    Enroll the students of a CSV with ``email`` and ``course`` (slug)
+    columns. Returns the totals per ``enroll_pairs`` status plus
+    ``invalid``.
+    """
+    from enrollments.seats import enroll_pairs
+
+    progress = progress or (lambda line, totals, processed: None)
+    report_error = report_error or (lambda line, message: None)
+    checkpoint = Checkpoint(checkpoint_path or f'{path}.checkpoint', path)
+    start_line, totals = checkpoint.load() if resume else (0, Counter())
+
+    courses = {}
+    processed = 0
+    for chunk in chunked(read_rows(path, ENROLLMENT_COLUMNS, ENROLLMENT_COLUMNS, start_line), chunk_size):
+        lines = []
+        pairs = []
+        for line, row in chunk:
+            if not row['email'] or not row['course']:
+                totals['invalid'] += 1
+                report_error(line, 'email and course are required')
+                continue
+            lines.append(line)
+            pairs.append((row['email'], row['course']))
+
+        for line, result in zip(lines, enroll_pairs(pairs, payment_reference, chunk_size, courses)):
+            totals[result['status']] += 1
+            if result['status'] not in ('created', 'already_enrolled'):
+                report_error(line, result['status'].replace('_', ' '))
+
+        checkpoint.save(chunk[-1][0], totals)
+        processed += len(chunk)
+        progress(chunk[-1][0], totals, processed)
+    return totals
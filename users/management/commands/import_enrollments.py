@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from users.imports import DEFAULT_CHUNK_SIZE, import_enrollments
+
+
+class Command(BaseCommand):
+    help = 'Enroll students from a CSV with email and course (slug) columns; resumable with --resume'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the line saved in the checkpoint file')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows inserted per transaction')
+        parser.add_argument('--payment-reference', default='',
+                            help='Stored as the transaction id of the new enrollments')
+
+    def _summary(self, totals):
+        return ', '.join(f'{count} {status.replace("_", " ")}' for status, count in sorted(totals.items()))
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(line, totals, processed):
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'line {line}: {self._summary(totals)} ({rate:.0f} rows/s)')
+
+        def report_error(line, message):
+            if options['verbosity'] > 1:
+                self.stderr.write(f'line {line}: {message}')
+
+        try:
+            totals = import_enrollments(
+                options['path'],
+                resume=options['resume'],
+                checkpoint_path=options['checkpoint'],
+                chunk_size=options['chunk_size'],
+                payment_reference=options['payment_reference'],
+                progress=progress,
+                report_error=report_error,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f'Enrollments imported: {self._summary(totals)}'))
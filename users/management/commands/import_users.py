@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from users.imports import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS, import_users
+
+
+class Command(BaseCommand):
+    help = ('Create users from a CSV (email, and optionally username, first_name, last_name, '
+            'user_type, password); resumable with --resume')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue after the line saved in the checkpoint file')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows inserted per transaction')
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                            help='Processes hashing passwords')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(line, totals, processed):
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'line {line}: {totals["created"]} created, {totals["existing"]} existing, '
+                f'{totals["invalid"]} invalid ({rate:.0f} rows/s)'
+            )
+
+        def report_error(line, message):
+            if options['verbosity'] > 1:
+                self.stderr.write(f'line {line}: {message}')
+
+        try:
+            totals = import_users(
+                options['path'],
+                resume=options['resume'],
+                checkpoint_path=options['checkpoint'],
+                chunk_size=options['chunk_size'],
+                workers=options['workers'],
+                progress=progress,
+                report_error=report_error,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(
+            f'Users imported: {totals["created"]} created, {totals["existing"]} existing, '
+            f'{totals["invalid"]} invalid'
+        ))
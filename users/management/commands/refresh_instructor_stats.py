@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from users.stats import DEFAULT_CHUNK_SIZE, refresh_instructor_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute instructor profile totals and ratings (schedule with cron or Heroku Scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only recompute instructors whose data changed since the last run'
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Instructors processed per batch')
+
+    def handle(self, *args, **options):
+        def progress(processed, updated):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{processed} instructors processed, {updated} updated')
+
+        processed, updated = refresh_instructor_stats(
+            incremental=options['incremental'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Instructor stats refreshed: {processed} processed, {updated} updated'
+        ))
@@ -39,6 +39,9 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            models.Index(fields=['date_joined']),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.email})"
@@ -0,0 +1,137 @@
+"""
+Instructor profile rollups.
+
+``total_courses``, ``total_students`` and ``average_rating`` of
+``InstructorProfile`` are recomputed with one grouped query per source
+table for each chunk of instructors, and only rows whose values changed
+are written back with ``bulk_update``.
+
+The incremental mode recomputes instructors whose courses, enrollments or
+reviews were created or edited since the previous run. Deletions do not
+leave a trace, so a full run should still be scheduled now and then.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from courses import stamps
+from .models import InstructorProfile
+
+INSTRUCTOR_STATS_STAMP = 'stats:instructors'
+
+DEFAULT_CHUNK_SIZE = 500
+
+TWO_PLACES = Decimal('0.01')
+
+
+def _grouped(queryset, key, **aggregates):
+    """``{key: {name: value}}`` from a GROUP BY on ``key``"""
+    return {
+        row.pop(key): row
+        for row in queryset.order_by().values(key).annotate(**aggregates)
+    }
+
+
+def compute_instructor_stats(instructor_ids):
+    """Return ``{user_id: {field: value}}`` for the given instructors"""
+    from courses.models import Course
+    from enrollments.models import Enrollment
+    from reviews.models import Review, InstructorReview
+
+    courses = _grouped(
+        Course.objects.filter(instructor_id__in=instructor_ids, status='published'),
+        'instructor_id', total=Count('pk'),
+    )
+    students = _grouped(
+        Enrollment.objects.filter(course__instructor_id__in=instructor_ids),
+        'course__instructor_id', total=Count('student', distinct=True),
+    )
+    course_ratings = _grouped(
+        Review.objects.filter(course__instructor_id__in=instructor_ids, is_approved=True),
+        'course__instructor_id', total=Sum('rating'), count=Count('pk'),
+    )
+    instructor_ratings = _grouped(
+        InstructorReview.objects.filter(instructor_id__in=instructor_ids, is_approved=True),
+        'instructor_id', total=Sum('overall_rating'), count=Count('pk'),
+    )
+
+    stats = {}
+    for instructor_id in instructor_ids:
+        # Course reviews and instructor reviews weigh the same per rating
+        ratings = [
+            group[instructor_id] for group in (course_ratings, instructor_ratings)
+            if instructor_id in group
+        ]
+        count = sum(rating['count'] for rating in ratings)
+        total = sum(Decimal(rating['total'] or 0) for rating in ratings)
+        stats[instructor_id] = {
+            'total_courses': courses.get(instructor_id, {}).get('total', 0),
+            'total_students': students.get(instructor_id, {}).get('total', 0),
+            'average_rating': (total / count).quantize(TWO_PLACES, ROUND_HALF_UP) if count else Decimal('0.00'),
+        }
+    return stats
+
+
+def changed_instructors(since):
+    """Instructors with course, enrollment or review edits after ``since``"""
+    from courses.models import Course
+    from enrollments.models import Enrollment
+    from reviews.models import Review, InstructorReview
+
+    sources = (
+        Course.objects.filter(updated_at__gte=since).values_list('instructor_id', flat=True),
+        Enrollment.objects.filter(
+            Q(enrolled_at__gte=since) | Q(updated_at__gte=since)
+        ).values_list('course__instructor_id', flat=True),
+        Review.objects.filter(updated_at__gte=since).values_list('course__instructor_id', flat=True),
+        InstructorReview.objects.filter(updated_at__gte=since).values_list('instructor_id', flat=True),
+        InstructorProfile.objects.filter(created_at__gte=since).values_list('user_id', flat=True),
+    )
+    changed = set()
+    for source in sources:
+        changed.update(source.order_by().distinct())
+    return changed
+
+
+def refresh_instructor_stats(incremental=False, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Recompute instructor rollups in chunks of ``chunk_size`` profiles.
+    Returns ``(processed, updated)``.
+    """
+    started_at = timezone.now()
+    profiles = InstructorProfile.objects.order_by('user_id')
+
+    if incremental:
+        last_run = stamps.get_stamp(INSTRUCTOR_STATS_STAMP)
+        if last_run is not None:
+            profiles = profiles.filter(user_id__in=list(changed_instructors(last_run)))
+
+    processed = updated = 0
+    fields = ['total_courses', 'total_students', 'average_rating']
+    instructor_ids = profiles.values_list('user_id', flat=True)
+
+    last_id = None
+    while True:
+        chunk_ids = instructor_ids if last_id is None else instructor_ids.filter(user_id__gt=last_id)
+        chunk_ids = list(chunk_ids[:chunk_size])
+        if not chunk_ids:
+            break
+        last_id = chunk_ids[-1]
+
+        stats = compute_instructor_stats(chunk_ids)
+        changed = []
+        for profile in InstructorProfile.objects.filter(user_id__in=chunk_ids).only('pk', 'user_id', *fields):
+            values = stats[profile.user_id]
+            if any(getattr(profile, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(profile, field, value)
+                changed.append(profile)
+        InstructorProfile.objects.bulk_update(changed, fields)
+
+        processed += len(chunk_ids)
+        updated += len(changed)
+        if progress:
+            progress(processed, updated)
+
+    stamps.touch(INSTRUCTOR_STATS_STAMP, at=started_at)
+    return processed, updated
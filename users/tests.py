@@ -1,3 +1,93 @@
+import csv
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from .imports import Checkpoint, import_users
+from .models import InstructorProfile
+
+User = get_user_model()
+
+USER_HEADER = ['email', 'username', 'first_name', 'last_name', 'user_type', 'password']
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'users.csv')
+
+    def write_csv(self, rows):
+        with open(self.path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(USER_HEADER)
+            writer.writerows(rows)
+
+    def run_import(self, **options):
+        errors = []
+        options = {'chunk_size': 2, 'workers': 1, 'report_error': lambda line, message: errors.append(line), **options}
+        with self.captureOnCommitCallbacks(execute=True):
+            totals = import_users(self.path, **options)
+        return totals, errors
+
+    def test_creates_users_and_skips_existing_and_invalid_rows(self):
+        User.objects.create_user(username='old', email='old@example.com', password='pw-123456')
+        self.write_csv([
+            ['ada@example.com', '', 'Ada', 'Lovelace', 'instructor', 'secret-1'],
+            ['bob@example.com', 'bob', 'Bob', '', '', ''],
+            ['old@example.com', '', '', '', '', ''],
+            ['not-an-email', '', '', '', '', ''],
+            ['ada@example.com', '', '', '', '', ''],
+            ['eve@example.com', '', '', '', 'alien', ''],
+            ['long@example.com', 'x' * 151, '', '', '', ''],
+        ])
+        totals, errors = self.run_import()
+        # The repeated email is in a later chunk, where Ada already exists
+        self.assertEqual((totals['created'], totals['existing'], totals['invalid']), (2, 2, 3))
+        self.assertEqual(errors, [5, 7, 8])
+
+        ada = User.objects.get(email='ada@example.com')
+        self.assertEqual(ada.username, 'ada@example.com')
+        self.assertTrue(ada.check_password('secret-1'))
+        self.assertTrue(InstructorProfile.objects.filter(user=ada).exists())
+        self.assertFalse(User.objects.get(email='bob@example.com').has_usable_password())
+
+        # Running the same file again creates nobody twice
+        totals, _ = self.run_import()
+        self.assertEqual((totals['created'], totals['existing']), (0, 4))
+
+    def test_resume_continues_after_the_checkpoint(self):
+        self.write_csv([
+            ['a@example.com', '', '', '', '', ''],
+            ['b@example.com', '', '', '', '', ''],
+            ['c@example.com', '', '', '', '', ''],
+            ['not-an-email', '', '', '', '', ''],
+            ['d@example.com', '', '', '', '', ''],
+            ['e@example.com', '', '', '', '', ''],
+        ])
+
+        def interrupt(line, totals, processed):
+            raise Interrupted
+
+        # The second chunk is prepared before the first one is inserted
+        with self.assertRaises(Interrupted):
+            self.run_import(progress=interrupt)
+        line, totals = Checkpoint(f'{self.path}.checkpoint', self.path).load()
+        self.assertEqual(line, 3)
+        # Rows of the chunk prepared ahead are not counted yet
+        self.assertEqual((totals['created'], totals['invalid']), (2, 0))
+
+        totals, _ = self.run_import(resume=True)
+        self.assertEqual((totals['created'], totals['existing'], totals['invalid']), (5, 0, 1))
+        self.assertEqual(User.objects.count(), 5)
 
-# Create your tests here.
+    def test_checkpoint_belongs_to_its_file(self):
+        Checkpoint(f'{self.path}.checkpoint', 'other.csv').save(3, {'created': 2})
+        self.write_csv([])
+        with self.assertRaises(ValueError):
+            self.run_import(resume=True)